@@ -1,112 +1,268 @@
-from flask import Flask, request, jsonify
-import cv2, numpy as np, os, base64, sys
-from stockfish import Stockfish
+from flask import Flask, request, Response, stream_with_context
+import os, sys, zipfile
+import contextvars
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 import atexit
 import signal
 import logging
 import traceback
-from datetime import datetime
-import mysql.connector
+from typing import Optional
 from mysql.connector import Error
 
 # Ajouter le répertoire parent au PYTHONPATH pour permettre les imports absolus
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ChessBotApi.utils.fen_builder import (
-    split_board,
-    analyze_square,
-    classify_square,
-    generate_fen_from_matrix,
+from ChessBotApi.config import (
+    UPLOAD_FOLDER,
+    TEMPLATES_DIR,
+    TEMPLATES_RELOAD_INTERVAL,
+    STOCKFISH_PATH,
+    STOCKFISH_POOL_SIZE,
+    STOCKFISH_THREADS,
+    STOCKFISH_CHECKOUT_TIMEOUT,
+    ANALYSIS_CACHE_SIZE,
+    ANALYSIS_CACHE_TTL,
+    ANALYSIS_CACHE_DB,
+    IMAGE_CACHE_SIZE,
+    SESSION_MAX,
+    SESSION_TTL,
+    RECOGNITION_WORKERS,
+    RECOGNITION_BACKEND,
+    PIECE_MODEL_PATH,
+    SEARCH_MAX_MOVETIME,
+    STREAM_MAX_MOVETIME,
+    MAX_MULTIPV,
+    ADMISSION_MAX_ACTIVE,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT,
+    MAX_UPLOAD_SIZE,
+    BATCH_MAX_IMAGES,
+    BATCH_MAX_UNCOMPRESSED,
+    BATCH_CLASSIFY_CHUNK,
+    DB_CONFIG,
+    DB_POOL_CONFIG,
+    DB_BACKEND,
+    DB_SQLITE_PATH,
+    DB_SQLITE_LATENCY_MS,
+    API_KEY_CACHE_SIZE,
+    API_KEY_CACHE_TTL,
+    API_KEY_CACHE_NEGATIVE_TTL,
+    API_PORT,
+    ADMIN_ALLOWED_IPS,
+    ADMIN_TOKEN,
+    METRICS_ALLOWED_IPS,
+    DEBUG_TIMING,
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_JSON,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_QUEUE_SIZE,
+    LOG_DEBUG_SAMPLE_RATE,
+)
+from ChessBotApi.utils.template_bank import TemplateBank
+from ChessBotApi.utils.engine_pool import EnginePool
+from ChessBotApi.utils.analysis_cache import AnalysisCache
+from ChessBotApi.utils.image_cache import ImageCache
+from ChessBotApi.utils.board_sessions import BoardSessionStore
+from ChessBotApi.utils.board_locator import BoardGeometryCache
+from ChessBotApi.utils.recognition import (
+    BoardRecognizer,
+    ImageDecodeError,
+    decode_image,
+    load_classifier,
+)
+from ChessBotApi.utils.recognition_pool import RecognitionPool
+from ChessBotApi.utils.api_key_cache import ApiKeyCache
+from ChessBotApi.utils.db_pool import DBPool, DBConnectionError, DBPoolExhausted
+from ChessBotApi.utils.sqlite_db import sqlite_connector
+from ChessBotApi.utils.uci_search import stream_search, run_search, analysis_response, send_command
+from ChessBotApi.utils.logging_setup import setup_logging
+from ChessBotApi.utils.single_flight import SingleFlight
+from ChessBotApi.utils.admission import AdmissionController, AdmissionRejected
+from ChessBotApi.utils.search_budget import is_forced_move, plan_search, resolve_without_search
+from ChessBotApi.utils.request_handling import (
+    ADMIN_TOKEN_HEADER,
+    API_KEY_QUERY,
+    BatchTooLarge,
+    STREAM_HEADERS,
+    UPDATE_SETTINGS_QUERY,
+    USER_ID_QUERY,
+    USER_SETTINGS_QUERY,
+    admission_rejected_response,
+    analysis_body,
+    analysis_failed_response,
+    analysis_params,
+    batch_too_large_response,
+    api_key_fallback,
+    api_key_result,
+    batch_body,
+    batch_images,
+    db_busy_response,
+    error_response,
+    forbidden_response,
+    invalid_key_response,
+    invalidate_api_key_cache,
+    is_admin_request,
+    no_image_response,
+    request_image,
+    request_session_id,
+    search_cancelled_response,
+    search_limits,
+    settings_update,
+    split_error_response,
+    stats_body,
+    stream_bestmove,
+    stream_event,
+    stream_mimetype,
+    stream_params,
+    too_many_images_response,
+)
+from ChessBotApi.utils.cancellation import (
+    DEADLINE_HEADER,
+    CancelMonitor,
+    CancelToken,
+    SearchCancelled,
+    deadline_bucket,
+    parse_deadline,
+    socket_probe,
+)
+from ChessBotApi.utils.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    current_timer,
+    finish_request,
+    registry,
+    stage,
+    start_request,
+    SEARCHES_CANCELLED,
+    SEARCHES_RESOLVED_EARLY,
 )
 
 app = Flask(__name__)
 
-UPLOAD_FOLDER = "uploads"
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
-TEMPLATES_DIR = "./ChessBotApi/templates"
-STOCKFISH_PATH = os.getenv("STOCKFISH_PATH", "/usr/games/stockfish")
-
-# Configuration de la base de données
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': int(os.getenv('DB_PORT', 3307)),
-    'user': os.getenv('DB_USER', 'hess_user'),
-    'password': os.getenv('DB_PASSWORD', 'hess_password'),
-    'database': os.getenv('DB_NAME', 'hess_db')
-}
+# DB_BACKEND=sqlite : base locale à la place de MySQL (tests de charge)
+db_connect = sqlite_connector(DB_SQLITE_PATH, DB_SQLITE_LATENCY_MS) if DB_BACKEND == "sqlite" else None
+db_pool = DBPool(DB_CONFIG, connect=db_connect, **DB_POOL_CONFIG)
 
-def get_db_connection():
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        logger.error(f"Erreur de connexion à la base de données: {e}")
-        return None
+# Cache des vérifications de clés API (positives et négatives)
+api_key_cache = ApiKeyCache(
+    max_size=API_KEY_CACHE_SIZE,
+    ttl=API_KEY_CACHE_TTL,
+    negative_ttl=API_KEY_CACHE_NEGATIVE_TTL,
+)
+
+def request_cancel_token() -> CancelToken:
+    """Jeton d'annulation de la requête : échéance X-Deadline-Ms et déconnexion du client."""
+    return CancelToken(parse_deadline(request.headers.get(DEADLINE_HEADER)), socket_probe(request.environ))
 
+@stage("auth")
 def verify_api_key(api_key):
-    logger.info(f"Vérification de la clé API reçue: {api_key!r}")
+    """
+    Vérifie une clé API (cache puis base de données).
+
+    Raises:
+        DBPoolExhausted: si la base est saturée et que la clé n'a jamais été vue
+    """
     if not api_key:
         return False
-    
-    connection = get_db_connection()
-    if not connection:
-        return False
-    
+
+    cached = api_key_cache.get(api_key)
+    if cached is not None:
+        return cached
+
     try:
-        cursor = connection.cursor()
-        query = "SELECT isActive FROM ApiKey WHERE keyValue = %s"
-        cursor.execute(query, (api_key,))
-        result = cursor.fetchone()
-        logger.info(f"Résultat SQL pour la clé: {result}")
-        return result and result[0]
+        with db_pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(API_KEY_QUERY, (api_key,))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+        return api_key_result(api_key_cache, api_key, row)
+    except (DBPoolExhausted, DBConnectionError) as e:
+        return api_key_fallback(api_key_cache, api_key, e)
     except Error as e:
         logger.error(f"Erreur lors de la vérification de la clé API: {e}")
         return False
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+
+# Journalisation non bloquante (file + thread d'écriture), configurée avant
+# la création des processus de reconnaissance pour qu'ils en héritent
+logging_pipeline = setup_logging(
+    level=LOG_LEVEL,
+    log_file=LOG_FILE,
+    json_format=LOG_JSON,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    queue_size=LOG_QUEUE_SIZE,
+    debug_sample_rate=LOG_DEBUG_SAMPLE_RATE,
+)
+logger = logging.getLogger(__name__)
 
 # Vérifier si Stockfish existe
 if not os.path.exists(STOCKFISH_PATH):
     raise FileNotFoundError(f"Stockfish non trouvé à {STOCKFISH_PATH}. Veuillez définir la variable d'environnement STOCKFISH_PATH.")
 
+# Templates chargés et prétraités une seule fois au démarrage
+template_bank = TemplateBank(TEMPLATES_DIR, reload_interval=TEMPLATES_RELOAD_INTERVAL)
+# FEN des échiquiers déjà reconnus, indexés par empreinte d'image
+image_cache = ImageCache(max_size=IMAGE_CACHE_SIZE)
+# Dernier échiquier reconnu par session, pour ne reclasser que les cases modifiées
+board_sessions = BoardSessionStore(max_sessions=SESSION_MAX, ttl=SESSION_TTL)
+# Position de l'échiquier détectée dans les captures de chaque session
+geometry_cache = BoardGeometryCache(max_sessions=SESSION_MAX, ttl=SESSION_TTL)
+recognizer = BoardRecognizer(
+    template_bank, image_cache, board_sessions,
+    classify_chunk=BATCH_CLASSIFY_CHUNK,
+    geometry_cache=geometry_cache,
+    classifier=load_classifier(RECOGNITION_BACKEND, PIECE_MODEL_PATH),
+)
+# Processus dédiés au décodage et à la reconnaissance (créés avant les moteurs Stockfish)
+recognition_pool = RecognitionPool(
+    TEMPLATES_DIR,
+    workers=RECOGNITION_WORKERS,
+    image_cache_size=IMAGE_CACHE_SIZE,
+    classify_chunk=BATCH_CLASSIFY_CHUNK,
+    backend=RECOGNITION_BACKEND,
+    model_path=PIECE_MODEL_PATH,
+) if RECOGNITION_WORKERS > 0 else None
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
-
-# Stockage global de l'instance Stockfish
-stockfish_instance = None
-
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('chessbot_api.log')
-    ]
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_SIZE
+
+# Pool de moteurs Stockfish : un moteur dédié par requête en cours
+engine_pool = EnginePool(
+    STOCKFISH_PATH,
+    size=STOCKFISH_POOL_SIZE,
+    threads_per_engine=STOCKFISH_THREADS,
+    checkout_timeout=STOCKFISH_CHECKOUT_TIMEOUT,
 )
-logger = logging.getLogger(__name__)
+logger.info(f"Pool Stockfish démarré avec {engine_pool.size} moteur(s)")
 
-def get_stockfish():
-    global stockfish_instance
-    if stockfish_instance is None:
-        try:
-            stockfish_instance = Stockfish(path=STOCKFISH_PATH)
-            stockfish_instance.set_skill_level(20)
-        except Exception as e:
-            raise RuntimeError(f"Erreur lors de l'initialisation de Stockfish: {str(e)}")
-    return stockfish_instance
+# Cache des analyses déjà calculées (optionnellement persistant via SQLite)
+analysis_cache = AnalysisCache(
+    max_size=ANALYSIS_CACHE_SIZE,
+    ttl=ANALYSIS_CACHE_TTL,
+    db_path=ANALYSIS_CACHE_DB,
+)
+# Recherches identiques en cours, partagées entre les requêtes simultanées
+search_flights = SingleFlight()
+# Surveillance des échéances et déconnexions des requêtes en cours d'analyse
+cancel_monitor = CancelMonitor()
+# Requêtes d'analyse traitées en parallèle ; au-delà, file d'attente bornée puis rejet (503)
+admission = AdmissionController(
+    ADMISSION_MAX_ACTIVE or 2 * engine_pool.size,
+    max_queue=ADMISSION_MAX_QUEUE,
+    max_wait=ADMISSION_MAX_WAIT,
+)
 
 def cleanup_stockfish():
-    global stockfish_instance
-    if stockfish_instance is not None:
-        try:
-            stockfish_instance.quit()
-        except:
-            pass
-        stockfish_instance = None
+    engine_pool.close()
+    if recognition_pool is not None:
+        recognition_pool.close()
+    analysis_cache.close()
+    db_pool.close()
 
 # Enregistrer la fonction de nettoyage
 atexit.register(cleanup_stockfish)
@@ -119,227 +275,531 @@ def signal_handler(signum, frame):
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
-def allowed_file(name):
-    return "." in name and name.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+def process_image(img, session_id=None):
+    try:
+        logger.debug("Processing chessboard image")
+        fen = recognizer.process_image(img, session_id)
+        logger.debug("Generated FEN: %s", fen)
+        return fen
+    except Exception as e:
+        error_msg = f"Image processing error: {str(e)}\n{traceback.format_exc()}"
+        logger.error(error_msg)
+        return None
+
+
+def process_image_data(data: bytes, session_id=None):
+    """
+    Décode et reconnaît une image encodée, dans le pool de processus s'il est activé.
 
+    Les requêtes avec session restent dans ce processus : l'état de la session
+    (dernier échiquier reconnu) y est gardé.
+
+    Raises:
+        ImageDecodeError: si les données ne sont pas une image lisible
+    """
+    if recognition_pool is None or session_id:
+        with stage("decode"):
+            img = decode_image(data)
+        if img is None:
+            raise ImageDecodeError("Image illisible")
+        return process_image(img, session_id)
 
-def process_image(img):
     try:
-        logger.info("Processing chessboard image")
-        grid = split_board(img)
-        if grid is None:
-            logger.error("Failed to split board")
-            return None
-            
-        files = "abcdefgh"
-        ranks = "12345678"
-        matrix = []
-        for r in reversed(ranks):
-            row = []
-            for f in files:
-                sq = analyze_square(grid, f + r)
-                if sq is None:
-                    logger.error(f"Failed to analyze square {f}{r}")
-                    row.append("ERR")
-                else:
-                    res = classify_square(sq, TEMPLATES_DIR)
-                    piece = res[0][0] if res else "NUL"
-                    row.append(piece)
-                    if piece == "ERR":
-                        logger.error(f"Failed to classify square {f}{r}")
-            matrix.append(row)
-        
-        fen = generate_fen_from_matrix(matrix)
-        logger.info(f"Generated FEN: {fen}")
+        logger.debug("Processing chessboard image")
+        fen = recognition_pool.recognize(data)
+        logger.debug("Generated FEN: %s", fen)
         return fen
+    except ImageDecodeError:
+        raise
     except Exception as e:
         error_msg = f"Image processing error: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_msg)
         return None
 
 
-def best_move_from_stockfish(fen: str, skill_level=20, depth=15) -> tuple[str, float]:
+def process_images_data(blobs):
+    """
+    Reconnaît plusieurs échiquiers encodés (voir BoardRecognizer.process_images).
+
+    Returns:
+        Liste des FEN (None pour une image illisible), dans l'ordre des images
+    """
+    if recognition_pool is not None:
+        return recognition_pool.recognize_many(blobs)
+    with stage("decode"):
+        imgs = [decode_image(blob) if blob else None for blob in blobs]
+    return recognizer.process_images(imgs)
+
+
+def prepare_engine(stockfish, fen: str, skill_level: int, multipv: int = 1):
+    """Règle un moteur emprunté au pool pour une nouvelle position."""
+    stockfish.set_skill_level(skill_level)
+    if stockfish.get_engine_parameters().get("MultiPV") != multipv:
+        stockfish.update_engine_parameters({"MultiPV": multipv})
+    stockfish.set_fen_position(fen)
+
+
+def checkout_timeout(cancel: Optional[CancelToken]) -> float:
+    """Attente maximale d'un moteur libre : jamais au-delà de l'échéance de `cancel`."""
+    remaining = cancel.remaining() if cancel is not None else None
+    return STOCKFISH_CHECKOUT_TIMEOUT if remaining is None else min(STOCKFISH_CHECKOUT_TIMEOUT, remaining)
+
+
+def search_position(fen: str, skill_level: int, depth: int, multipv: int,
+                    cancel: Optional[CancelToken] = None,
+                    nodes: Optional[int] = None, movetime: Optional[int] = None) -> dict:
+    """
+    Recherche Stockfish sur un moteur du pool ; le résultat est mis en cache.
+
+    La recherche s'arrête à la première limite atteinte : profondeur, nœuds,
+    temps demandé, SEARCH_MAX_MOVETIME ou échéance de `cancel` (la plus tardive
+    des demandeurs regroupés), qui borne aussi l'attente d'un moteur libre. Si `cancel`
+    est annulé pendant la recherche, "stop" est envoyé au moteur, qui est
+    rendu au pool dès la réponse "bestmove".
+
+    Raises:
+        SearchCancelled: si `cancel` est annulé avant ou pendant la recherche,
+            ou si aucun moteur ne se libère avant l'échéance
+    """
+    forced = is_forced_move(fen)
+    if cancel is not None and cancel.cancelled:
+        # Pas de moteur pour une requête déjà abandonnée
+        SEARCHES_CANCELLED.inc(reason=cancel.reason)
+        raise SearchCancelled(cancel.reason)
+
+    handle = None
     try:
-        logger.info(f"Calculating best move for FEN: {fen}")
-        logger.info(f"Parameters - Skill: {skill_level}, Depth: {depth}")
-        
-        stockfish = get_stockfish()
-        stockfish.set_skill_level(skill_level)
-        stockfish.set_fen_position(fen)
-        stockfish.set_depth(depth)
+        with engine_pool.engine(timeout=checkout_timeout(cancel)) as stockfish:
+            if cancel is not None and cancel.cancelled:
+                # Tous les demandeurs sont partis pendant l'attente : moteur rendu sans recherche
+                # (une exception dans le bloc le ferait remplacer)
+                analysis = None
+            else:
+                prepare_engine(stockfish, fen, skill_level, multipv)
+
+                # Budget calculé après l'attente du moteur, sur le temps qui reste vraiment
+                # (échéance éventuellement repoussée par un demandeur arrivé entre-temps)
+                remaining = cancel.remaining() if cancel is not None else None
+                remaining_ms = remaining * 1000 if remaining is not None else None
+                limits = plan_search(depth, nodes, movetime, remaining_ms, SEARCH_MAX_MOVETIME, forced=forced)
+
+                def register_stop():
+                    # Après "go" seulement : le moteur ignore un "stop" reçu hors recherche.
+                    # Jeton déjà annulé : le rappel est exécuté tout de suite.
+                    nonlocal handle
+                    handle = cancel.add_callback(lambda reason: send_command(stockfish, "stop"))
+
+                try:
+                    # Une seule recherche : coup, score et variante viennent de la même sortie
+                    with stage("search"):
+                        analysis = run_search(stockfish, **limits, stop_when_decisive=multipv == 1,
+                                              on_go=register_stop if cancel is not None else None)
+                finally:
+                    if handle is not None:
+                        cancel.remove_callback(handle)
+    except TimeoutError:
+        if cancel is None or not cancel.cancelled:
+            raise
+
+    if cancel is not None and cancel.reason is not None:
+        # Résultat partiel : ni renvoyé ni mis en cache
+        SEARCHES_CANCELLED.inc(reason=cancel.reason)
+        raise SearchCancelled(cancel.reason)
+
+    if forced:
+        # Coup forcé : recherche minimale, suffisante pour l'évaluation
+        analysis["resolved"] = "single_move"
+    if analysis.get("resolved"):
+        SEARCHES_RESOLVED_EARLY.inc(reason=analysis["resolved"])
+    # Une recherche écourtée (nœuds, temps, échéance) ne doit pas servir aux requêtes suivantes
+    complete = (analysis.get("resolved") or (depth > 0 and (analysis["depth"] or 0) >= depth)
+                or (limits["movetime"] >= SEARCH_MAX_MOVETIME and not limits["nodes"]))
+    if multipv == 1 and complete:
+        analysis_cache.put(fen, skill_level, depth, analysis)
+    return analysis
+
+
+def best_move_from_stockfish(fen: str, skill_level=20, depth=15, multipv=1,
+                             cancel: Optional[CancelToken] = None, nodes: Optional[int] = None,
+                             movetime: Optional[int] = None) -> dict:
+    """
+    Analyse une position en une seule recherche (profondeur `depth`, `nodes` nœuds,
+    `movetime` ms, SEARCH_MAX_MOVETIME ms au plus et jamais au-delà de l'échéance de `cancel`).
+
+    Les positions sans choix réel (partie terminée, mat en un) sont résolues
+    sans moteur ; un coup forcé n'a droit qu'à une recherche minimale.
+
+    Returns:
+        Dictionnaire best_move, score, score_type, pv, depth, nodes, nps...
+        et `lines` (les `multipv` meilleures lignes)
+
+    Raises:
+        SearchCancelled: si `cancel` est annulé (client parti, échéance dépassée)
+    """
+    try:
+        logger.debug("Calculating best move for FEN: %s (skill %s, depth %s, multipv %s)",
+                     fen, skill_level, depth, multipv)
         
-        move = stockfish.get_best_move_time(1000)  # 1000 ms de calcul
-        score = stockfish.get_evaluation()['value']
+        # Le cache ne contient que des analyses à une seule ligne
+        if multipv == 1:
+            cached = analysis_cache.get(fen, skill_level, depth)
+            if cached is not None:
+                logger.debug("Cache hit: %s", cached['best_move'])
+                return cached
+
+        analysis = resolve_without_search(fen, skill_level, multipv)
+        if analysis is not None:
+            SEARCHES_RESOLVED_EARLY.inc(reason=analysis["resolved"])
+            return analysis
         
-        logger.info(f"Best move found: {move} with score: {score/100:.2f}")
-        return move, score
+        # Requêtes identiques simultanées, d'échéances proches : une seule recherche pour toutes
+        deadline = cancel.deadline if cancel is not None else None
+        analysis = search_flights.do((fen, skill_level, depth, multipv, nodes, movetime, deadline_bucket(deadline)),
+                                     search_position, fen, skill_level, depth, multipv,
+                                     cancel=cancel, nodes=nodes, movetime=movetime)
+        score = analysis["score"] or 0
+        logger.debug("Best move found: %s with score: %.2f", analysis['best_move'], score / 100)
+        return analysis
+    except SearchCancelled:
+        raise
     except Exception as e:
         error_msg = f"Stockfish error: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_msg)
-        cleanup_stockfish()  # Réinitialiser Stockfish en cas d'erreur
         raise RuntimeError(error_msg)
 
 
+@app.before_request
+def start_timing():
+    start_request()
+
+
+@app.after_request
+def finish_timing(response):
+    # Pour /analyze/stream, la durée mesurée s'arrête à l'envoi des en-têtes
+    timer = current_timer()
+    if timer is not None:
+        finish_request(timer, request.endpoint or "unmatched", response.status_code)
+        if DEBUG_TIMING or request.headers.get("X-Debug-Timing"):
+            response.headers["X-Debug-Timing"] = timer.header()
+    return response
+
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
     try:
-        logger.info("Received analyze request")
-        
-        # Vérification de la clé API
-        api_key = request.headers.get('X-API-Key')
-        if not verify_api_key(api_key):
-            return jsonify({
-                "error": "invalid_api_key",
-                "status": "error",
-                "details": "Invalid or missing API key"
-            }), 401
-        
-        img = None
-        
-        # Log request details
-        logger.info(f"Request method: {request.method}")
-        logger.info(f"Request headers: {dict(request.headers)}")
-        
-        if "image" in request.files:
-            f = request.files["image"]
-            if f.filename and allowed_file(f.filename):
-                logger.info(f"Processing uploaded file: {f.filename}")
-                img = cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR)
-        elif request.is_json:
-            logger.info("Processing JSON request")
-            data = request.get_json()
-            if "image" in data:
-                img = cv2.imdecode(
-                    np.frombuffer(base64.b64decode(data["image"]), np.uint8),
-                    cv2.IMREAD_COLOR,
-                )
+        logger.debug("Received analyze request")
+        cancel = request_cancel_token()
 
-        if img is None:
+        try:
+            key_valid = verify_api_key(request.headers.get('X-API-Key'))
+        except DBPoolExhausted:
+            return db_busy_response()
+        if not key_valid:
+            return invalid_key_response()
+
+        data = read_request_image()
+        if not data:
             logger.error("No valid image found in request")
-            return jsonify({
-                "error": "no image",
-                "status": "error",
-                "details": "No valid image was provided in the request"
-            }), 400
-
-        # Récupérer les paramètres de configuration
-        skill_level = int(request.args.get('skill_level', 20))
-        depth = int(request.args.get('depth', 15))
-        logger.info(f"Analysis parameters - Skill: {skill_level}, Depth: {depth}")
-
-        fen = process_image(img)
-        if fen is None:
-            logger.error("Failed to process image into FEN")
-            return jsonify({
-                "error": "split error",
-                "status": "error",
-                "details": "Failed to process the chessboard image"
-            }), 400
+            return no_image_response()
+
+        skill_level, depth, multipv = analysis_params(request.args, MAX_MULTIPV)
+        # Limites facultatives : la recherche s'arrête à la première atteinte
+        nodes, movetime = search_limits(request.args)
+
+        with admission.slot(cancel.remaining()):
+            try:
+                fen = process_image_data(data, request_session_id(request.headers, request.args))
+            except ImageDecodeError:
+                return no_image_response()
+            if fen is None:
+                logger.error("Failed to process image into FEN")
+                return split_error_response()
+
+            try:
+                with cancel_monitor.watch(cancel):
+                    analysis = best_move_from_stockfish(fen, skill_level, depth, multipv, cancel, nodes, movetime)
+                return analysis_body(fen, analysis, multipv)
+            except SearchCancelled as e:
+                logger.info(f"Analysis cancelled: {e.reason}")
+                return search_cancelled_response(e)
+            except Exception as e:
+                return analysis_failed_response(e)
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    except Exception as e:
+        return error_response(e)
+
+
+def read_request_image():
+    """Extrait l'image encodée d'une requête (voir request_handling.request_image)."""
+    return request_image(request.files, request.get_json() if request.is_json else None)
+
+
+def read_batch_images():
+    """Extrait les images d'une requête de lot (voir request_handling.batch_images)."""
+    return batch_images(
+        request.files,
+        request.get_data() if request.mimetype == "application/zip" else None,
+        request.get_json(silent=True) if request.is_json else None,
+        max_images=BATCH_MAX_IMAGES,
+        max_image_size=MAX_UPLOAD_SIZE,
+        max_total_size=BATCH_MAX_UNCOMPRESSED,
+    )
+
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    try:
+        logger.debug("Received batch analyze request")
+        cancel = request_cancel_token()
 
         try:
-            move, score = best_move_from_stockfish(fen, skill_level, depth)
-            response = {
-                "fen": fen,
-                "best_move": move,
-                "score": score,
-                "status": "success",
-                "timestamp": datetime.now().isoformat()
-            }
-            logger.info(f"Analysis successful: {response}")
-            return jsonify(response)
-        except Exception as e:
-            error_msg = f"Analysis failed: {str(e)}"
-            logger.error(error_msg)
-            return jsonify({
-                "error": str(e),
-                "status": "error",
-                "details": error_msg,
-                "timestamp": datetime.now().isoformat()
-            }), 500
+            key_valid = verify_api_key(request.headers.get('X-API-Key'))
+        except DBPoolExhausted:
+            return db_busy_response()
+        if not key_valid:
+            return invalid_key_response()
+
+        try:
+            blobs = read_batch_images()
+        except zipfile.BadZipFile:
+            blobs = []
+        except BatchTooLarge as e:
+            return batch_too_large_response(e)
+        if not blobs:
+            return no_image_response()
+        if len(blobs) > BATCH_MAX_IMAGES:
+            return too_many_images_response(BATCH_MAX_IMAGES)
+
+        skill_level, depth, multipv = analysis_params(request.args, MAX_MULTIPV)
+        logger.debug("Batch of %d images - Skill: %s, Depth: %s", len(blobs), skill_level, depth)
+
+        with admission.slot(cancel.remaining()):
+            fens = process_images_data(blobs)
+
+        # Une seule recherche par position distincte, réparties sur le pool de moteurs
+        unique_fens = list(dict.fromkeys(fen for fen in fens if fen is not None))
+        analyses = {}
+        if unique_fens:
+            def analyse(fen):
+                try:
+                    # Une place par recherche : un lot n'occupe pas plus de moteurs que l'admission n'en accorde
+                    with admission.slot(cancel.remaining()):
+                        return fen, best_move_from_stockfish(fen, skill_level, depth, multipv, cancel), None
+                except Exception as e:
+                    return fen, None, str(e)
+
+            with cancel_monitor.watch(cancel), \
+                    ThreadPoolExecutor(max_workers=min(engine_pool.size, len(unique_fens))) as executor:
+                # Chaque analyse garde le contexte de la requête (mesure des étapes)
+                futures = [executor.submit(contextvars.copy_context().run, analyse, fen) for fen in unique_fens]
+                for future in futures:
+                    fen, result, error = future.result()
+                    analyses[fen] = (result, error)
+
+        return batch_body(fens, analyses, multipv)
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
 
     except Exception as e:
-        error_msg = f"Unexpected error: {str(e)}\n{traceback.format_exc()}"
-        logger.error(error_msg)
-        return jsonify({
-            "error": str(e),
-            "status": "error",
-            "details": error_msg,
-            "timestamp": datetime.now().isoformat()
-        }), 500
+        return error_response(e)
+
+
+@app.route("/analyze/stream", methods=["POST"])
+def analyze_stream():
+    """
+    Comme /analyze, mais renvoie les résultats intermédiaires du moteur au fil
+    de la recherche (Server-Sent Events, ou lignes JSON avec ?format=ndjson).
+    Fermer la connexion arrête la recherche et libère le moteur.
+
+    Soumis au contrôle d'admission comme /analyze : la place est gardée
+    jusqu'à la fin de l'envoi de la réponse.
+    """
+    cancel = request_cancel_token()
+    with ExitStack() as admitted:
+        try:
+            logger.debug("Received streaming analyze request")
+
+            try:
+                key_valid = verify_api_key(request.headers.get('X-API-Key'))
+            except DBPoolExhausted:
+                return db_busy_response()
+            if not key_valid:
+                return invalid_key_response()
+
+            data = read_request_image()
+            if not data:
+                return no_image_response()
+
+            skill_level, depth, multipv = analysis_params(request.args, MAX_MULTIPV)
+            movetime, use_sse = stream_params(request.args, STREAM_MAX_MOVETIME)
+
+            admitted.enter_context(admission.slot(cancel.remaining()))
+            try:
+                fen = process_image_data(data, request_session_id(request.headers, request.args))
+            except ImageDecodeError:
+                return no_image_response()
+            if fen is None:
+                return split_error_response()
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        except Exception as e:
+            return error_response(e)
+        # Rendue à la fermeture de la réponse (fin de l'envoi ou client déconnecté)
+        release = admitted.pop_all().close
+
+    def generate():
+        yield stream_event("position", {"fen": fen}, use_sse)
+
+        cached = analysis_cache.get(fen, skill_level, depth) if multipv == 1 else None
+        if cached is not None:
+            yield stream_event("bestmove", dict(analysis_response(cached, multipv), cached=True), use_sse)
+            return
+
+        try:
+            with engine_pool.engine(timeout=checkout_timeout(cancel)) as stockfish:
+                prepare_engine(stockfish, fen, skill_level, multipv)
+                search = stream_search(stockfish, depth=depth, movetime=movetime)
+                last = None
+                try:
+                    for kind, payload in search:
+                        if kind == "info":
+                            if payload["multipv"] == 1:
+                                last = payload
+                            yield stream_event("info", payload, use_sse)
+                        else:
+                            yield stream_event("bestmove", stream_bestmove(payload, last), use_sse)
+                except GeneratorExit:
+                    # Client déconnecté : stop envoyé au moteur, qui retourne au pool
+                    search.close()
+                    logger.info("Streaming analysis cancelled by client")
+                    return
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {str(e)}")
+            yield stream_event("error", {"error": str(e), "status": "error"}, use_sse)
+
+    response = Response(stream_with_context(generate()), mimetype=stream_mimetype(use_sse), headers=STREAM_HEADERS)
+    response.call_on_close(release)
+    return response
 
 
 @app.route("/user_settings", methods=["GET"])
 def get_user_settings():
     api_key = request.headers.get('X-API-Key')
     if not api_key:
-        return jsonify({"error": "missing_api_key"}), 400
-
-    connection = get_db_connection()
-    if not connection:
-        return jsonify({"error": "db_connection_failed"}), 500
+        return {"error": "missing_api_key"}, 400
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        # 1. Trouver le userId associé à la clé
-        cursor.execute("SELECT userId FROM ApiKey WHERE keyValue = %s AND isActive = 1", (api_key,))
-        row = cursor.fetchone()
-        if not row:
-            return jsonify({"error": "invalid_api_key"}), 401
-        user_id = row["userId"]
-
-        # 2. Récupérer les settings
-        cursor.execute("SELECT * FROM UserSettings WHERE userId = %s", (user_id,))
-        settings = cursor.fetchone()
-        if not settings:
-            return jsonify({"error": "no_settings_found"}), 404
-
-        return jsonify({"settings": settings})
+        with db_pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                # 1. Trouver le userId associé à la clé
+                cursor.execute(USER_ID_QUERY, (api_key,))
+                row = cursor.fetchone()
+                if not row:
+                    return {"error": "invalid_api_key"}, 401
+
+                # 2. Récupérer les settings
+                cursor.execute(USER_SETTINGS_QUERY, (row["userId"],))
+                settings = cursor.fetchone()
+                if not settings:
+                    return {"error": "no_settings_found"}, 404
+
+                return {"settings": settings}
+            finally:
+                cursor.close()
+    except DBPoolExhausted:
+        return db_busy_response()
+    except DBConnectionError as e:
+        logger.error(str(e))
+        return {"error": "db_connection_failed"}, 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        return {"error": str(e)}, 500
 
 
 @app.route("/user_settings", methods=["POST"])
 def update_user_settings():
     api_key = request.headers.get('X-API-Key')
     if not api_key:
-        return jsonify({"error": "missing_api_key"}), 400
+        return {"error": "missing_api_key"}, 400
 
-    data = request.json or {}
-    skill_level = data.get("skillLevel")
-    search_depth = data.get("searchDepth")
-
-    connection = get_db_connection()
-    if not connection:
-        return jsonify({"error": "db_connection_failed"}), 500
+    skill_level, search_depth = settings_update(request.get_json(silent=True))
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT userId FROM ApiKey WHERE keyValue = %s AND isActive = 1", (api_key,))
-        row = cursor.fetchone()
-        if not row:
-            return jsonify({"error": "invalid_api_key"}), 401
-        user_id = row["userId"]
-
-        # Mettre à jour les settings
-        cursor.execute(
-            "UPDATE UserSettings SET skillLevel = %s, searchDepth = %s, updatedAt = NOW() WHERE userId = %s",
-            (skill_level, search_depth, user_id)
-        )
-        connection.commit()
-        return jsonify({"status": "success"})
+        with db_pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(USER_ID_QUERY, (api_key,))
+                row = cursor.fetchone()
+                if not row:
+                    return {"error": "invalid_api_key"}, 401
+
+                # Mettre à jour les settings
+                cursor.execute(UPDATE_SETTINGS_QUERY, (skill_level, search_depth, row["userId"]))
+                connection.commit()
+                return {"status": "success"}
+            finally:
+                cursor.close()
+    except DBPoolExhausted:
+        return db_busy_response()
+    except DBConnectionError as e:
+        logger.error(str(e))
+        return {"error": "db_connection_failed"}, 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        return {"error": str(e)}, 500
+
+
+def admin_request_allowed():
+    return is_admin_request(request.remote_addr, request.headers.get(ADMIN_TOKEN_HEADER), ADMIN_ALLOWED_IPS, ADMIN_TOKEN)
+
+
+@app.route("/api_keys/invalidate", methods=["POST"])
+def invalidate_api_keys():
+    # Appelé par le backend du site après la désactivation d'une clé (voir ADMIN_ALLOWED_IPS, ADMIN_TOKEN)
+    if not admin_request_allowed():
+        return forbidden_response()
+    return invalidate_api_key_cache(api_key_cache, request.get_json(silent=True))
+
+
+# Pools et caches dont les stats() sont exposées par /stats et /metrics
+stats_sources = {
+    "engine_pool": engine_pool,
+    "db_pool": db_pool,
+    "analysis_cache": analysis_cache,
+    "image_cache": image_cache,
+    "api_key_cache": api_key_cache,
+    "board_sessions": board_sessions,
+    "geometry_cache": geometry_cache,
+    "recognition_pool": recognition_pool,
+    "logging": logging_pipeline,
+    "search_flights": search_flights,
+    "admission": admission,
+    "cancel_monitor": cancel_monitor,
+}
+for name, source in stats_sources.items():
+    registry.register_stats(name, source)
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    # Métriques internes des pools et caches (voir ADMIN_ALLOWED_IPS, ADMIN_TOKEN)
+    if not admin_request_allowed():
+        return forbidden_response()
+    return stats_body(stats_sources)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Format texte Prometheus : durées par route et par étape, pools et caches
+    if request.remote_addr not in METRICS_ALLOWED_IPS:
+        return forbidden_response()
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
     # Désactiver le mode debug en production
     debug_mode = os.getenv("FLASK_DEBUG", "False").lower() == "true"
-    app.run(debug=debug_mode, host="0.0.0.0", port=5001)
\ No newline at end of file
+    app.run(debug=debug_mode, host="0.0.0.0", port=API_PORT)
\ No newline at end of file
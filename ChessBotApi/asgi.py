@@ -0,0 +1,712 @@
+"""
+Serveur ASGI de l'API d'analyse (Quart) : mêmes routes et mêmes réponses JSON
+que api.py, mais une requête en attente (moteur, base de données) n'occupe
+plus de thread.
+
+Lancement : hypercorn ChessBotApi.asgi:app --bind 0.0.0.0:5001
+"""
+from quart import Quart, request, Response
+import os, sys, zipfile
+import asyncio
+import contextvars
+from contextlib import AsyncExitStack
+import functools
+import logging
+import time
+import traceback
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ChessBotApi.config import (
+    UPLOAD_FOLDER,
+    TEMPLATES_DIR,
+    TEMPLATES_RELOAD_INTERVAL,
+    STOCKFISH_PATH,
+    STOCKFISH_POOL_SIZE,
+    STOCKFISH_THREADS,
+    STOCKFISH_CHECKOUT_TIMEOUT,
+    ANALYSIS_CACHE_SIZE,
+    ANALYSIS_CACHE_TTL,
+    ANALYSIS_CACHE_DB,
+    IMAGE_CACHE_SIZE,
+    SESSION_MAX,
+    SESSION_TTL,
+    RECOGNITION_WORKERS,
+    RECOGNITION_BACKEND,
+    PIECE_MODEL_PATH,
+    SEARCH_MAX_MOVETIME,
+    STREAM_MAX_MOVETIME,
+    MAX_MULTIPV,
+    ADMISSION_MAX_ACTIVE,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT,
+    MAX_UPLOAD_SIZE,
+    BATCH_MAX_IMAGES,
+    BATCH_MAX_UNCOMPRESSED,
+    BATCH_CLASSIFY_CHUNK,
+    DB_CONFIG,
+    DB_POOL_CONFIG,
+    DB_BACKEND,
+    DB_SQLITE_PATH,
+    DB_SQLITE_LATENCY_MS,
+    API_KEY_CACHE_SIZE,
+    API_KEY_CACHE_TTL,
+    API_KEY_CACHE_NEGATIVE_TTL,
+    API_PORT,
+    ADMIN_ALLOWED_IPS,
+    ADMIN_TOKEN,
+    METRICS_ALLOWED_IPS,
+    DEBUG_TIMING,
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_JSON,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_QUEUE_SIZE,
+    LOG_DEBUG_SAMPLE_RATE,
+)
+from ChessBotApi.utils.template_bank import TemplateBank
+from ChessBotApi.utils.analysis_cache import AnalysisCache
+from ChessBotApi.utils.image_cache import ImageCache
+from ChessBotApi.utils.board_sessions import BoardSessionStore
+from ChessBotApi.utils.board_locator import BoardGeometryCache
+from ChessBotApi.utils.recognition import (
+    BoardRecognizer,
+    ImageDecodeError,
+    decode_image,
+    load_classifier,
+)
+from ChessBotApi.utils.recognition_pool import RecognitionPool
+from ChessBotApi.utils.api_key_cache import ApiKeyCache
+from ChessBotApi.utils.db_pool import DBConnectionError, DBPoolExhausted
+from ChessBotApi.utils.async_db_pool import AsyncDBPool
+from ChessBotApi.utils.sqlite_db import async_sqlite_connector
+from ChessBotApi.utils.async_engine import AsyncEnginePool, stream_search, run_search
+from ChessBotApi.utils.uci_search import analysis_response
+from ChessBotApi.utils.logging_setup import setup_logging
+from ChessBotApi.utils.single_flight import AsyncSingleFlight
+from ChessBotApi.utils.admission import AdmissionRejected, AsyncAdmissionController
+from ChessBotApi.utils.search_budget import is_forced_move, plan_search, resolve_without_search
+from ChessBotApi.utils.request_handling import (
+    ADMIN_TOKEN_HEADER,
+    API_KEY_QUERY,
+    BatchTooLarge,
+    STREAM_HEADERS,
+    UPDATE_SETTINGS_QUERY,
+    USER_ID_QUERY,
+    USER_SETTINGS_QUERY,
+    admission_rejected_response,
+    analysis_body,
+    analysis_failed_response,
+    analysis_params,
+    batch_too_large_response,
+    api_key_fallback,
+    api_key_result,
+    batch_body,
+    batch_images,
+    db_busy_response,
+    error_response,
+    forbidden_response,
+    invalid_key_response,
+    invalidate_api_key_cache,
+    is_admin_request,
+    no_image_response,
+    request_image,
+    request_session_id,
+    search_cancelled_response,
+    search_limits,
+    settings_update,
+    split_error_response,
+    stats_body,
+    stream_bestmove,
+    stream_event,
+    stream_mimetype,
+    stream_params,
+    too_many_images_response,
+)
+from ChessBotApi.utils.cancellation import (
+    DEADLINE_HEADER,
+    CancelToken,
+    SearchCancelled,
+    deadline_bucket,
+    parse_deadline,
+)
+from ChessBotApi.utils.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    current_timer,
+    finish_request,
+    registry,
+    stage,
+    start_request,
+    SEARCHES_CANCELLED,
+    SEARCHES_RESOLVED_EARLY,
+)
+
+app = Quart(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_SIZE
+
+# Journalisation non bloquante (file + thread d'écriture)
+logging_pipeline = setup_logging(
+    level=LOG_LEVEL,
+    log_file=LOG_FILE,
+    json_format=LOG_JSON,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    queue_size=LOG_QUEUE_SIZE,
+    debug_sample_rate=LOG_DEBUG_SAMPLE_RATE,
+)
+logger = logging.getLogger(__name__)
+
+if not os.path.exists(STOCKFISH_PATH):
+    raise FileNotFoundError(f"Stockfish non trouvé à {STOCKFISH_PATH}. Veuillez définir la variable d'environnement STOCKFISH_PATH.")
+
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# DB_BACKEND=sqlite : base locale à la place de MySQL (tests de charge)
+db_connect = async_sqlite_connector(DB_SQLITE_PATH, DB_SQLITE_LATENCY_MS) if DB_BACKEND == "sqlite" else None
+db_pool = AsyncDBPool(DB_CONFIG, connect=db_connect, **DB_POOL_CONFIG)
+api_key_cache = ApiKeyCache(
+    max_size=API_KEY_CACHE_SIZE,
+    ttl=API_KEY_CACHE_TTL,
+    negative_ttl=API_KEY_CACHE_NEGATIVE_TTL,
+)
+template_bank = TemplateBank(TEMPLATES_DIR, reload_interval=TEMPLATES_RELOAD_INTERVAL)
+image_cache = ImageCache(max_size=IMAGE_CACHE_SIZE)
+board_sessions = BoardSessionStore(max_sessions=SESSION_MAX, ttl=SESSION_TTL)
+# Position de l'échiquier détectée dans les captures de chaque session
+geometry_cache = BoardGeometryCache(max_sessions=SESSION_MAX, ttl=SESSION_TTL)
+recognizer = BoardRecognizer(
+    template_bank, image_cache, board_sessions,
+    classify_chunk=BATCH_CLASSIFY_CHUNK,
+    geometry_cache=geometry_cache,
+    classifier=load_classifier(RECOGNITION_BACKEND, PIECE_MODEL_PATH),
+)
+recognition_pool = RecognitionPool(
+    TEMPLATES_DIR,
+    workers=RECOGNITION_WORKERS,
+    image_cache_size=IMAGE_CACHE_SIZE,
+    classify_chunk=BATCH_CLASSIFY_CHUNK,
+    backend=RECOGNITION_BACKEND,
+    model_path=PIECE_MODEL_PATH,
+) if RECOGNITION_WORKERS > 0 else None
+engine_pool = AsyncEnginePool(
+    STOCKFISH_PATH,
+    size=STOCKFISH_POOL_SIZE,
+    threads_per_engine=STOCKFISH_THREADS,
+    checkout_timeout=STOCKFISH_CHECKOUT_TIMEOUT,
+)
+analysis_cache = AnalysisCache(
+    max_size=ANALYSIS_CACHE_SIZE,
+    ttl=ANALYSIS_CACHE_TTL,
+    db_path=ANALYSIS_CACHE_DB,
+)
+# Recherches identiques en cours, partagées entre les requêtes simultanées
+search_flights = AsyncSingleFlight()
+# Requêtes d'analyse traitées en parallèle ; au-delà, file d'attente bornée puis rejet (503)
+admission = AsyncAdmissionController(
+    ADMISSION_MAX_ACTIVE or 2 * engine_pool.size,
+    max_queue=ADMISSION_MAX_QUEUE,
+    max_wait=ADMISSION_MAX_WAIT,
+)
+# La reconnaissance (OpenCV/numpy) est du calcul pur : elle tourne hors de la boucle d'événements
+recognition_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="recognition")
+
+
+@app.before_serving
+async def startup():
+    await engine_pool.start()
+    logger.info(f"Pool Stockfish démarré avec {engine_pool.size} moteur(s)")
+
+
+@app.after_serving
+async def shutdown():
+    await engine_pool.close()
+    await db_pool.close()
+    analysis_cache.close()
+    recognition_executor.shutdown(wait=False)
+    if recognition_pool is not None:
+        recognition_pool.close()
+
+
+async def verify_api_key(api_key):
+    """
+    Vérifie une clé API (cache puis base de données).
+
+    Raises:
+        DBPoolExhausted: si la base est saturée et que la clé n'a jamais été vue
+    """
+    with stage("auth"):
+        return await _verify_api_key(api_key)
+
+
+async def _verify_api_key(api_key):
+    if not api_key:
+        return False
+
+    cached = api_key_cache.get(api_key)
+    if cached is not None:
+        return cached
+
+    try:
+        async with db_pool.connection() as connection:
+            cursor = await connection.cursor()
+            try:
+                await cursor.execute(API_KEY_QUERY, (api_key,))
+                row = await cursor.fetchone()
+            finally:
+                await cursor.close()
+        return api_key_result(api_key_cache, api_key, row)
+    except (DBPoolExhausted, DBConnectionError) as e:
+        return api_key_fallback(api_key_cache, api_key, e)
+    except Error as e:
+        logger.error(f"Erreur lors de la vérification de la clé API: {e}")
+        return False
+
+
+async def run_recognition(fn, *args):
+    # Le thread garde le contexte de la requête (mesure des étapes)
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(recognition_executor, call)
+
+
+def decode_and_recognize(data: bytes, session_id=None):
+    with stage("decode"):
+        img = decode_image(data)
+    if img is None:
+        raise ImageDecodeError("Image illisible")
+    return recognizer.process_image(img, session_id)
+
+
+def decode_and_recognize_many(blobs):
+    with stage("decode"):
+        imgs = [decode_image(blob) if blob else None for blob in blobs]
+    return recognizer.process_images(imgs)
+
+
+async def process_image_data(data: bytes, session_id=None):
+    """
+    Comme api.process_image_data : pool de processus s'il est activé (hors
+    sessions), sinon thread de reconnaissance.
+
+    Raises:
+        ImageDecodeError: si les données ne sont pas une image lisible
+    """
+    try:
+        if recognition_pool is None or session_id:
+            fen = await run_recognition(decode_and_recognize, data, session_id)
+        else:
+            fen = recognition_pool.result_fen(await asyncio.wrap_future(recognition_pool.submit(data)))
+        logger.debug("Generated FEN: %s", fen)
+        return fen
+    except ImageDecodeError:
+        raise
+    except Exception as e:
+        logger.error(f"Image processing error: {str(e)}\n{traceback.format_exc()}")
+        return None
+
+
+async def process_images_data(blobs):
+    if recognition_pool is None:
+        return await run_recognition(decode_and_recognize_many, blobs)
+    fens = []
+    for result in await asyncio.gather(*(asyncio.wrap_future(f) for f in recognition_pool.submit_many(blobs))):
+        fens.extend(recognition_pool.result_fens(result))
+    return fens
+
+
+def checkout_timeout(cancel: Optional[CancelToken]) -> float:
+    """Attente maximale d'un moteur libre : jamais au-delà de l'échéance de `cancel`."""
+    remaining = cancel.remaining() if cancel is not None else None
+    return STOCKFISH_CHECKOUT_TIMEOUT if remaining is None else min(STOCKFISH_CHECKOUT_TIMEOUT, remaining)
+
+
+async def search_position(fen: str, skill_level: int, depth: int, multipv: int,
+                          cancel: Optional[CancelToken] = None, nodes: Optional[int] = None,
+                          movetime: Optional[int] = None) -> dict:
+    """
+    Recherche sur un moteur du pool ; le résultat est mis en cache.
+
+    Mêmes limites que api.search_position. Annulée (client déconnecté :
+    Quart annule la requête ; échéance dépassée), la recherche reçoit "stop"
+    et le moteur retourne au pool.
+    """
+    forced = is_forced_move(fen)
+    try:
+        async with engine_pool.engine(timeout=checkout_timeout(cancel)) as engine:
+            await engine.prepare(fen, skill_level, multipv)
+            remaining = cancel.remaining() if cancel is not None else None
+            remaining_ms = remaining * 1000 if remaining is not None else None
+            limits = plan_search(depth, nodes, movetime, remaining_ms, SEARCH_MAX_MOVETIME, forced=forced)
+            with stage("search"):
+                analysis = await run_search(engine, **limits, stop_when_decisive=multipv == 1)
+    except asyncio.CancelledError:
+        expired = cancel is not None and cancel.cancelled
+        SEARCHES_CANCELLED.inc(reason="deadline" if expired else "disconnect")
+        raise
+    except TimeoutError:
+        if cancel is not None and cancel.cancelled:
+            SEARCHES_CANCELLED.inc(reason="deadline")
+            raise SearchCancelled("deadline")
+        raise
+
+    if forced:
+        # Coup forcé : recherche minimale, suffisante pour l'évaluation
+        analysis["resolved"] = "single_move"
+    if analysis.get("resolved"):
+        SEARCHES_RESOLVED_EARLY.inc(reason=analysis["resolved"])
+    complete = (analysis.get("resolved") or (depth > 0 and (analysis["depth"] or 0) >= depth)
+                or (limits["movetime"] >= SEARCH_MAX_MOVETIME and not limits["nodes"]))
+    if multipv == 1 and complete:
+        analysis_cache.put(fen, skill_level, depth, analysis)
+    return analysis
+
+
+async def best_move_from_stockfish(fen: str, skill_level=20, depth=15, multipv=1,
+                                   deadline: Optional[float] = None, nodes: Optional[int] = None,
+                                   movetime: Optional[int] = None) -> dict:
+    """
+    Comme api.best_move_from_stockfish, sans bloquer la boucle d'événements.
+
+    Raises:
+        SearchCancelled: si l'échéance `deadline` (time.monotonic) est dépassée
+    """
+    try:
+        if multipv == 1:
+            cached = analysis_cache.get(fen, skill_level, depth)
+            if cached is not None:
+                return cached
+
+        analysis = resolve_without_search(fen, skill_level, multipv)
+        if analysis is not None:
+            SEARCHES_RESOLVED_EARLY.inc(reason=analysis["resolved"])
+            return analysis
+
+        search = search_flights.do((fen, skill_level, depth, multipv, nodes, movetime, deadline_bucket(deadline)),
+                                   search_position, fen, skill_level, depth, multipv,
+                                   cancel=CancelToken(deadline), nodes=nodes, movetime=movetime)
+        if deadline is None:
+            return await search
+        try:
+            return await asyncio.wait_for(search, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise SearchCancelled("deadline")
+    except SearchCancelled:
+        raise
+    except Exception as e:
+        error_msg = f"Stockfish error: {str(e)}\n{traceback.format_exc()}"
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
+
+
+async def read_request_image():
+    """Extrait l'image d'une requête (voir request_handling.request_image)."""
+    return request_image(await request.files, await request.get_json() if request.is_json else None)
+
+
+async def read_batch_images():
+    """Extrait les images d'une requête de lot (voir request_handling.batch_images)."""
+    return batch_images(
+        await request.files,
+        await request.get_data() if request.mimetype == "application/zip" else None,
+        await request.get_json(silent=True) if request.is_json else None,
+        max_images=BATCH_MAX_IMAGES,
+        max_image_size=MAX_UPLOAD_SIZE,
+        max_total_size=BATCH_MAX_UNCOMPRESSED,
+    )
+
+
+@app.before_request
+async def start_timing():
+    start_request()
+
+
+@app.after_request
+async def finish_timing(response):
+    timer = current_timer()
+    if timer is not None:
+        finish_request(timer, request.endpoint or "unmatched", response.status_code)
+        if DEBUG_TIMING or request.headers.get("X-Debug-Timing"):
+            response.headers["X-Debug-Timing"] = timer.header()
+    return response
+
+
+@app.route("/analyze", methods=["POST"])
+async def analyze():
+    deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+    try:
+        try:
+            key_valid = await verify_api_key(request.headers.get('X-API-Key'))
+        except DBPoolExhausted:
+            return db_busy_response()
+        if not key_valid:
+            return invalid_key_response()
+
+        data = await read_request_image()
+        if not data:
+            return no_image_response()
+
+        skill_level, depth, multipv = analysis_params(request.args, MAX_MULTIPV)
+        nodes, movetime = search_limits(request.args)
+
+        async with admission.slot(deadline - time.monotonic() if deadline is not None else None):
+            try:
+                fen = await process_image_data(data, request_session_id(request.headers, request.args))
+            except ImageDecodeError:
+                return no_image_response()
+            if fen is None:
+                return split_error_response()
+
+            try:
+                analysis = await best_move_from_stockfish(fen, skill_level, depth, multipv, deadline, nodes, movetime)
+                return analysis_body(fen, analysis, multipv)
+            except SearchCancelled as e:
+                logger.info(f"Analysis cancelled: {e.reason}")
+                return search_cancelled_response(e)
+            except Exception as e:
+                return analysis_failed_response(e)
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/analyze/batch", methods=["POST"])
+async def analyze_batch():
+    deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+    try:
+        try:
+            key_valid = await verify_api_key(request.headers.get('X-API-Key'))
+        except DBPoolExhausted:
+            return db_busy_response()
+        if not key_valid:
+            return invalid_key_response()
+
+        try:
+            blobs = await read_batch_images()
+        except zipfile.BadZipFile:
+            blobs = []
+        except BatchTooLarge as e:
+            return batch_too_large_response(e)
+        if not blobs:
+            return no_image_response()
+        if len(blobs) > BATCH_MAX_IMAGES:
+            return too_many_images_response(BATCH_MAX_IMAGES)
+
+        skill_level, depth, multipv = analysis_params(request.args, MAX_MULTIPV)
+        async with admission.slot(deadline - time.monotonic() if deadline is not None else None):
+            fens = await process_images_data(blobs)
+
+        # Au plus une recherche par moteur pour ce lot, chacune avec sa place d'admission
+        unique_fens = list(dict.fromkeys(fen for fen in fens if fen is not None))
+        searches = asyncio.Semaphore(engine_pool.size)
+
+        async def analyse(fen):
+            try:
+                async with searches, admission.slot(deadline - time.monotonic() if deadline is not None else None):
+                    return await best_move_from_stockfish(fen, skill_level, depth, multipv, deadline), None
+            except Exception as e:
+                return None, str(e)
+
+        analyses = dict(zip(unique_fens, await asyncio.gather(*(analyse(fen) for fen in unique_fens))))
+
+        return batch_body(fens, analyses, multipv)
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/analyze/stream", methods=["POST"])
+async def analyze_stream():
+    """Comme /analyze/stream de api.py (Server-Sent Events ou ?format=ndjson), contrôle d'admission compris."""
+    cancel = CancelToken(parse_deadline(request.headers.get(DEADLINE_HEADER)))
+
+    async def generate(admitted):
+        # Démarré par la route : la place d'admission est rendue à la fermeture
+        # du générateur (aclose par Quart, ou finalisation si la réponse n'est jamais envoyée)
+        async with admitted:
+            yield None
+            yield stream_event("position", {"fen": fen}, use_sse)
+
+            cached = analysis_cache.get(fen, skill_level, depth) if multipv == 1 else None
+            if cached is not None:
+                yield stream_event("bestmove", dict(analysis_response(cached, multipv), cached=True), use_sse)
+                return
+
+            cancelled = None
+            try:
+                async with engine_pool.engine(timeout=checkout_timeout(cancel)) as engine:
+                    await engine.prepare(fen, skill_level, multipv)
+                    search = stream_search(engine, depth=depth, movetime=movetime)
+                    last = None
+                    try:
+                        async for kind, payload in search:
+                            if kind == "info":
+                                if payload["multipv"] == 1:
+                                    last = payload
+                                yield stream_event("info", payload, use_sse)
+                            else:
+                                yield stream_event("bestmove", stream_bestmove(payload, last), use_sse)
+                    except (asyncio.CancelledError, GeneratorExit) as e:
+                        # Client déconnecté : stop envoyé et sortie vidée, le moteur retourne au pool
+                        cancelled = e
+                    finally:
+                        await search.aclose()
+            except Exception as e:
+                logger.error(f"Streaming analysis failed: {str(e)}")
+                yield stream_event("error", {"error": str(e), "status": "error"}, use_sse)
+            if cancelled is not None:
+                logger.info("Streaming analysis cancelled by client")
+                if isinstance(cancelled, asyncio.CancelledError):
+                    raise cancelled
+
+    async with AsyncExitStack() as admitted:
+        try:
+            try:
+                key_valid = await verify_api_key(request.headers.get('X-API-Key'))
+            except DBPoolExhausted:
+                return db_busy_response()
+            if not key_valid:
+                return invalid_key_response()
+
+            data = await read_request_image()
+            if not data:
+                return no_image_response()
+
+            skill_level, depth, multipv = analysis_params(request.args, MAX_MULTIPV)
+            movetime, use_sse = stream_params(request.args, STREAM_MAX_MOVETIME)
+
+            await admitted.enter_async_context(admission.slot(cancel.remaining()))
+            try:
+                fen = await process_image_data(data, request_session_id(request.headers, request.args))
+            except ImageDecodeError:
+                return no_image_response()
+            if fen is None:
+                return split_error_response()
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        except Exception as e:
+            return error_response(e)
+        events = generate(admitted.pop_all())
+        await events.__anext__()
+
+    response = Response(events, mimetype=stream_mimetype(use_sse), headers=STREAM_HEADERS)
+    response.timeout = None
+    return response
+
+
+@app.route("/user_settings", methods=["GET"])
+async def get_user_settings():
+    api_key = request.headers.get('X-API-Key')
+    if not api_key:
+        return {"error": "missing_api_key"}, 400
+
+    try:
+        async with db_pool.connection() as connection:
+            cursor = await connection.cursor(dictionary=True)
+            try:
+                await cursor.execute(USER_ID_QUERY, (api_key,))
+                row = await cursor.fetchone()
+                if not row:
+                    return {"error": "invalid_api_key"}, 401
+
+                await cursor.execute(USER_SETTINGS_QUERY, (row["userId"],))
+                settings = await cursor.fetchone()
+                if not settings:
+                    return {"error": "no_settings_found"}, 404
+
+                return {"settings": settings}
+            finally:
+                await cursor.close()
+    except DBPoolExhausted:
+        return db_busy_response()
+    except DBConnectionError as e:
+        logger.error(str(e))
+        return {"error": "db_connection_failed"}, 500
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+
+@app.route("/user_settings", methods=["POST"])
+async def update_user_settings():
+    api_key = request.headers.get('X-API-Key')
+    if not api_key:
+        return {"error": "missing_api_key"}, 400
+
+    skill_level, search_depth = settings_update(await request.get_json(silent=True))
+
+    try:
+        async with db_pool.connection() as connection:
+            cursor = await connection.cursor(dictionary=True)
+            try:
+                await cursor.execute(USER_ID_QUERY, (api_key,))
+                row = await cursor.fetchone()
+                if not row:
+                    return {"error": "invalid_api_key"}, 401
+
+                await cursor.execute(UPDATE_SETTINGS_QUERY, (skill_level, search_depth, row["userId"]))
+                await connection.commit()
+                return {"status": "success"}
+            finally:
+                await cursor.close()
+    except DBPoolExhausted:
+        return db_busy_response()
+    except DBConnectionError as e:
+        logger.error(str(e))
+        return {"error": "db_connection_failed"}, 500
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+
+def admin_request_allowed():
+    return is_admin_request(request.remote_addr, request.headers.get(ADMIN_TOKEN_HEADER), ADMIN_ALLOWED_IPS, ADMIN_TOKEN)
+
+
+@app.route("/api_keys/invalidate", methods=["POST"])
+async def invalidate_api_keys():
+    if not admin_request_allowed():
+        return forbidden_response()
+    return invalidate_api_key_cache(api_key_cache, await request.get_json(silent=True))
+
+
+stats_sources = {
+    "engine_pool": engine_pool,
+    "db_pool": db_pool,
+    "analysis_cache": analysis_cache,
+    "image_cache": image_cache,
+    "api_key_cache": api_key_cache,
+    "board_sessions": board_sessions,
+    "geometry_cache": geometry_cache,
+    "recognition_pool": recognition_pool,
+    "logging": logging_pipeline,
+    "search_flights": search_flights,
+    "admission": admission,
+}
+for name, source in stats_sources.items():
+    registry.register_stats(name, source)
+
+
+@app.route("/stats", methods=["GET"])
+async def stats():
+    # Métriques internes des pools et caches (voir ADMIN_ALLOWED_IPS, ADMIN_TOKEN)
+    if not admin_request_allowed():
+        return forbidden_response()
+    return stats_body(stats_sources)
+
+
+@app.route("/metrics", methods=["GET"])
+async def metrics():
+    if request.remote_addr not in METRICS_ALLOWED_IPS:
+        return forbidden_response()
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=API_PORT)
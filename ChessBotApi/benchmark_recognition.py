@@ -0,0 +1,309 @@
+"""
+Mesure de la reconnaissance d'échiquiers : précision et latence.
+
+Le corpus est généré à partir de FEN avec les templates de pièces (tailles
+de case, thèmes, compression JPEG, bruit, position de l'échiquier dans la
+capture), ou lu depuis un dossier annoté (labels.json : fichier -> FEN).
+Le corpus généré n'utilise par défaut que les thèmes réservés (HELD_OUT_THEMES),
+absents de l'entraînement du classifieur, et une graine distincte des siennes ;
+les captures réelles sont comptées à part (condition « source »).
+Chaque moteur de reconnaissance (templates, model) décode puis reconnaît
+toutes les images ; le rapport donne la précision par case, la précision
+des FEN complètes, les percentiles de latence et le débit.
+
+Usage :
+    python -m ChessBotApi.benchmark_recognition
+    python -m ChessBotApi.benchmark_recognition --images 200 --json bench.json
+    python -m ChessBotApi.benchmark_recognition --baseline bench.json
+    python -m ChessBotApi.benchmark_recognition --themes all
+    python -m ChessBotApi.benchmark_recognition --write-corpus corpus/
+    python -m ChessBotApi.benchmark_recognition --corpus corpus/
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from ChessBotApi.config import PIECE_MODEL_PATH, TEMPLATES_DIR
+from ChessBotApi.utils.board_renderer import (
+    BOARD_THEMES,
+    HELD_OUT_THEMES,
+    TRAINING_THEMES,
+    degrade,
+    load_pieces,
+    placement_squares,
+    render_board,
+)
+from ChessBotApi.utils.recognition import BoardRecognizer, decode_image, load_classifier
+from ChessBotApi.utils.template_bank import TemplateBank
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+# Positions fixes (ouverture, milieu de partie, finales) complétées par des positions aléatoires
+POSITIONS = [
+    START_FEN,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r2q1rk1/pp2bppp/2n1pn2/2pp4/3P1B2/2PBPN2/PP1N1PPP/R2Q1RK1 w - - 0 9",
+    "2r3k1/5ppp/p3p3/1p1nP3/3P4/P4N2/1P3PPP/2R3K1 w - - 0 25",
+    "8/5pk1/6p1/8/3K4/8/5P2/8 w - - 0 45",
+    "8/8/4k3/8/8/3QK3/8/8 w - - 0 60",
+]
+# Captures réelles annotées
+REAL_SAMPLES = [
+    ("ChessBotApp/screenshots/chessboard.png", START_FEN),
+]
+SQUARE_SIZES = (16, 24, 40, 64, 102, 128)
+JPEG_QUALITIES = (None, 90, 60)
+NOISE_LEVELS = (0.0, 4.0)
+# Couleur de l'interface autour de l'échiquier
+CANVAS_COLOR = (38, 36, 33)
+# Graine par défaut, distincte de celles de train_classifier (--seed et --seed + 1, 0 et 1 par défaut)
+BENCHMARK_SEED = 1000
+
+
+def random_position(rng) -> str:
+    """Position aléatoire (deux rois, pions hors des rangées 1 et 8)."""
+    squares = ["."] * 64
+    free = list(rng.permutation(64))
+    squares[free.pop()] = "K"
+    squares[free.pop()] = "k"
+    for _ in range(int(rng.integers(0, 24))):
+        piece = str(rng.choice(list("PPPPNBRQpppppnbrq")))
+        square = free.pop()
+        if piece in "Pp" and square // 8 in (0, 7):
+            continue
+        squares[square] = piece
+    rows = []
+    for row in range(8):
+        text, empty = "", 0
+        for char in squares[row * 8:(row + 1) * 8]:
+            if char == ".":
+                empty += 1
+                continue
+            text += (str(empty) if empty else "") + char
+            empty = 0
+        rows.append(text + (str(empty) if empty else ""))
+    return "/".join(rows) + " w - - 0 1"
+
+
+def synthetic_corpus(count: int, seed: int, templates_dir: str, themes=HELD_OUT_THEMES):
+    """
+    Images encodées générées à partir de FEN, avec leurs conditions de rendu,
+    suivies des captures réelles annotées.
+
+    Returns:
+        Liste (nom, données encodées, FEN attendue, conditions)
+    """
+    rng = np.random.default_rng(seed)
+    pieces = load_pieces(templates_dir)
+    positions = POSITIONS + [random_position(rng) for _ in range(max(0, count // 4))]
+    corpus = []
+    for index in range(count):
+        fen = positions[index % len(positions)]
+        conditions = {
+            "source": "synthetic",
+            "square_size": int(rng.choice(SQUARE_SIZES)),
+            "theme": str(rng.choice(list(themes))),
+            "jpeg": JPEG_QUALITIES[rng.integers(len(JPEG_QUALITIES))],
+            "noise": float(rng.choice(NOISE_LEVELS)),
+        }
+        board = render_board(fen, pieces, conditions["square_size"], conditions["theme"],
+                             coordinates=bool(rng.random() < 0.7))
+        # L'échiquier est placé dans une capture plus grande, comme dans l'application
+        top, bottom, left, right = (int(v) for v in rng.integers(0, 2 * conditions["square_size"] + 1, 4))
+        capture = cv2.copyMakeBorder(board, top, bottom, left, right, cv2.BORDER_CONSTANT, value=CANVAS_COLOR)
+        capture = degrade(capture, noise=conditions["noise"], seed=index)
+        extension = ".jpg" if conditions["jpeg"] else ".png"
+        params = [cv2.IMWRITE_JPEG_QUALITY, conditions["jpeg"]] if conditions["jpeg"] else []
+        _, encoded = cv2.imencode(extension, capture, params)
+        corpus.append((f"synthetic_{index:04d}{extension}", encoded.tobytes(), fen, conditions))
+    for path, fen in REAL_SAMPLES:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read(), fen, {"source": "real"}))
+    return corpus
+
+
+def load_corpus(directory: str):
+    """Corpus annoté : labels.json associe chaque fichier du dossier à sa FEN."""
+    with open(os.path.join(directory, "labels.json"), encoding="utf-8") as f:
+        labels = json.load(f)
+    corpus = []
+    for name, entry in sorted(labels.items()):
+        fen, conditions = (entry, {}) if isinstance(entry, str) else (entry["fen"], entry.get("conditions", {}))
+        with open(os.path.join(directory, name), "rb") as f:
+            corpus.append((name, f.read(), fen, conditions))
+    return corpus
+
+
+def write_corpus(corpus, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    labels = {}
+    for name, data, fen, conditions in corpus:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        labels[name] = {"fen": fen, "conditions": conditions}
+    with open(os.path.join(directory, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(labels, f, indent=2)
+
+
+def run_engine(recognizer, corpus):
+    """
+    Décode et reconnaît chaque image (sans cache d'images).
+
+    Returns:
+        Dictionnaire des mesures, avec le détail par image dans "details"
+    """
+    # Premier passage hors mesure (allocations, caches de l'allocateur)
+    recognizer.process_image(decode_image(corpus[0][1]))
+
+    latencies, correct_squares, correct_fens, failures, details = [], 0, 0, 0, []
+    for name, data, fen, conditions in corpus:
+        expected = placement_squares(fen)
+        start = time.perf_counter()
+        try:
+            img = decode_image(data)
+            result = recognizer.process_image(img) if img is not None else None
+        except Exception:
+            result = None
+        latencies.append((time.perf_counter() - start) * 1000)
+        if result is None:
+            failures += 1
+            details.append({"image": name, "squares": 0, "fen": None})
+            continue
+        squares = sum(a == b for a, b in zip(placement_squares(result), expected))
+        correct_squares += squares
+        correct_fens += squares == 64
+        details.append({"image": name, "squares": squares, "fen": result.split()[0]})
+
+    latencies = np.array(latencies)
+    return {
+        "images": len(corpus),
+        "square_accuracy": correct_squares / (64 * len(corpus)),
+        "fen_accuracy": correct_fens / len(corpus),
+        "failures": failures,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "throughput": len(corpus) / (latencies.sum() / 1000),
+        "details": details,
+    }
+
+
+def breakdown(corpus, details, key: str):
+    """Précision des FEN complètes par valeur d'une condition de rendu."""
+    groups = {}
+    for (_, _, _, conditions), detail in zip(corpus, details):
+        if key in conditions:
+            total, correct = groups.get(conditions[key], (0, 0))
+            groups[conditions[key]] = (total + 1, correct + (detail["squares"] == 64))
+    return {value: correct / total for value, (total, correct) in groups.items()}
+
+
+def describe_corpus(args, themes) -> str:
+    """Origine du corpus, reprise dans le rapport et le fichier --json."""
+    if args.corpus:
+        return f"dossier annoté {args.corpus}"
+    seen = [theme for theme in themes if theme in TRAINING_THEMES]
+    held_out = "thèmes réservés" if not seen else f"dont thèmes d'entraînement {', '.join(seen)}"
+    real = sum(os.path.exists(path) for path, _ in REAL_SAMPLES)
+    return (f"{args.images} échiquiers générés ({held_out} : {', '.join(themes)} ; graine {args.seed})"
+            f" + {real} capture(s) réelle(s)")
+
+
+def print_report(corpus, results, description: str):
+    print(f"Corpus : {description}\n")
+    print(f"{'moteur':<10} {'images':>6} {'cases':>8} {'FEN':>8} {'échecs':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'img/s':>7}")
+    for engine, r in results.items():
+        print(f"{engine:<10} {r['images']:>6} {r['square_accuracy']:>8.2%} {r['fen_accuracy']:>8.2%} "
+              f"{r['failures']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['throughput']:>7.1f}")
+    for key in ("source", "square_size", "theme", "jpeg", "noise"):
+        print(f"\nFEN exactes par {key} :")
+        for engine, r in results.items():
+            groups = breakdown(corpus, r["details"], key)
+            cells = "  ".join(f"{value}={accuracy:.0%}"
+                              for value, accuracy in sorted(groups.items(), key=lambda item: str(item[0])))
+            print(f"  {engine:<10} {cells}")
+
+
+def compare_baseline(results, baseline, max_accuracy_drop: float, max_slowdown: float):
+    """
+    Returns:
+        Liste des régressions par rapport à une mesure précédente (--json)
+    """
+    regressions = []
+    for engine, r in results.items():
+        reference = baseline.get(engine)
+        if reference is None:
+            continue
+        for metric in ("square_accuracy", "fen_accuracy"):
+            if r[metric] < reference[metric] - max_accuracy_drop:
+                regressions.append(f"{engine}: {metric} {reference[metric]:.2%} -> {r[metric]:.2%}")
+        if r["p95_ms"] > reference["p95_ms"] * max_slowdown:
+            regressions.append(f"{engine}: p95 {reference['p95_ms']:.1f} ms -> {r['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précision et latence de la reconnaissance d'échiquiers")
+    parser.add_argument("--images", type=int, default=120, help="Nombre d'images synthétiques")
+    parser.add_argument("--seed", type=int, default=BENCHMARK_SEED)
+    parser.add_argument("--themes", default=",".join(HELD_OUT_THEMES),
+                        help="Thèmes du corpus généré, séparés par des virgules (all : tous, y compris "
+                             "ceux de l'entraînement)")
+    parser.add_argument("--templates", default=TEMPLATES_DIR)
+    parser.add_argument("--model", default=PIECE_MODEL_PATH)
+    parser.add_argument("--engines", default="templates,model", help="Moteurs mesurés, séparés par des virgules")
+    parser.add_argument("--corpus", help="Dossier annoté (labels.json) à la place du corpus synthétique")
+    parser.add_argument("--write-corpus", metavar="DIR", help="Enregistre le corpus synthétique et s'arrête")
+    parser.add_argument("--json", metavar="PATH", help="Enregistre les résultats")
+    parser.add_argument("--baseline", metavar="PATH", help="Résultats de référence (--json) à ne pas dégrader")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.005)
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    args = parser.parse_args()
+
+    themes = list(BOARD_THEMES) if args.themes == "all" else [theme.strip() for theme in args.themes.split(",")]
+    unknown = [theme for theme in themes if theme not in BOARD_THEMES]
+    if unknown:
+        parser.error(f"thèmes inconnus : {', '.join(unknown)}")
+    corpus = (load_corpus(args.corpus) if args.corpus
+              else synthetic_corpus(args.images, args.seed, args.templates, themes))
+    description = describe_corpus(args, themes)
+    if args.write_corpus:
+        write_corpus(corpus, args.write_corpus)
+        print(f"{len(corpus)} images enregistrées dans {args.write_corpus}")
+        return 0
+
+    results = {}
+    for engine in args.engines.split(","):
+        engine = engine.strip()
+        if engine == "model" and not os.path.exists(args.model):
+            print(f"Moteur model ignoré : {args.model} introuvable")
+            continue
+        recognizer = BoardRecognizer(TemplateBank(args.templates), classifier=load_classifier(engine, args.model))
+        results[engine] = run_engine(recognizer, corpus)
+    print_report(corpus, results, description)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus": description, **results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != description:
+            print(f"Attention : référence mesurée sur un autre corpus ({baseline.get('corpus', 'inconnu')})")
+        regressions = compare_baseline(results, baseline, args.max_accuracy_drop, args.max_slowdown)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
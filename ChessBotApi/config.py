@@ -0,0 +1,99 @@
+"""
+Configuration de l'API (variables d'environnement), partagée par
+le serveur Flask (api.py) et le serveur ASGI (asgi.py).
+"""
+import os
+
+UPLOAD_FOLDER = "uploads"
+# Port d'écoute de l'API (python -m ChessBotApi.api / ChessBotApi.asgi)
+API_PORT = int(os.getenv("API_PORT", 5001))
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
+TEMPLATES_DIR = "./ChessBotApi/templates"
+# Intervalle minimal (s) entre deux vérifications du dossier de templates
+TEMPLATES_RELOAD_INTERVAL = float(os.getenv("TEMPLATES_RELOAD_INTERVAL", 5.0))
+STOCKFISH_PATH = os.getenv("STOCKFISH_PATH", "/usr/games/stockfish")
+# Taille du pool de moteurs (vide = cœurs CPU / threads par moteur)
+STOCKFISH_POOL_SIZE = int(os.getenv("STOCKFISH_POOL_SIZE", 0)) or None
+STOCKFISH_THREADS = int(os.getenv("STOCKFISH_THREADS", 1))
+STOCKFISH_CHECKOUT_TIMEOUT = float(os.getenv("STOCKFISH_CHECKOUT_TIMEOUT", 30))
+# Cache des analyses (FEN, skill, depth) -> (coup, score)
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", 10000))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", 3600))
+ANALYSIS_CACHE_DB = os.getenv("ANALYSIS_CACHE_DB") or None
+# Cache empreinte d'image -> FEN
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", 1000))
+# Sessions de reconnaissance incrémentale (une par partie suivie par un client)
+SESSION_MAX = int(os.getenv("SESSION_MAX", 1000))
+SESSION_TTL = float(os.getenv("SESSION_TTL", 1800))
+# Processus de reconnaissance d'images (0 = reconnaissance dans le processus du serveur)
+RECOGNITION_WORKERS = int(os.getenv("RECOGNITION_WORKERS", 0))
+# Moteur de classification des cases : "templates" (corrélation) ou "model" (classifieur appris)
+RECOGNITION_BACKEND = os.getenv("RECOGNITION_BACKEND", "templates").lower()
+PIECE_MODEL_PATH = os.getenv("PIECE_MODEL_PATH", "./ChessBotApi/models/piece_classifier.npz")
+# Durée maximale d'une recherche /analyze (ms), réduite par ?movetime= et l'échéance X-Deadline-Ms
+SEARCH_MAX_MOVETIME = int(os.getenv("SEARCH_MAX_MOVETIME", 1000))
+# Durée maximale d'une recherche en streaming (ms)
+STREAM_MAX_MOVETIME = int(os.getenv("STREAM_MAX_MOVETIME", 10000))
+# Nombre maximal de lignes demandées avec ?multipv=N
+MAX_MULTIPV = int(os.getenv("MAX_MULTIPV", 10))
+# Contrôle d'admission des routes d'analyse : requêtes traitées en parallèle
+# (0 = deux par moteur Stockfish), file d'attente maximale et attente maximale en secondes
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", 0))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 32))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 2.0))
+# Taille maximale d'une requête, donc aussi d'une image envoyée seule (octets)
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 16 * 1024 * 1024))
+# Analyse par lot
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", 100))
+# Archive zip d'un lot : taille totale maximale une fois décompressée (chaque image reste limitée à MAX_UPLOAD_SIZE)
+BATCH_MAX_UNCOMPRESSED = int(os.getenv("BATCH_MAX_UNCOMPRESSED", 64 * 1024 * 1024))
+BATCH_CLASSIFY_CHUNK = 16  # Échiquiers classés ensemble (borne la mémoire du calcul matriciel)
+
+# Configuration de la base de données
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3307)),
+    'user': os.getenv('DB_USER', 'hess_user'),
+    'password': os.getenv('DB_PASSWORD', 'hess_password'),
+    'database': os.getenv('DB_NAME', 'hess_db')
+}
+
+# Base SQLite locale à la place de MySQL (DB_BACKEND=sqlite, tests de charge)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "chessbot_test.db")
+# Aller-retour réseau simulé pour chaque requête SQLite (ms)
+DB_SQLITE_LATENCY_MS = float(os.getenv("DB_SQLITE_LATENCY_MS", 0))
+
+# Pool de connexions MySQL
+DB_POOL_CONFIG = {
+    'size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 5)),
+    'recycle': float(os.getenv('DB_POOL_RECYCLE', 3600)),
+    'pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true',
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+}
+
+# Métriques (/metrics, format Prometheus) : adresses autorisées à les lire
+METRICS_ALLOWED_IPS = {ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()}
+# Routes d'administration (/api_keys/invalidate, /stats) : adresses autorisées et, si défini,
+# secret partagé avec le site à envoyer dans l'en-tête X-Admin-Token (nécessaire derrière un
+# proxy local, où toutes les requêtes semblent venir de 127.0.0.1)
+ADMIN_ALLOWED_IPS = {ip.strip() for ip in os.getenv("ADMIN_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()}
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# En-tête X-Debug-Timing sur toutes les réponses (sinon seulement si la requête le demande)
+DEBUG_TIMING = os.getenv("DEBUG_TIMING", "False").lower() == "true"
+
+# Journalisation : niveau (DEBUG = détail de chaque requête), fichier tournant, format
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "chessbot_api.log") or None
+LOG_JSON = os.getenv("LOG_FORMAT", "text").lower() == "json"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Fraction des messages DEBUG conservés (échantillonnage en charge)
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0))
+
+# Cache des vérifications de clés API (positives et négatives)
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", 10000))
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", 60))
+API_KEY_CACHE_NEGATIVE_TTL = float(os.getenv("API_KEY_CACHE_NEGATIVE_TTL", 10))
@@ -0,0 +1,449 @@
+"""
+Test de charge de l'API : /analyze, GET et POST /user_settings.
+
+Des clients virtuels (asyncio, bibliothèque standard uniquement) envoient
+des requêtes en boucle fermée (--concurrency) ou à débit fixe (--rate,
+arrivées de Poisson : la latence est alors mesurée depuis l'heure prévue
+de la requête). Les images sont des échiquiers générés à partir de FEN
+(--unique-images règle la part des requêtes servies par les caches).
+
+Avec --server flask|asgi, le serveur est lancé sur une base SQLite de test
+(DB_BACKEND=sqlite) et un Stockfish local ; --env transmet d'autres
+variables (taille des pools, caches...) pour comparer les configurations.
+Le rapport donne le débit, les percentiles de latence et le taux d'erreurs
+par route, ainsi que la file d'attente des moteurs relevée sur /stats.
+
+Usage :
+    python -m ChessBotApi.load_test --server flask --concurrency 16 --duration 30
+    python -m ChessBotApi.load_test --server asgi --env STOCKFISH_POOL_SIZE=4 --json asgi.json
+    python -m ChessBotApi.load_test --url http://127.0.0.1:5001 --api-key MA_CLE --rate 20
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from ChessBotApi.benchmark_recognition import POSITIONS, random_position
+from ChessBotApi.config import ADMIN_TOKEN, TEMPLATES_DIR
+from ChessBotApi.utils.board_renderer import load_pieces, render_board
+from ChessBotApi.utils.request_handling import ADMIN_TOKEN_HEADER
+from ChessBotApi.utils.sqlite_db import init_database
+
+ROUTES = ("analyze", "settings_get", "settings_post")
+# En-têtes des requêtes sur /stats (route d'administration)
+ADMIN_HEADERS = {ADMIN_TOKEN_HEADER: ADMIN_TOKEN} if ADMIN_TOKEN else {}
+# Temps maximal de démarrage du serveur (chargement des templates, moteurs)
+SERVER_START_TIMEOUT = 60
+
+
+class HTTPClient:
+    def __init__(self, host: str, port: int, timeout: float):
+        """Client HTTP/1.1 minimal avec connexion persistante (keep-alive)."""
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    async def _read_response(self):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connexion fermée par le serveur")
+        version, status = status_line.split()[:2]
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                body += await self._reader.readexactly(size)
+                await self._reader.readline()
+            body = bytes(body)
+        elif "content-length" in headers:
+            body = await self._reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self._reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close" or version == b"HTTP/1.0":
+            await self.close()
+        return int(status), headers, body
+
+    async def request(self, method: str, path: str, headers=None, body: bytes = b""):
+        """
+        Returns:
+            Tuple (code HTTP, en-têtes en minuscules, corps)
+        """
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        data = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+        for attempt in (0, 1):
+            reused = self._writer is not None
+            if not reused:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+            try:
+                self._writer.write(data)
+                await self._writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # Connexion persistante fermée par le serveur entre deux requêtes : un nouvel essai
+                if attempt or not reused:
+                    raise
+            except BaseException:
+                await self.close()
+                raise
+
+
+def render_images(count: int, seed: int, square_size: int):
+    """Échiquiers PNG distincts (positions fixes puis aléatoires), encodés en base64."""
+    rng = np.random.default_rng(seed)
+    pieces = load_pieces(TEMPLATES_DIR)
+    positions = (POSITIONS + [random_position(rng) for _ in range(count)])[:count]
+    images = []
+    for fen in positions:
+        board = render_board(fen, pieces, square_size)
+        capture = cv2.copyMakeBorder(board, 24, 24, 24, 24, cv2.BORDER_CONSTANT, value=(38, 36, 33))
+        _, encoded = cv2.imencode(".png", capture)
+        images.append(base64.b64encode(encoded.tobytes()).decode())
+    return images
+
+
+def parse_mix(text: str):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ROUTES:
+            raise SystemExit(f"Route inconnue dans --mix: {name} (attendu: {', '.join(ROUTES)})")
+        weights[name.strip()] = float(weight or 1)
+    return list(weights), list(weights.values())
+
+
+class LoadTest:
+    def __init__(self, args, images, api_keys):
+        self.args = args
+        self.images = images
+        self.api_keys = api_keys
+        url = urlsplit(args.url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.routes, self.weights = parse_mix(args.mix)
+        self.samples = {route: [] for route in ROUTES}
+        self.statuses = {route: {} for route in ROUTES}
+        self.queue_samples = []
+        self.stats_before = None
+        self.stats_after = None
+
+    def _build(self, route: str, rng: random.Random, api_key: str):
+        headers = {"X-API-Key": api_key}
+        if route == "analyze":
+            body = json.dumps({"image": rng.choice(self.images)}).encode()
+            headers["Content-Type"] = "application/json"
+            path = f"/analyze?skill_level={self.args.skill_level}&depth={self.args.depth}"
+            return "POST", path, headers, body
+        if route == "settings_get":
+            return "GET", "/user_settings", headers, b""
+        body = json.dumps({"skillLevel": rng.randint(1, 20), "searchDepth": rng.randint(5, 20)}).encode()
+        headers["Content-Type"] = "application/json"
+        return "POST", "/user_settings", headers, body
+
+    def _record(self, route: str, scheduled: float, status, measure_from: float):
+        if scheduled < measure_from:
+            return
+        latency = (time.perf_counter() - scheduled) * 1000
+        self.samples[route].append((latency, status is not None and 200 <= status < 300))
+        key = str(status) if status is not None else "exception"
+        self.statuses[route][key] = self.statuses[route].get(key, 0) + 1
+
+    async def _user(self, user: int, schedule, measure_from: float, stop_at: float):
+        rng = random.Random(self.args.seed * 1000 + user)
+        client = HTTPClient(self.host, self.port, self.args.timeout)
+        api_key = self.api_keys[user % len(self.api_keys)]
+        try:
+            while True:
+                if schedule is None:
+                    scheduled = time.perf_counter()
+                    if scheduled >= stop_at:
+                        return
+                else:
+                    scheduled = await schedule.get()
+                    if scheduled is None:
+                        return
+                    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                route = rng.choices(self.routes, self.weights)[0]
+                status = None
+                try:
+                    status, _, _ = await client.request(*self._build(route, rng, api_key))
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    pass
+                self._record(route, scheduled, status, measure_from)
+        finally:
+            await client.close()
+
+    async def _arrivals(self, schedule, start: float, stop_at: float):
+        """Heures d'arrivée d'un processus de Poisson de débit --rate."""
+        rng = random.Random(self.args.seed)
+        at = start
+        while True:
+            at += rng.expovariate(self.args.rate)
+            if at >= stop_at:
+                break
+            await schedule.put(at)
+        for _ in range(self.args.concurrency):
+            await schedule.put(None)
+
+    async def fetch_stats(self, client: HTTPClient):
+        try:
+            status, _, body = await client.request("GET", "/stats", ADMIN_HEADERS)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            return None
+        return json.loads(body) if status == 200 else None
+
+    async def _sampler(self, stop: asyncio.Event):
+        """Relève la file d'attente des moteurs et l'occupation des pools."""
+        client = HTTPClient(self.host, self.port, self.args.timeout)
+        try:
+            while not stop.is_set():
+                stats = await self.fetch_stats(client)
+                if stats is not None:
+                    self.queue_samples.append({
+                        "engine_waiting": stats["engine_pool"].get("waiting", 0),
+                        "engine_in_use": stats["engine_pool"].get("in_use", 0),
+                        "db_in_use": stats["db_pool"].get("in_use", 0),
+                    })
+                try:
+                    await asyncio.wait_for(stop.wait(), self.args.sample_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await client.close()
+
+    async def run(self):
+        stats_client = HTTPClient(self.host, self.port, self.args.timeout)
+        self.stats_before = await self.fetch_stats(stats_client)
+
+        start = time.perf_counter()
+        measure_from = start + self.args.warmup
+        stop_at = measure_from + self.args.duration
+        schedule = None
+        tasks = []
+        if self.args.rate:
+            schedule = asyncio.Queue(maxsize=self.args.concurrency * 4)
+            tasks.append(asyncio.create_task(self._arrivals(schedule, start, stop_at)))
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(self._sampler(stop))
+        tasks += [asyncio.create_task(self._user(user, schedule, measure_from, stop_at))
+                  for user in range(self.args.concurrency)]
+        await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - measure_from
+        stop.set()
+        await sampler
+
+        self.stats_after = await self.fetch_stats(stats_client)
+        await stats_client.close()
+
+    def report(self) -> dict:
+        routes = {}
+        everything = []
+        for route in ROUTES:
+            samples = self.samples[route]
+            if not samples:
+                continue
+            everything += samples
+            routes[route] = summarize(samples, self.elapsed)
+            routes[route]["statuses"] = self.statuses[route]
+        result = {"routes": routes, "total": summarize(everything, self.elapsed) if everything else None}
+        if self.queue_samples:
+            waiting = [sample["engine_waiting"] for sample in self.queue_samples]
+            result["engine_queue"] = {
+                "avg": float(np.mean(waiting)),
+                "max": int(max(waiting)),
+                "engine_utilisation": float(np.mean([s["engine_in_use"] for s in self.queue_samples])),
+                "db_in_use_max": int(max(s["db_in_use"] for s in self.queue_samples)),
+            }
+        if self.stats_before and self.stats_after:
+            result["server"] = server_deltas(self.stats_before, self.stats_after)
+        return result
+
+
+def summarize(samples, elapsed: float) -> dict:
+    latencies = np.array([latency for latency, _ in samples])
+    errors = sum(not ok for _, ok in samples)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples),
+        "throughput": len(samples) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def server_deltas(before: dict, after: dict) -> dict:
+    """Compteurs du serveur pendant le test (succès des caches, attente des moteurs)."""
+    deltas = {}
+    for name in ("analysis_cache", "image_cache", "api_key_cache"):
+        hits = after[name].get("hits", 0) - before[name].get("hits", 0)
+        misses = after[name].get("misses", 0) - before[name].get("misses", 0)
+        deltas[f"{name}_hit_rate"] = hits / (hits + misses) if hits + misses else None
+    engine = after["engine_pool"]
+    deltas["engine_timeouts"] = engine.get("timeouts", 0) - before["engine_pool"].get("timeouts", 0)
+    deltas["engine_wait_max_ms"] = engine.get("wait_time_max_ms")
+    deltas["db_timeouts"] = after["db_pool"].get("timeouts", 0) - before["db_pool"].get("timeouts", 0)
+    return deltas
+
+
+def print_report(result: dict, args):
+    mode = f"débit {args.rate}/s" if args.rate else "boucle fermée"
+    print(f"\n{args.concurrency} clients, {mode}, {args.duration:.0f} s mesurées")
+    print(f"{'route':<14} {'requêtes':>8} {'req/s':>7} {'erreurs':>8} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = list(result["routes"].items()) + ([("total", result["total"])] if result["total"] else [])
+    for route, r in rows:
+        print(f"{route:<14} {r['requests']:>8} {r['throughput']:>7.1f} {r['error_rate']:>8.1%} "
+              f"{r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    for route, r in result["routes"].items():
+        print(f"  {route}: {r['statuses']}")
+    if "engine_queue" in result:
+        queue = result["engine_queue"]
+        print(f"File d'attente des moteurs : moyenne {queue['avg']:.2f}, max {queue['max']}, "
+              f"moteurs occupés en moyenne {queue['engine_utilisation']:.2f}, "
+              f"connexions DB max {queue['db_in_use_max']}")
+    if "server" in result:
+        print("Serveur :", ", ".join(
+            f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in result["server"].items()))
+
+
+def start_server(args, api_keys, workdir: str):
+    """Lance l'API (Flask ou ASGI) sur une base SQLite de test et attend qu'elle réponde."""
+    database = os.path.join(workdir, "loadtest.db")
+    init_database(database, api_keys)
+    port = urlsplit(args.url).port or 80
+    env = dict(os.environ, DB_BACKEND="sqlite", DB_SQLITE_PATH=database, API_PORT=str(port))
+    for item in args.env:
+        name, _, value = item.partition("=")
+        env[name] = value
+    if args.server == "flask":
+        command = [sys.executable, "-m", "ChessBotApi.api"]
+    else:
+        command = [sys.executable, "-m", "hypercorn", "ChessBotApi.asgi:app", "--bind", f"127.0.0.1:{port}"]
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    async def wait_ready():
+        client = HTTPClient("127.0.0.1", port, 2.0)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        try:
+            while time.monotonic() < deadline:
+                if process.poll() is not None:
+                    break
+                try:
+                    status, _, _ = await client.request("GET", "/stats", ADMIN_HEADERS)
+                    if status == 200:
+                        return True
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    await asyncio.sleep(0.3)
+            return False
+        finally:
+            await client.close()
+
+    if not asyncio.run(wait_ready()):
+        stop_server(process)
+        with open(os.path.join(workdir, "server.log"), "rb") as f:
+            sys.stderr.write(f.read().decode(errors="replace")[-4000:])
+        raise SystemExit("Le serveur n'a pas démarré")
+    return process
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API d'analyse")
+    parser.add_argument("--url", default="http://127.0.0.1:5001")
+    parser.add_argument("--server", choices=("flask", "asgi"),
+                        help="Lance le serveur sur une base SQLite de test (sinon : serveur existant)")
+    parser.add_argument("--env", action="append", default=[], metavar="NOM=VALEUR",
+                        help="Variable d'environnement du serveur lancé (répétable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients simultanés")
+    parser.add_argument("--rate", type=float, help="Débit d'arrivée (req/s) au lieu de la boucle fermée")
+    parser.add_argument("--duration", type=float, default=30, help="Durée mesurée (s)")
+    parser.add_argument("--warmup", type=float, default=5, help="Durée de chauffe non mesurée (s)")
+    parser.add_argument("--mix", default="analyze=8,settings_get=1,settings_post=1",
+                        help="Poids des routes (analyze, settings_get, settings_post)")
+    parser.add_argument("--unique-images", type=int, default=32, help="Nombre d'échiquiers différents envoyés")
+    parser.add_argument("--square-size", type=int, default=80)
+    parser.add_argument("--skill-level", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=15)
+    parser.add_argument("--api-key", action="append", default=[],
+                        help="Clé API (serveur existant) ; avec --server, des clés de test sont créées")
+    parser.add_argument("--api-keys", type=int, default=8, help="Nombre de clés de test créées avec --server")
+    parser.add_argument("--timeout", type=float, default=30, help="Délai maximal d'une requête (s)")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Période de relevé de /stats (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="Enregistre le rapport et les paramètres")
+    args = parser.parse_args()
+
+    api_keys = args.api_key or [f"loadtest-key-{i}" for i in range(args.api_keys)]
+    images = render_images(args.unique_images, args.seed, args.square_size)
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix="chessbot-loadtest-") as workdir:
+        if args.server:
+            process = start_server(args, api_keys, workdir)
+        try:
+            test = LoadTest(args, images, api_keys)
+            asyncio.run(test.run())
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    result = test.report()
+    print_report(result, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parameters": vars(args), **result}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Outils communs aux tests : attente active bornée et faux moteur de recherche."""
+import asyncio
+import threading
+import time
+
+from ChessBotApi.utils.cancellation import SearchCancelled
+
+
+def wait_until(predicate, timeout: float = 2.0):
+    """Attend que predicate() soit vrai (échec du test au-delà de `timeout`)."""
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "condition jamais atteinte"
+        time.sleep(0.005)
+
+
+class FakeEngine:
+    def __init__(self, stop_on_cancel: bool = True):
+        """
+        Recherche factice : bloque jusqu'à `release`, ou s'arrête dès que son
+        jeton est annulé (comme le "stop" envoyé à Stockfish).
+
+        Args:
+            stop_on_cancel: False pour un moteur qui termine sa recherche malgré l'annulation
+        """
+        self.stop_on_cancel = stop_on_cancel
+        self.release = threading.Event()
+        self.calls = 0
+        self.tokens = []
+        self._lock = threading.Lock()
+
+    def search(self, fen: str, cancel=None):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+            self.tokens.append(cancel)
+        while not self.release.wait(0.005):
+            if self.stop_on_cancel and cancel is not None and cancel.cancelled:
+                raise SearchCancelled(cancel.reason)
+        return f"{fen}#{number}"
+
+    async def async_search(self, fen: str, cancel=None):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+            self.tokens.append(cancel)
+        while not self.release.is_set():
+            await asyncio.sleep(0.005)
+        return f"{fen}#{number}"
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ChessBotApi.tests.helpers import wait_until
+from ChessBotApi.utils.admission import AdmissionController, AdmissionRejected, AsyncAdmissionController
+
+
+def test_requests_within_capacity_are_admitted_at_once():
+    admission = AdmissionController(max_active=2, max_queue=0)
+    with admission.slot(), admission.slot():
+        assert admission.stats()["active"] == 2
+    stats = admission.stats()
+    assert (stats["active"], stats["admitted"], stats["shed"]) == (0, 2, 0)
+
+
+def test_full_queue_rejects_immediately():
+    admission = AdmissionController(max_active=1, max_queue=0, max_wait=5.0)
+    with admission.slot():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with admission.slot():
+                pass
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after == 5
+    assert admission.stats()["shed_queue_full"] == 1
+
+
+def test_wait_is_bounded_by_the_request():
+    admission = AdmissionController(max_active=1, max_queue=4, max_wait=5.0)
+    with admission.slot():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with admission.slot(max_wait=0.02):
+                pass
+    assert rejected.value.reason == "timeout"
+    stats = admission.stats()
+    assert (stats["shed_timeout"], stats["queued"], stats["active"]) == (1, 0, 0)
+
+
+def test_slots_are_handed_over_in_arrival_order():
+    admission = AdmissionController(max_active=1, max_queue=4, max_wait=2.0)
+    order, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def request(number):
+        with admission.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                order.append(number)
+            with lock:
+                active[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        with admission.slot():
+            futures = []
+            for number in range(3):
+                futures.append(executor.submit(request, number))
+                wait_until(lambda: admission.stats()["queued"] == number + 1)
+        for future in futures:
+            future.result(timeout=2)
+
+    assert order == [0, 1, 2]
+    assert peak[0] == 1
+    stats = admission.stats()
+    assert (stats["admitted"], stats["active"], stats["queued"]) == (4, 0, 0)
+
+
+def test_async_slots_are_handed_over_in_arrival_order():
+    async def scenario():
+        admission = AsyncAdmissionController(max_active=1, max_queue=4, max_wait=2.0)
+        order = []
+
+        async def request(number):
+            async with admission.slot():
+                order.append(number)
+                await asyncio.sleep(0)
+
+        async with admission.slot():
+            tasks = []
+            for number in range(3):
+                tasks.append(asyncio.ensure_future(request(number)))
+                await asyncio.sleep(0)
+            assert admission.stats()["queued"] == 3
+        await asyncio.gather(*tasks)
+        return order, admission.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == [0, 1, 2]
+    assert (stats["admitted"], stats["active"], stats["queued"]) == (4, 0, 0)
+
+
+def test_async_rejections_and_cancelled_waiter():
+    async def scenario():
+        admission = AsyncAdmissionController(max_active=1, max_queue=1, max_wait=5.0)
+        async with admission.slot():
+            with pytest.raises(AdmissionRejected) as timeout:
+                async with admission.slot(max_wait=0.02):
+                    pass
+            waiter = asyncio.ensure_future(admission.slot().__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as queue_full:
+                async with admission.slot():
+                    pass
+            # Client parti pendant l'attente : sa place dans la file est libérée
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            assert admission.stats()["queued"] == 0
+        return timeout.value.reason, queue_full.value.reason, admission.stats()
+
+    timeout, queue_full, stats = asyncio.run(scenario())
+    assert (timeout, queue_full) == ("timeout", "queue_full")
+    assert (stats["shed"], stats["active"], stats["queued"]) == (2, 0, 0)
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from ChessBotApi.utils import analysis_cache
+from ChessBotApi.utils.analysis_cache import AnalysisCache
+
+FEN = "8/8/4k3/8/8/3QK3/8/8 w - - 0 60"
+
+
+def test_move_counters_are_ignored():
+    cache = AnalysisCache()
+    cache.put(FEN, 20, 15, ["d3d4", 900])
+    assert cache.get("8/8/4k3/8/8/3QK3/8/8 w - - 12 80", 20, 15) == ["d3d4", 900]
+    assert cache.get(FEN, 20, 10) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnalysisCache(max_size=2)
+    cache.put(FEN, 1, 1, "a")
+    cache.put(FEN, 2, 1, "b")
+    cache.get(FEN, 1, 1)
+    cache.put(FEN, 3, 1, "c")
+    assert cache.get(FEN, 2, 1) is None
+    assert cache.get(FEN, 1, 1) == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(analysis_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = AnalysisCache(ttl=60)
+    cache.put(FEN, 20, 15, "e2e4")
+    now[0] += 59
+    assert cache.get(FEN, 20, 15) == "e2e4"
+    now[0] += 2
+    assert cache.get(FEN, 20, 15) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_analyses_survive_a_restart(tmp_path):
+    path = str(tmp_path / "analysis.db")
+    cache = AnalysisCache(db_path=path)
+    cache.put(FEN, 20, 15, ["e2e4", 30])
+    cache.close()
+
+    restarted = AnalysisCache(db_path=path)
+    assert restarted.get(FEN, 20, 15) == ["e2e4", 30]
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.clear()
+    assert restarted.get(FEN, 20, 15) is None
+    restarted.close()
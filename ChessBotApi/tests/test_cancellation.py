@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from ChessBotApi.tests.helpers import wait_until
+from ChessBotApi.utils.cancellation import (
+    DEADLINE_BUCKET,
+    CancelMonitor,
+    CancelToken,
+    SearchCancelled,
+    deadline_bucket,
+    parse_deadline,
+)
+
+
+def test_parse_deadline():
+    before = time.monotonic()
+    assert before + 0.25 <= parse_deadline("250") <= time.monotonic() + 0.25
+    for value in (None, "", "abc", "0", "-5"):
+        assert parse_deadline(value) is None
+
+
+def test_deadline_bucket_separates_distant_deadlines():
+    assert deadline_bucket(None) is None
+    assert deadline_bucket(100.0) == deadline_bucket(100.0 + DEADLINE_BUCKET / 2)
+    assert deadline_bucket(100.0) != deadline_bucket(100.0 + DEADLINE_BUCKET)
+
+
+def test_callbacks_run_once_on_cancel():
+    token = CancelToken()
+    reasons = []
+    token.add_callback(reasons.append)
+    removed = token.add_callback(reasons.append)
+    token.remove_callback(removed)
+
+    token.cancel("disconnect")
+    token.cancel("deadline")
+    assert reasons == ["disconnect"]
+    assert token.reason == "disconnect"
+    with pytest.raises(SearchCancelled) as raised:
+        token.check()
+    assert raised.value.reason == "disconnect"
+
+
+def test_callback_added_after_cancel_runs_immediately():
+    token = CancelToken()
+    token.cancel("deadline")
+    reasons = []
+    token.add_callback(reasons.append)
+    assert reasons == ["deadline"]
+
+
+def test_deadline_expires_token():
+    token = CancelToken(time.monotonic() + 0.05)
+    assert not token.cancelled
+    assert 0 < token.remaining() <= 0.05
+    time.sleep(0.06)
+    assert token.cancelled
+    assert token.reason == "deadline"
+    assert token.remaining() == 0.0
+    assert CancelToken().remaining() is None
+
+
+def test_extend_deadline_keeps_the_latest():
+    now = time.monotonic()
+    token = CancelToken(now + 1)
+    token.extend_deadline(now + 0.5)
+    assert token.deadline == now + 1
+    token.extend_deadline(now + 2)
+    assert token.deadline == now + 2
+    token.extend_deadline(None)
+    assert token.deadline is None
+    # Sans échéance, aucune autre ne s'applique
+    token.extend_deadline(now + 3)
+    assert token.deadline is None
+
+
+def test_monitor_cancels_disconnected_and_expired_tokens():
+    monitor = CancelMonitor(interval=0.01)
+    disconnected = []
+    client = CancelToken(probe=lambda: bool(disconnected))
+    expiring = CancelToken(time.monotonic() + 0.03)
+    stops = []
+    client.add_callback(stops.append)
+    expiring.add_callback(stops.append)
+
+    with monitor.watch(client), monitor.watch(expiring):
+        assert monitor.stats() == {"watched": 2}
+        wait_until(lambda: expiring.cancelled)
+        assert not client.cancelled
+        disconnected.append(True)
+        wait_until(lambda: client.cancelled)
+
+    assert sorted(stops) == ["deadline", "disconnect"]
+    assert monitor.stats() == {"watched": 0}
+
+
+def test_monitor_ignores_tokens_without_deadline_or_probe():
+    monitor = CancelMonitor(interval=0.01)
+    with monitor.watch(CancelToken()):
+        assert monitor.stats() == {"watched": 0}
+    assert monitor._thread is None
@@ -0,0 +1,99 @@
+import pytest
+from mysql.connector import Error
+
+from ChessBotApi.utils.db_pool import DBConnectionError, DBPool, DBPoolExhausted
+
+
+class FakeConnection:
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = False
+        self.alive = True
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise Error("connexion perdue")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    def __init__(self):
+        self.connections = []
+        self.down = False
+
+    def connect(self, **config):
+        if self.down:
+            raise Error("serveur injoignable")
+        connection = FakeConnection(len(self.connections))
+        self.connections.append(connection)
+        return connection
+
+
+def make_pool(server, **options):
+    options = {"size": 1, "max_overflow": 1, "timeout": 0.05, **options}
+    return DBPool({}, connect=server.connect, **options)
+
+
+def test_connections_are_reused_and_rolled_back():
+    server = FakeServer()
+    pool = make_pool(server)
+    for _ in range(3):
+        with pool.connection() as connection:
+            assert connection is server.connections[0]
+    assert len(server.connections) == 1
+    assert server.connections[0].rollbacks == 3
+    assert pool.stats()["checkouts"] == 3
+
+
+def test_exhausted_pool_times_out_then_recovers():
+    server = FakeServer()
+    pool = make_pool(server)
+    with pool.connection(), pool.connection():
+        with pytest.raises(DBPoolExhausted):
+            with pool.connection():
+                pass
+        stats = pool.stats()
+        assert (stats["in_use"], stats["timeouts"], stats["utilisation"]) == (2, 1, 1.0)
+
+    # Au-delà de `size`, la connexion de débordement est fermée à son retour
+    assert sorted(c.closed for c in server.connections) == [False, True]
+    with pool.connection() as connection:
+        assert not connection.closed
+    assert len(server.connections) == 2
+    assert pool.stats()["in_use"] == 0
+
+
+def test_dead_or_old_connections_are_replaced():
+    server = FakeServer()
+    pool = make_pool(server)
+    with pool.connection():
+        pass
+    server.connections[0].alive = False
+    with pool.connection() as connection:
+        assert connection is server.connections[1]
+    assert server.connections[0].closed
+
+    pool.recycle = 0
+    with pool.connection() as connection:
+        assert connection is server.connections[2]
+    stats = pool.stats()
+    assert (stats["ping_failures"], stats["recycled"], stats["created"]) == (1, 1, 3)
+
+
+def test_connection_error_releases_the_slot():
+    server = FakeServer()
+    server.down = True
+    pool = make_pool(server, max_overflow=0)
+    for _ in range(2):
+        with pytest.raises(DBConnectionError):
+            with pool.connection():
+                pass
+    server.down = False
+    with pool.connection() as connection:
+        assert connection is server.connections[0]
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ChessBotApi.tests.helpers import FakeEngine, wait_until
+from ChessBotApi.utils.cancellation import CancelToken, SearchCancelled
+from ChessBotApi.utils.single_flight import AsyncSingleFlight, SingleFlight
+
+FEN = "8/8/4k3/8/8/3QK3/8/8 w - -"
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        yield pool
+
+
+@pytest.fixture
+def engine(executor):
+    engine = FakeEngine()
+    yield engine
+    # Débloque les recherches restantes avant l'arrêt de l'exécuteur, même si le test a échoué
+    engine.release.set()
+
+
+def start(executor, flight, engine, cancel=None, key=FEN):
+    """Lance un demandeur dans un thread et attend qu'il ait rejoint l'appel."""
+    before = flight.stats()
+    future = executor.submit(flight.do, key, engine.search, FEN, cancel=cancel)
+    wait_until(lambda: flight.stats()["leaders"] + flight.stats()["coalesced"]
+               > before["leaders"] + before["coalesced"])
+    wait_until(lambda: engine.calls > 0)
+    return future
+
+
+def test_concurrent_requests_share_one_search(executor, engine):
+    flight = SingleFlight()
+    futures = [start(executor, flight, engine) for _ in range(4)]
+    engine.release.set()
+
+    assert {future.result(timeout=2) for future in futures} == {f"{FEN}#1"}
+    assert engine.calls == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_error_is_raised_to_every_requester(executor, engine):
+    flight = SingleFlight()
+
+    def failing(fen, cancel=None):
+        engine.release.wait(2)
+        raise RuntimeError("moteur planté")
+
+    futures = [executor.submit(flight.do, FEN, failing, FEN)]
+    wait_until(lambda: flight.stats()["in_flight"] == 1)
+    futures.append(executor.submit(flight.do, FEN, failing, FEN))
+    wait_until(lambda: flight.stats()["coalesced"] == 1)
+    engine.release.set()
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=2)
+
+
+def test_cancelled_follower_leaves_search_running(executor, engine):
+    flight = SingleFlight()
+    leader_token, follower_token = CancelToken(), CancelToken()
+    leader = start(executor, flight, engine, leader_token)
+    follower = start(executor, flight, engine, follower_token)
+
+    follower_token.cancel("disconnect")
+    with pytest.raises(SearchCancelled):
+        follower.result(timeout=2)
+    assert not engine.tokens[0].cancelled
+
+    engine.release.set()
+    assert leader.result(timeout=2) == f"{FEN}#1"
+
+
+def test_cancelled_leader_keeps_search_for_follower(executor, engine):
+    flight = SingleFlight()
+    leader_token, follower_token = CancelToken(), CancelToken()
+    leader = start(executor, flight, engine, leader_token)
+    follower = start(executor, flight, engine, follower_token)
+
+    leader_token.cancel("disconnect")
+    time.sleep(0.05)
+    assert not engine.tokens[0].cancelled
+    engine.release.set()
+
+    assert follower.result(timeout=2) == f"{FEN}#1"
+    # Le meneur est parti : il ne renvoie pas le résultat calculé pour les autres
+    with pytest.raises(SearchCancelled):
+        leader.result(timeout=2)
+
+
+def test_search_stops_when_every_requester_cancelled(executor, engine):
+    flight = SingleFlight()
+    tokens = [CancelToken(), CancelToken()]
+    futures = [start(executor, flight, engine, token) for token in tokens]
+
+    for token in tokens:
+        token.cancel("disconnect")
+    for future in futures:
+        with pytest.raises(SearchCancelled):
+            future.result(timeout=2)
+    assert engine.tokens[0].reason == "disconnect"
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_abandoned_search_is_not_rejoined(executor, engine):
+    # Moteur qui finit sa recherche malgré le "stop" : l'appel abandonné reste en cours
+    flight = SingleFlight()
+    engine.stop_on_cancel = False
+    abandoned_token = CancelToken()
+    abandoned = start(executor, flight, engine, abandoned_token)
+    abandoned_token.cancel("disconnect")
+    assert flight.stats()["in_flight"] == 0
+
+    fresh = start(executor, flight, engine, CancelToken())
+    wait_until(lambda: engine.calls == 2)
+    assert not engine.tokens[1].cancelled
+    engine.release.set()
+
+    assert fresh.result(timeout=2) == f"{FEN}#2"
+    with pytest.raises(SearchCancelled):
+        abandoned.result(timeout=2)
+    assert flight.stats() == {"leaders": 2, "coalesced": 0, "in_flight": 0}
+
+
+def test_shared_deadline_is_the_latest_of_the_requesters(executor, engine):
+    flight = SingleFlight()
+    now = time.monotonic()
+    first = start(executor, flight, engine, CancelToken(now + 5))
+    second = start(executor, flight, engine, CancelToken(now + 10))
+    assert engine.tokens[0].deadline == pytest.approx(now + 10)
+
+    # Un demandeur sans échéance retire celle du calcul partagé
+    third = start(executor, flight, engine, CancelToken())
+    assert engine.tokens[0].deadline is None
+    engine.release.set()
+    for future in (first, second, third):
+        assert future.result(timeout=2) == f"{FEN}#1"
+
+
+def test_async_requests_share_one_search():
+    async def scenario():
+        flight, engine = AsyncSingleFlight(), FakeEngine()
+        tasks = [asyncio.ensure_future(flight.do(FEN, engine.async_search, FEN)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        engine.release.set()
+        return await asyncio.gather(*tasks), engine, flight
+
+    results, engine, flight = asyncio.run(scenario())
+    assert results == [f"{FEN}#1"] * 3
+    assert engine.calls == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 2, "in_flight": 0}
+
+
+def test_async_cancelled_waiter_leaves_search_running():
+    async def scenario():
+        flight, engine = AsyncSingleFlight(), FakeEngine()
+        leader = asyncio.ensure_future(flight.do(FEN, engine.async_search, FEN))
+        follower = asyncio.ensure_future(flight.do(FEN, engine.async_search, FEN))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        await asyncio.sleep(0.02)
+        engine.release.set()
+        return await follower, leader.cancelled(), engine.calls
+
+    assert asyncio.run(scenario()) == (f"{FEN}#1", True, 1)
+
+
+def test_async_abandoned_search_is_cancelled_and_not_rejoined():
+    async def scenario():
+        flight, engine = AsyncSingleFlight(), FakeEngine()
+        waiters = [asyncio.ensure_future(flight.do(FEN, engine.async_search, FEN, cancel=CancelToken()))
+                   for _ in range(2)]
+        await asyncio.sleep(0.02)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.sleep(0.02)
+        assert flight.stats()["in_flight"] == 0
+
+        fresh = asyncio.ensure_future(flight.do(FEN, engine.async_search, FEN, cancel=CancelToken()))
+        await asyncio.sleep(0.02)
+        engine.release.set()
+        return await fresh, engine.calls, flight.stats()
+
+    result, calls, stats = asyncio.run(scenario())
+    assert result == f"{FEN}#2"
+    assert calls == 2
+    assert stats == {"leaders": 2, "coalesced": 1, "in_flight": 0}
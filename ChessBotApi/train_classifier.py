@@ -0,0 +1,161 @@
+"""
+Entraînement du classifieur de cases (moteur de reconnaissance « model »).
+
+Le jeu de données est généré à partir des templates (ChessBotApi/templates) :
+chaque pièce est détourée puis replacée, avec des variations, sur des cases
+de plusieurs thèmes d'échiquier (couleurs, surbrillance du dernier coup,
+coordonnées dans les coins, résolution, flou, bruit, compression JPEG).
+Les thèmes HELD_OUT_THEMES n'y figurent pas : ils servent à benchmark_recognition.
+
+Usage :
+    python -m ChessBotApi.train_classifier
+    python -m ChessBotApi.train_classifier --compare ChessBotApp/screenshots/chessboard.png
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from ChessBotApi.config import PIECE_MODEL_PATH, TEMPLATES_DIR
+from ChessBotApi.utils.board_renderer import (
+    BOARD_THEMES,
+    HIGHLIGHTS,
+    TRAINING_THEMES,
+    compose_piece,
+    draw_coordinate,
+    load_pieces,
+)
+from ChessBotApi.utils.piece_model import PieceClassifier, square_features, train_softmax
+
+
+def render_square(rng, img, mask, size: int = 96):
+    """Génère une case aléatoire (thème, position, résolution, bruit) contenant la pièce."""
+    light, dark = BOARD_THEMES[TRAINING_THEMES[rng.integers(len(TRAINING_THEMES))]]
+    is_light = rng.random() < 0.5
+    color = light if is_light else dark
+    if rng.random() < 0.15:
+        color = HIGHLIGHTS[0] if is_light else HIGHLIGHTS[1]
+    # Case entourée des liserés des cases voisines (couleur opposée), pour
+    # simuler un rognage décalé de quelques pixels
+    margin = size // 10
+    canvas = np.empty((size + 2 * margin, size + 2 * margin, 3), dtype=np.uint8)
+    canvas[:] = dark if is_light else light
+    canvas[:margin, :margin] = canvas[:margin, -margin:] = light if is_light else dark
+    canvas[-margin:, :margin] = canvas[-margin:, -margin:] = light if is_light else dark
+    canvas[margin:-margin, margin:-margin] = color
+    square = canvas[margin:-margin, margin:-margin]
+
+    if mask is not None:
+        # Léger zoom et décalage de la pièce dans la case
+        compose_piece(square, img, mask, scale=rng.uniform(0.88, 1.08), shift=rng.uniform(-0.05, 0.05, 2) * size)
+
+    # Coordonnées dans les coins, dans la couleur de l'autre case
+    for characters, bottom_right in (("12345678", False), ("abcdefgh", True)):
+        if rng.random() < 0.35:
+            draw_coordinate(square, str(rng.choice(list(characters))), bottom_right,
+                            dark if is_light else light, scale=rng.uniform(0.78, 1.22))
+
+    jitter = (size * 0.04 * rng.uniform(-1, 1, 2)).astype(int)
+    square = canvas[margin + jitter[1]:margin + jitter[1] + size, margin + jitter[0]:margin + jitter[0] + size]
+
+    # Résolution de la capture
+    resolution = int(rng.integers(10, 130))
+    square = cv2.resize(square, (resolution, resolution), interpolation=cv2.INTER_AREA)
+    # Luminosité / contraste
+    square = cv2.convertScaleAbs(square, alpha=rng.uniform(0.85, 1.15), beta=rng.uniform(-20, 20))
+    if rng.random() < 0.3:
+        square = cv2.GaussianBlur(square, (3, 3), 0)
+    if rng.random() < 0.3:
+        noise = rng.normal(0, rng.uniform(1, 6), square.shape)
+        square = np.clip(square + noise, 0, 255).astype(np.uint8)
+    if rng.random() < 0.3:
+        _, encoded = cv2.imencode(".jpg", square, [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(40, 95))])
+        square = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return square
+
+
+def build_dataset(pieces, classes, samples_per_class: int, seed: int):
+    """
+    Returns:
+        Tuple (caractéristiques, indices de classe)
+    """
+    rng = np.random.default_rng(seed)
+    by_class = {}
+    for label, img, mask in pieces:
+        by_class.setdefault(label, []).append((img, mask))
+    squares, labels = [], []
+    for index, label in enumerate(classes):
+        sources = by_class[label]
+        for _ in range(samples_per_class):
+            img, mask = sources[rng.integers(len(sources))]
+            squares.append(render_square(rng, img, mask))
+            labels.append(index)
+    return square_features(squares), np.array(labels)
+
+
+def compare_backends(paths, classifier, repeat: int):
+    """Affiche la FEN et le temps moyen de reconnaissance des deux moteurs."""
+    from ChessBotApi.utils.recognition import BoardRecognizer
+    from ChessBotApi.utils.template_bank import TemplateBank
+
+    backends = {
+        "templates": BoardRecognizer(TemplateBank(TEMPLATES_DIR)),
+        "model": BoardRecognizer(TemplateBank(TEMPLATES_DIR), classifier=classifier),
+    }
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"{path}: image illisible")
+            continue
+        print(path)
+        for name, recognizer in backends.items():
+            fen = recognizer.process_image(img)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                recognizer.process_image(img)
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"  {name:<9} {elapsed:7.1f} ms  {fen}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraîne le classifieur de cases à partir des templates")
+    parser.add_argument("--templates", default=TEMPLATES_DIR)
+    parser.add_argument("--output", default=PIECE_MODEL_PATH)
+    parser.add_argument("--samples", type=int, default=400, help="Exemples générés par classe")
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs="*", metavar="IMAGE",
+                        help="Compare les deux moteurs sur des captures après l'entraînement")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pieces = load_pieces(args.templates)
+    classes = sorted({label for label, _, _ in pieces})
+    print(f"{len(pieces)} templates, {len(classes)} classes")
+
+    start = time.perf_counter()
+    features, labels = build_dataset(pieces, classes, args.samples, args.seed)
+    print(f"Jeu d'entraînement : {len(labels)} cases ({time.perf_counter() - start:.1f} s)")
+    start = time.perf_counter()
+    weights, bias, mean, std = train_softmax(features, labels, len(classes), epochs=args.epochs, seed=args.seed)
+    classifier = PieceClassifier(classes, weights, bias, mean, std)
+    print(f"Entraînement : {time.perf_counter() - start:.1f} s")
+
+    # Validation sur des cases générées avec une autre graine
+    val_features, val_labels = build_dataset(pieces, classes, max(50, args.samples // 4), args.seed + 1)
+    for name, x, y in (("entraînement", features, labels), ("validation", val_features, val_labels)):
+        accuracy = (classifier.predict_features(x).argmax(axis=1) == y).mean()
+        print(f"Précision {name} : {accuracy:.2%}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    classifier.save(args.output)
+    print(f"Modèle enregistré : {args.output}")
+
+    if args.compare:
+        compare_backends(args.compare, classifier, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
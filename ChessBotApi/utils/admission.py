@@ -0,0 +1,182 @@
+"""
+Contrôle d'admission des requêtes d'analyse.
+
+Au plus `max_active` requêtes font de la reconnaissance ou de la recherche
+en même temps ; les suivantes attendent dans une file bornée (ordre
+d'arrivée). File pleine ou attente trop longue : la requête est rejetée tout
+de suite (503 + Retry-After) plutôt que de faire grimper la latence de
+toutes les autres.
+"""
+import asyncio
+import collections
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from ChessBotApi.utils.metrics import record_stage
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée : file d'attente pleine ("queue_full") ou attente trop longue ("timeout")."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Requête refusée ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _AdmissionStats:
+    def __init__(self, max_active: int, max_queue: int, max_wait: float):
+        self.max_active = max(1, max_active)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.active = 0
+        self._stats = {
+            "admitted": 0,
+            "shed_queue_full": 0,
+            "shed_timeout": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+        }
+
+    def retry_after(self) -> int:
+        """Délai (s) conseillé au client rejeté : au moins l'attente maximale d'une place."""
+        return max(1, round(self.max_wait))
+
+    def _admitted(self, waited: float):
+        waited_ms = waited * 1000
+        self._stats["admitted"] += 1
+        self._stats["wait_time_total_ms"] += waited_ms
+        self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited_ms)
+        if waited:
+            record_stage("admission_wait", waited)
+
+    def _snapshot(self, queued: int) -> dict:
+        stats = dict(self._stats)
+        stats["active"] = self.active
+        stats["queued"] = queued
+        stats["max_active"] = self.max_active
+        stats["max_queue"] = self.max_queue
+        stats["shed"] = stats["shed_queue_full"] + stats["shed_timeout"]
+        return stats
+
+
+class AdmissionController(_AdmissionStats):
+    def __init__(self, max_active: int, max_queue: int = 32, max_wait: float = 2.0):
+        """
+        Args:
+            max_active: Requêtes traitées simultanément
+            max_queue: Requêtes en attente au-delà desquelles les nouvelles sont rejetées
+            max_wait: Attente maximale d'une place en secondes
+        """
+        super().__init__(max_active, max_queue, max_wait)
+        # Un Event par requête en attente, réveillée dans l'ordre d'arrivée
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, max_wait: Optional[float] = None):
+        """
+        Occupe une place pour la durée du bloc `with`.
+
+        Args:
+            max_wait: Attente maximale (défaut : celle du contrôleur)
+
+        Raises:
+            AdmissionRejected: file pleine ou aucune place libérée à temps
+        """
+        self._acquire(self.max_wait if max_wait is None else min(max_wait, self.max_wait))
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self, max_wait: float):
+        start = time.monotonic()
+        with self._lock:
+            if self.active < self.max_active and not self._waiters:
+                self.active += 1
+                self._admitted(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._stats["shed_queue_full"] += 1
+                raise AdmissionRejected("queue_full", self.retry_after())
+            ready = threading.Event()
+            self._waiters.append(ready)
+
+        ready.wait(max(0.0, max_wait))
+        with self._lock:
+            # Place transmise par _release juste après l'expiration : on la garde
+            if not ready.is_set():
+                self._waiters.remove(ready)
+                self._stats["shed_timeout"] += 1
+                raise AdmissionRejected("timeout", self.retry_after())
+            self._admitted(time.monotonic() - start)
+
+    def _release(self):
+        with self._lock:
+            if self._waiters:
+                # La place passe directement à la plus ancienne requête en attente
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return self._snapshot(len(self._waiters))
+
+
+class AsyncAdmissionController(_AdmissionStats):
+    def __init__(self, max_active: int, max_queue: int = 32, max_wait: float = 2.0):
+        """Équivalent de AdmissionController pour les coroutines (une boucle d'événements)."""
+        super().__init__(max_active, max_queue, max_wait)
+        self._waiters = collections.deque()
+
+    @asynccontextmanager
+    async def slot(self, max_wait: Optional[float] = None):
+        """
+        Raises:
+            AdmissionRejected: file pleine ou aucune place libérée à temps
+        """
+        await self._acquire(self.max_wait if max_wait is None else min(max_wait, self.max_wait))
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, max_wait: float):
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            self._admitted(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._stats["shed_queue_full"] += 1
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        start = time.monotonic()
+        ready = asyncio.get_running_loop().create_future()
+        self._waiters.append(ready)
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout=max(0.0, max_wait))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if ready.done():
+                # Place transmise au même moment : la rendre avant de partir
+                self._release()
+            else:
+                self._waiters.remove(ready)
+                ready.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._stats["shed_timeout"] += 1
+            raise AdmissionRejected("timeout", self.retry_after())
+        self._admitted(time.monotonic() - start)
+
+    def _release(self):
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        return self._snapshot(len(self._waiters))
@@ -0,0 +1,122 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_fen(fen: str) -> str:
+    """
+    Normalise un FEN pour la clé de cache.
+
+    Les compteurs de demi-coups et de coups (deux derniers champs) n'influencent
+    pas le meilleur coup retourné : ils sont ignorés.
+    """
+    fields = fen.split()
+    return ' '.join(fields[:4])
+
+
+class AnalysisCache:
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = 3600, db_path: Optional[str] = None):
+        """
+        Cache LRU/TTL des analyses Stockfish, indexé par (FEN normalisé, skill, depth).
+
+        Args:
+            max_size: Nombre maximal d'entrées gardées en mémoire
+            ttl: Durée de validité d'une entrée en secondes (None = pas d'expiration)
+            db_path: Fichier SQLite optionnel pour conserver les analyses entre deux redémarrages
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis ("
+                "fen TEXT NOT NULL, skill INTEGER NOT NULL, depth INTEGER NOT NULL, "
+                "value TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (fen, skill, depth))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _key(fen: str, skill_level: int, depth: int):
+        return normalize_fen(fen), int(skill_level), int(depth)
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, fen: str, skill_level: int, depth: int):
+        """Retourne l'analyse en cache ou None."""
+        key = self._key(fen, skill_level, depth)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM analysis WHERE fen = ? AND skill = ? AND depth = ?",
+                    key,
+                ).fetchone()
+                if row and not self._expired(row[1], now):
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, fen: str, skill_level: int, depth: int, value):
+        """Enregistre une analyse (valeur sérialisable en JSON)."""
+        key = self._key(fen, skill_level, depth)
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analysis (fen, skill, depth, value, created) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    key + (json.dumps(value), created),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM analysis")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class ApiKeyCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 60, negative_ttl: float = 10):
+        """
+        Cache en mémoire du résultat de la vérification des clés API.
+
+        Les clés valides (entrées positives) et invalides (entrées négatives)
+        sont gardées avec des durées de vie distinctes : une clé inconnue
+        martelée par un client ne coûte qu'une requête SQL par `negative_ttl`.
+
+        Args:
+            max_size: Nombre maximal de clés gardées (LRU)
+            ttl: Durée de vie d'une clé valide en secondes
+            negative_ttl: Durée de vie d'une clé invalide en secondes
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, api_key: str, allow_expired: bool = False) -> Optional[bool]:
+        """
+        Retourne True/False si la clé est en cache et encore valide, sinon None.
+
+        Avec `allow_expired`, une entrée expirée (mais pas encore évincée) est
+        aussi retournée : utile quand la base est momentanément indisponible.
+        """
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is not None:
+                is_active, expires = entry
+                if allow_expired or time.monotonic() < expires:
+                    self._entries.move_to_end(api_key)
+                    self._stats["hits"] += 1
+                    return is_active
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, api_key: str, is_active: bool):
+        ttl = self.ttl if is_active else self.negative_ttl
+        with self._lock:
+            self._entries[api_key] = (bool(is_active), time.monotonic() + ttl)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, api_key: Optional[str] = None):
+        """Oublie une clé (ex : après sa désactivation), ou toutes si aucune n'est donnée."""
+        with self._lock:
+            if api_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(api_key, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        return stats
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from mysql.connector import Error
+from mysql.connector import aio as mysql_aio
+
+from ChessBotApi.utils.db_pool import DBConnectionError, DBPoolExhausted
+from ChessBotApi.utils.metrics import record_stage
+
+
+class AsyncDBPool:
+    def __init__(self, config: dict, size: int = 5, max_overflow: int = 5,
+                 recycle: float = 3600, pre_ping: bool = True, timeout: float = 5.0,
+                 connect=None):
+        """
+        Équivalent asynchrone de DBPool (mysql.connector.aio) : mêmes paramètres,
+        mêmes exceptions et mêmes statistiques.
+
+        Args:
+            connect: Coroutine d'ouverture de connexion (défaut : mysql.connector.aio.connect)
+        """
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._connect_fn = connect or mysql_aio.connect
+
+        self._idle = []
+        # Créé à la première utilisation, dans la boucle d'événements du serveur
+        self._slots = None
+        self._stats = {
+            "in_use": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "wait_time_max_ms": 0.0,
+        }
+
+    async def _connect(self):
+        try:
+            connection = await self._connect_fn(**self.config)
+        except Error as e:
+            raise DBConnectionError(f"Erreur de connexion à la base de données: {e}") from e
+        self._stats["created"] += 1
+        return connection, time.monotonic()
+
+    @staticmethod
+    async def _close(connection):
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+    async def _usable(self, connection, created: float) -> bool:
+        if self.recycle is not None and time.monotonic() - created > self.recycle:
+            self._stats["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                await connection.ping(reconnect=False)
+            except Exception:
+                self._stats["ping_failures"] += 1
+                return False
+        return True
+
+    async def _acquire(self):
+        while self._idle:
+            connection, created = self._idle.pop()
+            if await self._usable(connection, created):
+                return connection, created
+            await self._close(connection)
+        return await self._connect()
+
+    async def _release(self, connection, created: float):
+        # Terminer toute transaction ouverte (voir DBPool._release)
+        try:
+            await connection.rollback()
+        except Exception:
+            await self._close(connection)
+            return
+        if len(self._idle) >= self.size:
+            await self._close(connection)
+        else:
+            self._idle.append((connection, created))
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Emprunte une connexion pour la durée du bloc `async with`.
+
+        Raises:
+            DBPoolExhausted: si toutes les connexions (débordement compris) restent occupées
+            DBConnectionError: si une nouvelle connexion ne peut pas être ouverte
+        """
+        if self._slots is None:
+            self._slots = asyncio.BoundedSemaphore(self.size + self.max_overflow)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise DBPoolExhausted(f"Aucune connexion MySQL disponible après {self.timeout}s")
+        waited_ms = (time.perf_counter() - start) * 1000
+        record_stage("db_wait", waited_ms / 1000)
+
+        try:
+            connection, created = await self._acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._stats["in_use"] += 1
+        self._stats["checkouts"] += 1
+        self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited_ms)
+
+        try:
+            yield connection
+        finally:
+            await self._release(connection, created)
+            self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["max_overflow"] = self.max_overflow
+        stats["idle"] = len(self._idle)
+        stats["utilisation"] = stats["in_use"] / (self.size + self.max_overflow)
+        return stats
+
+    async def close(self):
+        while self._idle:
+            connection, _ = self._idle.pop()
+            await self._close(connection)
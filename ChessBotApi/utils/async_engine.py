@@ -0,0 +1,304 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from stockfish import Stockfish
+
+from ChessBotApi.utils.engine_pool import default_pool_size
+from ChessBotApi.utils.metrics import record_stage
+from ChessBotApi.utils.uci_search import parse_info_line, go_command, build_analysis, is_decisive
+
+
+class AsyncEngine:
+    def __init__(self, path: str, threads: int = 1):
+        """
+        Processus Stockfish piloté par des pipes asyncio (serveur ASGI).
+
+        Même protocole que le wrapper `stockfish` utilisé par le serveur Flask,
+        mais aucune lecture ne bloque la boucle d'événements.
+
+        Args:
+            path: Chemin de l'exécutable Stockfish
+            threads: Option UCI "Threads"
+        """
+        self.path = path
+        self.threads = threads
+        self._process = None
+        self._options = {}
+        # Vrai si la dernière recherche a été interrompue par "stop" et sa sortie vidée :
+        # le moteur peut resservir même si la tâche qui l'utilisait a été annulée
+        self.stopped = False
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            self.path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        await self.send("uci")
+        await self.read_until("uciok")
+        await self.set_options({"Threads": self.threads})
+        await self.is_ready()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def send(self, command: str):
+        self._process.stdin.write(f"{command}\n".encode())
+        await self._process.stdin.drain()
+
+    async def read_line(self) -> str:
+        line = await self._process.stdout.readline()
+        if not line:
+            raise BrokenPipeError("Le processus Stockfish s'est arrêté")
+        return line.decode().strip()
+
+    async def read_until(self, prefix: str) -> str:
+        """Lit la sortie du moteur jusqu'à la première ligne commençant par `prefix`."""
+        while True:
+            line = await self.read_line()
+            if line.startswith(prefix):
+                return line
+
+    async def is_ready(self):
+        await self.send("isready")
+        await self.read_until("readyok")
+
+    async def set_options(self, options: dict):
+        """Envoie les options UCI qui ont changé depuis le dernier appel."""
+        changed = False
+        for name, value in options.items():
+            if self._options.get(name) == value:
+                continue
+            if isinstance(value, bool):
+                value_str = str(value).lower()
+            else:
+                value_str = str(value)
+            await self.send(f"setoption name {name} value {value_str}")
+            self._options[name] = value
+            changed = True
+        if changed:
+            await self.is_ready()
+
+    async def prepare(self, fen: str, skill_level: int, multipv: int = 1):
+        """Règle le moteur pour une nouvelle position (équivalent de api.prepare_engine)."""
+        if not Stockfish._is_fen_syntax_valid(fen):
+            raise ValueError(f"FEN invalide: {fen}")
+        await self.set_options({"UCI_LimitStrength": False, "Skill Level": skill_level, "MultiPV": multipv})
+        await self.send(f"position fen {' '.join(fen.split())}")
+
+    async def quit(self):
+        if self._process is None:
+            return
+        try:
+            await self.send("quit")
+            await asyncio.wait_for(self._process.wait(), timeout=1)
+        except Exception:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+
+
+async def stream_search(engine: AsyncEngine, depth: Optional[int] = None, movetime: Optional[int] = None,
+                        nodes: Optional[int] = None):
+    """
+    Version asynchrone de uci_search.stream_search.
+
+    Si le générateur est fermé (aclose) ou annulé avant la fin, "stop" est
+    envoyé et la sortie du moteur est vidée jusqu'à "bestmove".
+    """
+    engine.stopped = False
+    await engine.send(go_command(depth, movetime, nodes))
+    finished = False
+    try:
+        while True:
+            line = await engine.read_line()
+            if line.startswith("bestmove"):
+                finished = True
+                tokens = line.split()
+                best_move = tokens[1] if len(tokens) > 1 and tokens[1] != "(none)" else None
+                ponder = tokens[3] if len(tokens) > 3 and tokens[2] == "ponder" else None
+                yield "bestmove", {"best_move": best_move, "ponder": ponder}
+                return
+            info = parse_info_line(line)
+            if info is not None:
+                yield "info", info
+    finally:
+        if not finished and engine.alive:
+            await engine.send("stop")
+            await engine.read_until("bestmove")
+            engine.stopped = True
+
+
+async def run_search(engine: AsyncEngine, depth: Optional[int] = None, movetime: Optional[int] = None,
+                     nodes: Optional[int] = None, stop_when_decisive: bool = False) -> dict:
+    """Version asynchrone de uci_search.run_search (mêmes paramètres, même dictionnaire de résultat)."""
+    lines = {}
+    best = {"best_move": None, "ponder": None}
+    stopped = False
+    search = stream_search(engine, depth=depth, movetime=movetime, nodes=nodes)
+    try:
+        async for kind, payload in search:
+            if kind == "info":
+                lines[payload["multipv"]] = payload
+                if stop_when_decisive and not stopped and payload["multipv"] == 1 and is_decisive(payload):
+                    await engine.send("stop")
+                    stopped = True
+            else:
+                best = payload
+    finally:
+        await search.aclose()
+    analysis = build_analysis(lines, best)
+    if stopped:
+        analysis["resolved"] = "decisive"
+    return analysis
+
+
+class AsyncEnginePool:
+    def __init__(self, path: str, size: Optional[int] = None, threads_per_engine: int = 1,
+                 checkout_timeout: Optional[float] = None, health_check_interval: float = 30.0):
+        """
+        Équivalent asynchrone de EnginePool : mêmes paramètres, même politique
+        de remplacement des moteurs et mêmes statistiques.
+
+        Les moteurs sont lancés par `start()`, à appeler depuis la boucle d'événements.
+        """
+        self.path = path
+        self.threads_per_engine = max(1, threads_per_engine)
+        self.size = size or default_pool_size(self.threads_per_engine)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = None
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waiting": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+            "timeouts": 0,
+            "respawns": 0,
+            "failed_health_checks": 0,
+        }
+
+    async def start(self):
+        self._idle = asyncio.LifoQueue()
+        engines = await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+        for engine in engines:
+            self._idle.put_nowait((engine, time.monotonic()))
+
+    async def _spawn(self) -> AsyncEngine:
+        engine = AsyncEngine(self.path, self.threads_per_engine)
+        try:
+            await engine.start()
+        except Exception as e:
+            await engine.quit()
+            raise RuntimeError(f"Erreur lors de l'initialisation de Stockfish: {str(e)}")
+        return engine
+
+    async def _is_healthy(self, engine: AsyncEngine, idle_since: float) -> bool:
+        if not engine.alive:
+            return False
+        if time.monotonic() - idle_since >= self.health_check_interval:
+            try:
+                await asyncio.wait_for(engine.is_ready(), timeout=5)
+            except Exception:
+                return False
+        return True
+
+    async def _respawn(self, engine: Optional[AsyncEngine]) -> AsyncEngine:
+        if engine is not None:
+            await engine.quit()
+        self._stats["respawns"] += 1
+        return await self._spawn()
+
+    @asynccontextmanager
+    async def engine(self, timeout: Optional[float] = None):
+        """
+        Emprunte un moteur pour la durée du bloc `async with`.
+
+        Raises:
+            TimeoutError: si aucun moteur ne se libère dans le délai imparti
+        """
+        if self._closed or self._idle is None:
+            raise RuntimeError("Le pool Stockfish est fermé")
+        timeout = self.checkout_timeout if timeout is None else timeout
+
+        start = time.perf_counter()
+        self._stats["waiting"] += 1
+        try:
+            engine, idle_since = await asyncio.wait_for(self._idle.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"Aucun moteur Stockfish disponible après {timeout}s")
+        finally:
+            waited_ms = (time.perf_counter() - start) * 1000
+            self._stats["waiting"] -= 1
+            self._stats["wait_time_total_ms"] += waited_ms
+            self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited_ms)
+            record_stage("engine_wait", waited_ms / 1000)
+
+        self._stats["checkouts"] += 1
+
+        try:
+            if engine is None or not await self._is_healthy(engine, idle_since):
+                if engine is not None:
+                    self._stats["failed_health_checks"] += 1
+                engine = await self._respawn(engine)
+        except BaseException:
+            # L'emplacement reste vide : un nouveau processus sera tenté au prochain checkout
+            self._idle.put_nowait((None, 0.0))
+            raise
+
+        engine.stopped = False
+        try:
+            yield engine
+        except asyncio.CancelledError:
+            # Requête annulée pendant la recherche : "stop" déjà envoyé et sortie vidée
+            if engine.stopped and engine.alive and not self._closed:
+                self._idle.put_nowait((engine, time.monotonic()))
+            else:
+                await self._replace(engine)
+            raise
+        except BaseException:
+            await self._replace(engine)
+            raise
+        else:
+            if self._closed:
+                await engine.quit()
+            else:
+                self._idle.put_nowait((engine, time.monotonic()))
+
+    async def _replace(self, engine: AsyncEngine):
+        """Remplace un moteur dans un état inconnu par un nouveau processus."""
+        if self._closed:
+            await engine.quit()
+            return
+        try:
+            engine = await self._respawn(engine)
+        except Exception:
+            engine = None
+        self._idle.put_nowait((engine, time.monotonic()))
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["idle"] = self._idle.qsize() if self._idle is not None else 0
+        stats["in_use"] = self.size - stats["idle"]
+        checkouts = stats["checkouts"] or 1
+        stats["wait_time_avg_ms"] = stats["wait_time_total_ms"] / checkouts
+        return stats
+
+    async def close(self):
+        """Arrête tous les moteurs libres ; ceux en cours d'utilisation seront arrêtés à leur retour."""
+        self._closed = True
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            engine, _ = self._idle.get_nowait()
+            if engine is not None:
+                await engine.quit()
@@ -0,0 +1,244 @@
+import cv2
+import numpy as np
+
+from ChessBotApi.utils.preprocessing import normalize_rows, is_flat, FLAT_MARGIN
+
+# Mêmes pondérations que fen_builder.classify_square
+GRAY_WEIGHT = 0.8
+EDGE_WEIGHT = 0.4
+EMPTY_SQUARES = ('blackcase', 'whitecase')
+EMPTY_PENALTY = 1.23
+
+# Cascade de classify_board (seuils mesurés sur le corpus de benchmark_recognition)
+# Case vide : centre presque uni et sans contours (une pièce dépasse 20 d'écart-type)
+EMPTY_STD = 8.0
+EMPTY_EDGE_DENSITY = 0.03
+# Au-delà, la case contient forcément une pièce (templates de cases vides écartés)
+PIECE_STD = 16.0
+# Couleur : proportion de pixels sombres (contour fin des blancs, remplissage des noirs)
+DARK_LEVEL = 90
+COLOR_MARGIN = 0.1
+WHITE_MAX_DARK = 0.09
+BLACK_MIN_DARK = 0.17
+# Comparaison grossière (gris seul, cases réduites) acceptée au-delà de cet écart de score
+COARSE_SIZE = 32
+COARSE_MARGIN = 0.12
+
+
+def _preprocess_squares(squares, size):
+    """
+    Calcule les versions gray (égalisée) et edges de chaque case, empilées,
+    et le masque des cases unies.
+    """
+    h, w = size
+    grays = np.empty((len(squares), h, w), dtype=np.uint8)
+    edges = np.empty((len(squares), h, w), dtype=np.uint8)
+    flat = np.zeros(len(squares), dtype=bool)
+    for i, square in enumerate(squares):
+        if square.shape[:2] != (h, w):
+            square = cv2.resize(square, (w, h))
+        raw = cv2.cvtColor(square, cv2.COLOR_BGR2GRAY)
+        flat[i] = is_flat(raw)
+        gray = cv2.equalizeHist(raw)
+        grays[i] = gray
+        edges[i] = cv2.Canny(gray, 50, 150)
+    return grays, edges, flat
+
+
+def _correlations(sources, templates, templates_constant):
+    """
+    Matrice (n, T) des scores TM_CCOEFF_NORMED entre sources et templates normalisés.
+
+    Reproduit le comportement d'OpenCV : un template constant donne 1,
+    une source constante (ligne nulle après normalisation) donne 0.
+    """
+    scores = sources @ templates.T
+    scores[:, templates_constant] = 1.0
+    return scores
+
+
+def score_board(squares, bank):
+    """
+    Calcule en une seule passe les scores de toutes les cases contre tous les templates.
+
+    Args:
+        squares: Liste d'images BGR des cases (même taille attendue)
+        bank: TemplateBank chargée
+
+    Returns:
+        Tuple (noms des templates, matrice (n_cases, n_templates) des scores)
+    """
+    size = squares[0].shape[:2]
+    names, t_gray, t_gray_const, t_edges, t_edges_const, t_flat = bank.stacks(size)
+
+    grays, edges, s_flat = _preprocess_squares(squares, size)
+    s_gray, _ = normalize_rows(grays)
+    s_edges, _ = normalize_rows(edges)
+    # Une case unie ne ressemble à aucune pièce, et parfaitement aux templates unis
+    s_gray[s_flat] = 0.0
+    s_edges[s_flat] = 0.0
+
+    scores = (GRAY_WEIGHT * _correlations(s_gray, t_gray, t_gray_const)
+              + EDGE_WEIGHT * _correlations(s_edges, t_edges, t_edges_const))
+    scores[np.ix_(s_flat, t_flat)] = GRAY_WEIGHT + EDGE_WEIGHT
+
+    # Réduire le score des cases vides
+    empty = np.array([name in EMPTY_SQUARES for name in names])
+    scores[:, empty] /= EMPTY_PENALTY
+    return names, scores
+
+
+def _interior(gray, margin: float):
+    h, w = gray.shape
+    dy, dx = int(h * margin), int(w * margin)
+    return gray[dy:h - dy, dx:w - dx]
+
+
+def square_statistics(gray):
+    """
+    Mesures rapides d'une case en niveaux de gris (non égalisée).
+
+    Returns:
+        Tuple (écart-type du centre, luminosité du centre, case vide, proportion de pixels sombres)
+    """
+    center = _interior(gray, FLAT_MARGIN)
+    std = float(center.std())
+    empty = False
+    if std < EMPTY_STD:
+        edges = cv2.Canny(center, 50, 150)
+        empty = np.count_nonzero(edges) < EMPTY_EDGE_DENSITY * edges.size
+    body = _interior(gray, COLOR_MARGIN)
+    dark = np.count_nonzero(body < DARK_LEVEL) / body.size
+    return std, float(center.mean()), empty, dark
+
+
+def candidate_templates(names, std: float, dark: float):
+    """
+    Masque des templates à comparer à une case non vide : ceux d'une seule
+    couleur si elle est évidente, les cases vides seulement si le centre est peu contrasté.
+    """
+    white = np.array([name.startswith('White') for name in names])
+    black = np.array([name.startswith('Black') for name in names])
+    allowed = np.zeros(len(names), dtype=bool)
+    if dark <= BLACK_MIN_DARK:
+        allowed |= white
+    if dark >= WHITE_MAX_DARK:
+        allowed |= black
+    if std < PIECE_STD:
+        allowed |= ~(white | black)
+    return allowed
+
+
+def empty_template(names, brightness, level: float) -> str:
+    """Template de case vide dont la luminosité est la plus proche de celle de la case."""
+    empties = [(abs(brightness[i] - level), name) for i, name in enumerate(names) if name in EMPTY_SQUARES]
+    return min(empties)[1] if empties else EMPTY_SQUARES[0]
+
+
+def _best_classes(names, scores):
+    """
+    Meilleur template de chaque ligne et écart avec la meilleure autre pièce
+    (les variantes d'une même pièce, Queen1/Queen2, ne se concurrencent pas).
+    """
+    classes = np.array([name.rstrip('0123456789') if name not in EMPTY_SQUARES else 'empty'
+                        for name in names])
+    best = scores.argmax(axis=1)
+    rows = np.arange(len(scores))
+    rivals = np.where(classes[None, :] == classes[best][:, None], -np.inf, scores)
+    margin = scores[rows, best] - rivals.max(axis=1)
+    return best, np.minimum(margin, 1.0)
+
+
+def _coarse_scores(grays, bank):
+    """Corrélation des cases réduites à COARSE_SIZE avec les templates en gris."""
+    names, t_gray, t_gray_const, _, _, _ = bank.stacks((COARSE_SIZE, COARSE_SIZE))
+    small = []
+    for gray in grays:
+        interpolation = cv2.INTER_AREA if gray.shape[0] > COARSE_SIZE else cv2.INTER_LINEAR
+        small.append(cv2.equalizeHist(cv2.resize(gray, (COARSE_SIZE, COARSE_SIZE), interpolation=interpolation)))
+    s_gray, _ = normalize_rows(small)
+    return names, _correlations(s_gray, t_gray, t_gray_const)
+
+
+def classify_board(squares, bank):
+    """
+    Classe toutes les cases en cascade, du test le moins coûteux au plus coûteux :
+
+    1. case vide : centre uni et sans contours, résolue sans comparaison ;
+    2. couleur de la pièce : seuls les 12 templates d'un camp sont comparés ;
+    3. comparaison grossière (gris, cases réduites), acceptée si la meilleure
+       pièce se détache nettement ;
+    4. sinon comparaison complète (gris + contours à la taille de la case,
+       comme score_board) pour les seules cases ambiguës.
+
+    Args:
+        squares: Liste d'images BGR des cases
+        bank: TemplateBank chargée
+
+    Returns:
+        Liste de tuples (nom de la pièce, score, confiance) dans l'ordre des
+        cases ; la confiance est l'écart de score avec la meilleure autre pièce
+        (1 pour une case vide évidente)
+    """
+    if not squares:
+        return []
+    names = bank.names
+    brightness = bank.brightness
+    results = [None] * len(squares)
+
+    grays, pending, allowed = [], [], []
+    for i, square in enumerate(squares):
+        gray = cv2.cvtColor(square, cv2.COLOR_BGR2GRAY)
+        std, level, empty, dark = square_statistics(gray)
+        if empty:
+            results[i] = (empty_template(names, brightness, level), (GRAY_WEIGHT + EDGE_WEIGHT) / EMPTY_PENALTY, 1.0)
+            continue
+        grays.append(gray)
+        pending.append(i)
+        allowed.append(candidate_templates(names, std, dark))
+    if not pending:
+        return results
+    allowed = np.array(allowed)
+
+    coarse_names, scores = _coarse_scores(grays, bank)
+    scores = np.where(allowed, scores, -np.inf)
+    best, margin = _best_classes(coarse_names, scores)
+    # Une case peu contrastée (peut-être vide) passe toujours par la comparaison complète
+    empty_columns = np.array([name in EMPTY_SQUARES for name in coarse_names])
+    confident = (margin >= COARSE_MARGIN) & ~allowed[:, empty_columns].any(axis=1)
+    ambiguous = []
+    for row, i in enumerate(pending):
+        if confident[row]:
+            results[i] = (coarse_names[best[row]], float(scores[row, best[row]]), float(margin[row]))
+        else:
+            ambiguous.append(row)
+
+    if ambiguous:
+        full_names, full = score_board([squares[pending[row]] for row in ambiguous], bank)
+        full = np.where(allowed[ambiguous], full, -np.inf)
+        best, margin = _best_classes(full_names, full)
+        for k, row in enumerate(ambiguous):
+            results[pending[row]] = (full_names[best[k]], float(full[k, best[k]]), float(margin[k]))
+    return results
+
+
+def label_squares(squares, bank):
+    """
+    Retourne uniquement le nom de la pièce de chaque case.
+
+    Comme classify_square(threshold=0) : une case sans aucun score positif
+    est étiquetée "NUL" (traitée comme vide par generate_fen_from_matrix).
+    """
+    return [name if score >= 0 else "NUL" for name, score, _ in classify_board(squares, bank)]
+
+
+def classify_grid(board_grid, bank):
+    """
+    Classe une grille 8x8 produite par split_board.
+
+    Returns:
+        Matrice 8x8 des noms de pièces (rangée 8 en haut, comme board_grid)
+    """
+    squares = [square for line in board_grid for square in line]
+    labels = label_squares(squares, bank)
+    return [labels[row * 8:(row + 1) * 8] for row in range(8)]
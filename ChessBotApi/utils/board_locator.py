@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+# Côté maximal de l'image réduite utilisée pour la détection grossière
+DETECTION_SIZE = 256
+# Pas (en pixels de l'image réduite) des tailles de case essayées
+PERIOD_STEP = 0.25
+# Rapport minimal entre l'énergie des bords sur la grille et l'énergie moyenne
+MIN_CONFIDENCE = 2.5
+
+
+class BoardGeometry(NamedTuple):
+    """Position de l'échiquier dans l'image : coin haut-gauche et côté (8 cases)."""
+    x: int
+    y: int
+    size: int
+    confidence: float
+
+    @property
+    def square_size(self) -> float:
+        return self.size / 8
+
+
+def _edge_profiles(gray):
+    """
+    Énergie des transitions verticales (par colonne) et horizontales (par ligne).
+
+    L'indice i correspond à la frontière entre les pixels i-1 et i ; les bords
+    de l'image (i = 0 et i = largeur) reçoivent une valeur forte pour qu'un
+    échiquier qui remplit toute l'image soit aussi détecté.
+    """
+    gray = gray.astype(np.float32)
+    columns = np.abs(np.diff(gray, axis=1)).sum(axis=0)
+    rows = np.abs(np.diff(gray, axis=0)).sum(axis=1)
+    profiles = []
+    for profile in (columns, rows):
+        border = np.percentile(profile, 90) if profile.size else 0.0
+        profiles.append(np.concatenate(([border], profile, [border])))
+    return profiles
+
+
+def _grid_scores(profile, periods):
+    """
+    Pour chaque taille de case, meilleur décalage des 9 lignes de la grille.
+
+    Returns:
+        Tuple (scores, décalages), un élément par taille de case
+    """
+    # Tolérance de ±1 pixel sur la position des lignes
+    dilated = profile.copy()
+    dilated[1:] = np.maximum(dilated[1:], profile[:-1])
+    dilated[:-1] = np.maximum(dilated[:-1], profile[1:])
+
+    # Toutes les tailles de case et tous les décalages en un seul calcul
+    lines = np.round(periods[:, None] * np.arange(9)[None, :]).astype(np.int64)
+    starts = np.arange(len(profile))
+    positions = starts[None, :, None] + lines[:, None, :]
+    valid = positions[:, :, -1] < len(profile)
+    totals = dilated[np.minimum(positions, len(profile) - 1)].mean(axis=2)
+    totals[~valid] = 0.0
+    offsets = totals.argmax(axis=1)
+    scores = totals[np.arange(len(periods)), offsets].astype(np.float32)
+    return scores, offsets
+
+
+def _refine_axis(gray, offset: float, period: float, band, radius: int, period_tolerance: float, axis: int):
+    """
+    Ajuste au pixel près, en pleine résolution, le décalage et la taille de case
+    d'un axe autour de l'estimation grossière.
+
+    Seules des fenêtres de ±radius pixels autour des 9 lignes estimées sont
+    lues, sur la bande de l'image occupée par l'échiquier.
+
+    Returns:
+        Tuple (décalage, taille de case)
+    """
+    length = gray.shape[1] if axis == 1 else gray.shape[0]
+    band_lo, band_hi = band
+    windows = []
+    starts = []
+    for k in range(9):
+        center = int(round(offset + k * period))
+        start = center - radius
+        values = np.full(2 * radius + 1, -np.inf, dtype=np.float32)
+        lo, hi = max(1, start), min(length - 1, center + radius + 1)
+        if hi > lo:
+            if axis == 1:
+                window = gray[band_lo:band_hi, lo - 1:hi].astype(np.float32)
+                values[lo - start:hi - start] = np.abs(np.diff(window, axis=1)).sum(axis=0)
+            else:
+                window = gray[lo - 1:hi, band_lo:band_hi].astype(np.float32)
+                values[lo - start:hi - start] = np.abs(np.diff(window, axis=0)).sum(axis=1)
+        windows.append(values)
+        starts.append(start)
+    windows = np.array(windows)
+    finite = windows[np.isfinite(windows)]
+    edge_value = finite.max() if finite.size else 0.0
+    # Un échiquier qui touche le bord de l'image : le bord compte comme une ligne
+    for k, start in enumerate(starts):
+        for boundary in (0, length):
+            if 0 <= boundary - start < windows.shape[1]:
+                windows[k, boundary - start] = edge_value
+
+    offsets = np.arange(-radius, radius + 1)
+    periods = np.arange(period - period_tolerance, period + period_tolerance + 0.05, 0.1)
+    best = (-np.inf, offset, period)
+    for candidate in periods:
+        # Position de chaque ligne dans sa fenêtre, pour tous les décalages à la fois
+        index = (np.round(offset + offsets[:, None] + np.arange(9)[None, :] * candidate).astype(np.int64)
+                 - np.array(starts)[None, :])
+        valid = (index >= 0) & (index < windows.shape[1])
+        values = np.where(valid, windows[np.arange(9)[None, :], np.clip(index, 0, windows.shape[1] - 1)], -np.inf)
+        totals = values.sum(axis=1)
+        i = int(np.argmax(totals))
+        if totals[i] > best[0]:
+            best = (totals[i], offset + offsets[i], candidate)
+    return best[1], best[2]
+
+
+def locate_board(image) -> Optional[BoardGeometry]:
+    """
+    Détecte l'échiquier dans une capture d'écran.
+
+    La grille 9x9 de frontières entre cases est cherchée sur une image réduite
+    (taille de case et décalage communs aux deux axes, les cases étant
+    carrées), puis les quatre bords sont ajustés au pixel près sur l'image
+    d'origine.
+
+    Returns:
+        BoardGeometry, ou None si aucune grille d'échiquier n'est trouvée
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    scale = min(1.0, DETECTION_SIZE / max(h, w))
+    small = gray if scale == 1.0 else cv2.resize(
+        gray, (max(1, int(round(w * scale))), max(1, int(round(h * scale)))),
+        interpolation=cv2.INTER_AREA,
+    )
+    sh, sw = small.shape
+    columns, rows = _edge_profiles(small)
+
+    # Un échiquier occupe au moins un quart du plus petit côté
+    min_period = max(2.0, min(sh, sw) / 32)
+    max_period = min(sh, sw) / 8
+    if max_period < min_period:
+        return None
+    periods = np.arange(min_period, max_period + PERIOD_STEP, PERIOD_STEP)
+
+    column_scores, column_offsets = _grid_scores(columns, periods)
+    row_scores, row_offsets = _grid_scores(rows, periods)
+    column_scores /= columns.mean() or 1.0
+    row_scores /= rows.mean() or 1.0
+    # Une grille doit apparaître sur les deux axes avec la même taille de case
+    combined = np.minimum(column_scores, row_scores)
+    best = int(np.argmax(combined))
+    confidence = float(combined[best])
+    if confidence < MIN_CONFIDENCE:
+        return None
+
+    period = periods[best] / scale
+    radius = int(np.ceil(3 / scale))
+    tolerance = PERIOD_STEP / scale
+    x0 = column_offsets[best] / scale
+    y0 = row_offsets[best] / scale
+    # Bandes de l'image occupées par l'échiquier
+    column_band = (max(0, int(y0)), min(h, int(y0 + 8 * period)))
+    row_band = (max(0, int(x0)), min(w, int(x0 + 8 * period)))
+    x0, column_period = _refine_axis(gray, x0, period, column_band, radius, tolerance, axis=1)
+    y0, row_period = _refine_axis(gray, y0, period, row_band, radius, tolerance, axis=0)
+
+    x0, y0 = int(round(x0)), int(round(y0))
+    size = min(int(round(4 * (column_period + row_period))), w - x0, h - y0)
+    if size < 8:
+        return None
+    return BoardGeometry(x0, y0, size, confidence)
+
+
+def crop_geometry(image, geometry: BoardGeometry):
+    """Rogne l'image sur l'échiquier décrit par `geometry`."""
+    return image[geometry.y:geometry.y + geometry.size, geometry.x:geometry.x + geometry.size]
+
+
+class BoardGeometryCache:
+    def __init__(self, max_sessions: int = 1000, ttl: Optional[float] = 1800):
+        """
+        Position de l'échiquier détectée pour chaque session client : tant que
+        la taille des captures ne change pas, la détection n'est pas refaite.
+
+        Args:
+            max_sessions: Nombre maximal de sessions gardées (LRU)
+            ttl: Durée de vie d'une session inactive en secondes (None = illimitée)
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, session_id: str, shape) -> Optional[BoardGeometry]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                cached_shape, geometry, stamp = entry
+                expired = self.ttl is not None and time.time() - stamp > self.ttl
+                if cached_shape == tuple(shape) and not expired:
+                    self._entries[session_id] = (cached_shape, geometry, time.time())
+                    self._entries.move_to_end(session_id)
+                    self._stats["hits"] += 1
+                    return geometry
+                del self._entries[session_id]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, session_id: str, shape, geometry: BoardGeometry):
+        with self._lock:
+            self._entries[session_id] = (tuple(shape), geometry, time.time())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._entries)
+        return stats
@@ -0,0 +1,164 @@
+"""
+Rendu d'échiquiers synthétiques à partir des templates de pièces, pour
+l'entraînement du classifieur (train_classifier.py) et les mesures de
+reconnaissance (benchmark_recognition.py).
+"""
+import os
+
+import cv2
+import numpy as np
+
+from ChessBotApi.utils.piece_model import EMPTY_LABEL
+
+# Couleurs (BGR) des cases claires et foncées de quelques thèmes courants
+BOARD_THEMES = {
+    "green": ((208, 236, 235), (82, 149, 115)),  # thème des templates
+    "brown": ((181, 217, 240), (99, 136, 181)),
+    "blue": ((230, 227, 222), (173, 162, 140)),
+    "gray": ((220, 220, 220), (140, 140, 140)),
+    "purple": ((235, 228, 232), (158, 112, 134)),
+    "red": ((213, 222, 245), (76, 84, 176)),
+}
+# Thèmes jamais vus à l'entraînement du classifieur : réservés aux mesures
+HELD_OUT_THEMES = ("purple", "red")
+TRAINING_THEMES = tuple(theme for theme in BOARD_THEMES if theme not in HELD_OUT_THEMES)
+# Surbrillance du dernier coup (case claire, case foncée)
+HIGHLIGHTS = ((105, 246, 246), (43, 202, 186))
+# Distance (BGR) sous laquelle un pixel du template appartient au fond
+BACKGROUND_DISTANCE = 30
+# Lettre FEN -> type de pièce dans les noms de templates
+FEN_PIECES = {"p": "Pawn", "n": "Knight", "b": "Bishop", "r": "Rock", "q": "Queen", "k": "King"}
+
+
+def template_label(name: str) -> str:
+    """Nom de classe d'un template : WhitePawn1 -> WhitePawn, whitecase -> EMPTY_LABEL."""
+    if name in ("blackcase", "whitecase"):
+        return EMPTY_LABEL
+    return name.rstrip("0123456789")
+
+
+def fen_label(char: str) -> str:
+    """Lettre FEN -> nom de classe (P -> WhitePawn, r -> BlackRock)."""
+    return ("White" if char.isupper() else "Black") + FEN_PIECES[char.lower()]
+
+
+def placement_squares(fen: str):
+    """
+    Première partie d'une FEN développée en 64 cases (rangée 8 en premier).
+
+    Returns:
+        Liste de 64 lettres FEN, '.' pour une case vide
+    """
+    squares = []
+    for char in fen.split()[0]:
+        if char.isdigit():
+            squares.extend("." * int(char))
+        elif char != "/":
+            squares.append(char)
+    return squares
+
+
+def load_pieces(templates_dir: str):
+    """
+    Détoure les pièces des templates.
+
+    Returns:
+        Liste (classe, image BGR, masque de la pièce) ; masque None pour une case vide
+    """
+    pieces = []
+    for root, _, files in os.walk(templates_dir):
+        for file in sorted(files):
+            if not file.lower().endswith(".png"):
+                continue
+            img = cv2.imread(os.path.join(root, file), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            label = template_label(file[:-len(".png")])
+            if label == EMPTY_LABEL:
+                pieces.append((label, img, None))
+                continue
+            # Fond : pixels proches de la couleur du pourtour et reliés au bord
+            border = np.concatenate((img[2], img[-3], img[:, 2], img[:, -3]))
+            background = np.median(border, axis=0)
+            close = (np.linalg.norm(img.astype(np.float32) - background, axis=2) < BACKGROUND_DISTANCE)
+            _, components = cv2.connectedComponents(close.astype(np.uint8))
+            edge_components = set(np.unique(np.concatenate((
+                components[0], components[-1], components[:, 0], components[:, -1]))))
+            edge_components.discard(0)
+            mask = ~np.isin(components, list(edge_components))
+            # Les liserés des cases voisines (bords du template) ne font pas partie de la pièce
+            mask[:3], mask[-3:], mask[:, :3], mask[:, -3:] = False, False, False, False
+            pieces.append((label, img, mask))
+    return pieces
+
+
+def compose_piece(square, img, mask, scale: float = 1.0, shift=(0.0, 0.0)):
+    """
+    Dessine une pièce détourée au centre d'une case (modifiée sur place).
+
+    Args:
+        scale: Zoom de la pièce par rapport à la taille de la case
+        shift: Décalage (x, y) en pixels
+    """
+    size = square.shape[0]
+    factor = size / max(img.shape[:2]) * scale
+    matrix = np.array([
+        [factor, 0, size / 2 - factor * img.shape[1] / 2 + shift[0]],
+        [0, factor, size / 2 - factor * img.shape[0] / 2 + shift[1]],
+    ], dtype=np.float32)
+    piece = cv2.warpAffine(img, matrix, (size, size), flags=cv2.INTER_LINEAR)
+    alpha = cv2.warpAffine(mask.astype(np.float32), matrix, (size, size), flags=cv2.INTER_LINEAR)[..., None]
+    square[:] = (alpha * piece + (1 - alpha) * square).astype(np.uint8)
+
+
+def draw_coordinate(square, text: str, bottom_right: bool, color, scale: float = 1.0):
+    """Coordonnée dans un coin de case : 1-8 en haut à gauche, a-h en bas à droite."""
+    size = square.shape[0]
+    corner = (int(size * 0.78), int(size * 0.95)) if bottom_right else (int(size * 0.04), int(size * 0.24))
+    cv2.putText(square, text, corner, cv2.FONT_HERSHEY_SIMPLEX, size * 0.0045 * scale,
+                color, max(1, size // 50), cv2.LINE_AA)
+
+
+def render_board(fen: str, pieces, square_size: int, theme: str = "green", coordinates: bool = True):
+    """
+    Dessine l'échiquier d'une FEN (blancs en bas).
+
+    Args:
+        pieces: Résultat de load_pieces (la première variante de chaque pièce est utilisée)
+        square_size: Côté d'une case en pixels
+
+    Returns:
+        Image BGR de côté 8 * square_size
+    """
+    light, dark = BOARD_THEMES[theme]
+    sprites = {}
+    for label, img, mask in pieces:
+        if mask is not None:
+            sprites.setdefault(label, (img, mask))
+
+    board = np.empty((8 * square_size, 8 * square_size, 3), dtype=np.uint8)
+    for index, char in enumerate(placement_squares(fen)):
+        row, col = divmod(index, 8)
+        is_light = (row + col) % 2 == 0
+        square = board[row * square_size:(row + 1) * square_size, col * square_size:(col + 1) * square_size]
+        square[:] = light if is_light else dark
+        if char != ".":
+            compose_piece(square, *sprites[fen_label(char)])
+        if coordinates:
+            other = dark if is_light else light
+            if col == 0:
+                draw_coordinate(square, str(8 - row), False, other)
+            if row == 7:
+                draw_coordinate(square, "abcdefgh"[col], True, other)
+    return board
+
+
+def degrade(img, jpeg_quality=None, noise: float = 0.0, seed: int = 0):
+    """Bruit gaussien puis compression JPEG (qualité None = sans perte)."""
+    if noise:
+        rng = np.random.default_rng(seed)
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    if jpeg_quality:
+        _, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+        img = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return img
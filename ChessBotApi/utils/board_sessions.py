@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# Miniature de chaque case utilisée pour la détection des changements
+THUMB_SIZE = 16
+# Écart moyen (niveaux de gris) au-delà duquel une case est considérée modifiée
+DEFAULT_CHANGE_THRESHOLD = 8.0
+
+
+def square_thumbnails(cropped_board):
+    """
+    Réduit un échiquier rogné en 64 miniatures grises (64, THUMB_SIZE, THUMB_SIZE).
+
+    Une seule réduction de l'image entière suffit : c'est bien moins coûteux
+    que de traiter les cases une par une.
+    """
+    gray = cv2.cvtColor(cropped_board, cv2.COLOR_BGR2GRAY)
+    side = 8 * THUMB_SIZE
+    thumb = cv2.resize(gray, (side, side), interpolation=cv2.INTER_AREA)
+    return (thumb.reshape(8, THUMB_SIZE, 8, THUMB_SIZE)
+                 .transpose(0, 2, 1, 3)
+                 .reshape(64, THUMB_SIZE, THUMB_SIZE))
+
+
+def changed_squares(previous, current, threshold: float = DEFAULT_CHANGE_THRESHOLD):
+    """
+    Indices (0..63, rangée 8 en premier) des cases dont la miniature a changé.
+    """
+    diff = np.abs(previous.astype(np.int16) - current.astype(np.int16))
+    return np.flatnonzero(diff.reshape(64, -1).mean(axis=1) > threshold)
+
+
+class BoardSessionStore:
+    def __init__(self, max_sessions: int = 1000, ttl: Optional[float] = 1800,
+                 change_threshold: float = DEFAULT_CHANGE_THRESHOLD):
+        """
+        Mémorise, par session client, le dernier échiquier reconnu (miniatures + étiquettes)
+        pour ne reclasser que les cases modifiées à l'image suivante.
+
+        Args:
+            max_sessions: Nombre maximal de sessions gardées (LRU)
+            ttl: Durée de vie d'une session inactive en secondes (None = illimitée)
+            change_threshold: Seuil de différence moyenne pour considérer une case modifiée
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.change_threshold = change_threshold
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"full": 0, "incremental": 0, "squares_reclassified": 0}
+
+    def _get(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.time() - entry[2] > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return entry
+
+    def _put(self, session_id: str, thumbs, labels):
+        with self._lock:
+            self._sessions[session_id] = (thumbs, labels, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def recognize(self, session_id: str, cropped_board, squares, label_fn):
+        """
+        Étiquette les 64 cases en ne reclassant que celles modifiées depuis
+        la dernière image de la session.
+
+        Args:
+            session_id: Identifiant de session fourni par le client
+            cropped_board: Échiquier rogné (pour les miniatures)
+            squares: Liste des 64 cases (rangée 8 en premier)
+            label_fn: Fonction liste de cases -> liste d'étiquettes
+
+        Returns:
+            Liste des 64 étiquettes
+        """
+        thumbs = square_thumbnails(cropped_board)
+        previous = self._get(session_id)
+
+        if previous is None:
+            labels = label_fn(squares)
+            with self._lock:
+                self._stats["full"] += 1
+                self._stats["squares_reclassified"] += len(squares)
+        else:
+            labels = list(previous[1])
+            changed = changed_squares(previous[0], thumbs, self.change_threshold)
+            if len(changed):
+                for index, label in zip(changed, label_fn([squares[i] for i in changed])):
+                    labels[index] = label
+            with self._lock:
+                self._stats["incremental"] += 1
+                self._stats["squares_reclassified"] += len(changed)
+
+        self._put(session_id, thumbs, labels)
+        return labels
+
+    def reset(self):
+        """Oublie toutes les sessions (ex : après un rechargement des templates)."""
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+        return stats
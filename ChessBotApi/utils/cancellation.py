@@ -0,0 +1,202 @@
+"""
+Annulation des recherches dont le client n'attend plus la réponse.
+
+Une requête porte un CancelToken : échéance fournie par le client (en-tête
+X-Deadline-Ms) et test de déconnexion de sa socket. Un thread de
+surveillance unique vérifie les jetons actifs et déclenche leurs rappels
+(envoi de "stop" au moteur), ce qui libère le moteur dès que possible.
+"""
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Temps (ms) que le client accepte d'attendre, à partir de la réception de la requête
+DEADLINE_HEADER = "X-Deadline-Ms"
+# Largeur (s) des tranches d'échéance : seules des requêtes d'échéances proches partagent une recherche
+DEADLINE_BUCKET = 0.5
+
+
+class SearchCancelled(Exception):
+    """La recherche a été interrompue (client déconnecté ou échéance dépassée)."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Recherche annulée ({reason})")
+        self.reason = reason
+
+
+def parse_deadline(value: Optional[str]) -> Optional[float]:
+    """
+    Échéance absolue (time.monotonic) à partir de la valeur de X-Deadline-Ms.
+
+    Returns:
+        None si l'en-tête est absent ou invalide
+    """
+    try:
+        milliseconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    if milliseconds <= 0:
+        return None
+    return time.monotonic() + milliseconds / 1000
+
+
+def deadline_bucket(deadline: Optional[float]) -> Optional[int]:
+    """
+    Tranche de l'échéance, à ajouter à la clé de regroupement des recherches :
+    une requête sans échéance ne reçoit jamais le budget écourté d'une autre.
+
+    Returns:
+        None si aucune échéance
+    """
+    if deadline is None:
+        return None
+    return int(deadline // DEADLINE_BUCKET)
+
+
+def socket_probe(environ: dict) -> Optional[Callable[[], bool]]:
+    """
+    Test de déconnexion du client pour une requête WSGI, si le serveur
+    expose sa socket (serveur de développement werkzeug, gunicorn).
+
+    Une socket lisible dont la lecture (sans consommer) renvoie 0 octet
+    a été fermée par le client.
+    """
+    sock = environ.get("werkzeug.socket") or environ.get("gunicorn.socket")
+    if sock is None:
+        return None
+
+    def disconnected() -> bool:
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return False
+            return sock.recv(1, socket.MSG_PEEK) == b""
+        except (OSError, ValueError):
+            return True
+    return disconnected
+
+
+class CancelToken:
+    def __init__(self, deadline: Optional[float] = None, probe: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            deadline: Échéance absolue (time.monotonic), None si aucune
+            probe: Fonction renvoyant True si le client s'est déconnecté
+        """
+        self.deadline = deadline
+        self.probe = probe
+        self.reason = None
+        self._callbacks = {}
+        self._next_handle = 0
+        # Les rappels sont exécutés sous ce verrou : une fois remove_callback
+        # terminé, le rappel retiré ne peut plus être en cours d'exécution
+        self._lock = threading.RLock()
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Secondes restantes avant l'échéance (None si aucune)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def extend_deadline(self, deadline: Optional[float]):
+        """Repousse l'échéance à `deadline` si elle est plus tardive (None : plus d'échéance)."""
+        with self._lock:
+            if self.deadline is not None:
+                self.deadline = None if deadline is None else max(self.deadline, deadline)
+
+    def check(self):
+        """
+        Raises:
+            SearchCancelled: si le jeton est annulé
+        """
+        if self.cancelled:
+            raise SearchCancelled(self.reason)
+
+    def poll(self):
+        """Vérifie l'échéance puis la connexion du client (appelée par CancelMonitor)."""
+        if not self.cancelled and self.probe is not None and self.probe():
+            self.cancel("disconnect")
+
+    def cancel(self, reason: str):
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+            for callback in callbacks:
+                callback(reason)
+
+    def add_callback(self, callback: Callable[[str], None]) -> int:
+        """
+        Enregistre callback(reason), appelé à l'annulation (immédiatement si
+        le jeton est déjà annulé).
+
+        Returns:
+            Identifiant à passer à remove_callback
+        """
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            if self.reason is None:
+                self._callbacks[handle] = callback
+                return handle
+            callback(self.reason)
+            return handle
+
+    def remove_callback(self, handle: int):
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+
+class CancelMonitor:
+    def __init__(self, interval: float = 0.05):
+        """
+        Thread unique qui vérifie périodiquement l'échéance et la connexion
+        des requêtes en cours.
+
+        Args:
+            interval: Période de vérification en secondes
+        """
+        self.interval = interval
+        self._tokens = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                tokens = list(self._tokens)
+            for token in tokens:
+                token.poll()
+
+    @contextmanager
+    def watch(self, token: CancelToken):
+        """Surveille le jeton pendant la durée du bloc `with`."""
+        if token.deadline is None and token.probe is None:
+            yield token
+            return
+        with self._lock:
+            self._tokens.add(token)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cancel-monitor", daemon=True)
+                self._thread.start()
+        try:
+            yield token
+        finally:
+            with self._lock:
+                self._tokens.discard(token)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"watched": len(self._tokens)}
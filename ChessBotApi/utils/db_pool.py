@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+
+from ChessBotApi.utils.metrics import record_stage
+
+
+class DBConnectionError(Exception):
+    """Impossible d'ouvrir une nouvelle connexion MySQL."""
+
+
+class DBPoolExhausted(Exception):
+    """Aucune connexion disponible dans le délai imparti."""
+
+
+class DBPool:
+    def __init__(self, config: dict, size: int = 5, max_overflow: int = 5,
+                 recycle: float = 3600, pre_ping: bool = True, timeout: float = 5.0,
+                 connect=None):
+        """
+        Pool de connexions MySQL partagé par toutes les routes de l'API.
+
+        Args:
+            config: Paramètres de mysql.connector.connect (DB_CONFIG)
+            size: Nombre de connexions gardées ouvertes
+            max_overflow: Connexions supplémentaires autorisées en pic, fermées à leur retour
+            recycle: Âge maximal d'une connexion en secondes avant d'être rouverte
+            pre_ping: Vérifier la connexion (ping) avant de la prêter
+            timeout: Attente maximale d'une connexion libre en secondes
+            connect: Fonction d'ouverture de connexion (défaut : mysql.connector.connect)
+        """
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._connect_fn = connect or mysql.connector.connect
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size + max_overflow)
+        self._lock = threading.Lock()
+        self._stats = {
+            "in_use": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "wait_time_max_ms": 0.0,
+        }
+
+    def _connect(self):
+        try:
+            connection = self._connect_fn(**self.config)
+        except Error as e:
+            raise DBConnectionError(f"Erreur de connexion à la base de données: {e}") from e
+        with self._lock:
+            self._stats["created"] += 1
+        return connection, time.monotonic()
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _usable(self, connection, created: float) -> bool:
+        if self.recycle is not None and time.monotonic() - created > self.recycle:
+            with self._lock:
+                self._stats["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                with self._lock:
+                    self._stats["ping_failures"] += 1
+                return False
+        return True
+
+    def _acquire(self):
+        while True:
+            try:
+                connection, created = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._usable(connection, created):
+                return connection, created
+            self._close(connection)
+
+    def _release(self, connection, created: float):
+        # Terminer toute transaction ouverte : sans cela, une connexion réutilisée
+        # garderait l'instantané REPEATABLE READ de son premier SELECT
+        try:
+            connection.rollback()
+        except Exception:
+            self._close(connection)
+            return
+        # Au-delà de `size`, les connexions de débordement sont fermées
+        if self._idle.qsize() >= self.size:
+            self._close(connection)
+        else:
+            self._idle.put((connection, created))
+
+    @contextmanager
+    def connection(self):
+        """
+        Emprunte une connexion pour la durée du bloc `with`.
+
+        Raises:
+            DBPoolExhausted: si toutes les connexions (débordement compris) restent occupées
+            DBConnectionError: si une nouvelle connexion ne peut pas être ouverte
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise DBPoolExhausted(f"Aucune connexion MySQL disponible après {self.timeout}s")
+        waited_ms = (time.perf_counter() - start) * 1000
+        record_stage("db_wait", waited_ms / 1000)
+
+        try:
+            connection, created = self._acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats["in_use"] += 1
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited_ms)
+
+        try:
+            yield connection
+        finally:
+            self._release(connection, created)
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """Métriques d'utilisation du pool."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["max_overflow"] = self.max_overflow
+        stats["idle"] = self._idle.qsize()
+        stats["utilisation"] = stats["in_use"] / (self.size + self.max_overflow)
+        return stats
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(connection)
@@ -0,0 +1,186 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from stockfish import Stockfish
+
+from ChessBotApi.utils.metrics import record_stage
+
+
+def default_pool_size(threads_per_engine: int = 1) -> int:
+    """Nombre de moteurs par défaut : un moteur par groupe de `threads_per_engine` cœurs."""
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_engine))
+
+
+class EnginePool:
+    def __init__(self, path: str, size: Optional[int] = None, threads_per_engine: int = 1,
+                 checkout_timeout: Optional[float] = None, health_check_interval: float = 30.0):
+        """
+        Pool borné de processus Stockfish partagés entre les threads de requêtes.
+
+        Chaque requête emprunte un moteur pour elle seule (checkout) puis le rend
+        (checkin) : plus de partage d'une instance unique entre threads.
+        Un moteur mort ou qui a levé une erreur est remplacé par un nouveau processus.
+
+        Args:
+            path: Chemin de l'exécutable Stockfish
+            size: Nombre de moteurs (défaut : cœurs CPU / threads_per_engine)
+            threads_per_engine: Option UCI "Threads" de chaque moteur
+            checkout_timeout: Attente maximale d'un moteur libre en secondes (None = illimitée)
+            health_check_interval: Au-delà de ce temps d'inactivité, un moteur est
+                vérifié par un aller-retour "isready" avant d'être prêté
+        """
+        self.path = path
+        self.threads_per_engine = max(1, threads_per_engine)
+        self.size = size or default_pool_size(self.threads_per_engine)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waiting": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+            "timeouts": 0,
+            "respawns": 0,
+            "failed_health_checks": 0,
+        }
+
+        for _ in range(self.size):
+            self._idle.put((self._spawn(), time.monotonic()))
+
+    def _spawn(self) -> Stockfish:
+        try:
+            return Stockfish(path=self.path, parameters={"Threads": self.threads_per_engine})
+        except Exception as e:
+            raise RuntimeError(f"Erreur lors de l'initialisation de Stockfish: {str(e)}")
+
+    @staticmethod
+    def _stop(engine: Stockfish):
+        try:
+            engine.send_quit_command()
+        except Exception:
+            pass
+        try:
+            engine._stockfish.kill()
+        except Exception:
+            pass
+
+    def _is_healthy(self, engine: Stockfish, idle_since: float) -> bool:
+        """Vérifie que le processus tourne et, s'il est resté inactif longtemps, qu'il répond."""
+        try:
+            if engine._stockfish.poll() is not None:
+                return False
+            if time.monotonic() - idle_since >= self.health_check_interval:
+                engine._is_ready()
+            return True
+        except Exception:
+            return False
+
+    def _respawn(self, engine: Optional[Stockfish]) -> Stockfish:
+        if engine is not None:
+            self._stop(engine)
+        with self._lock:
+            self._stats["respawns"] += 1
+        return self._spawn()
+
+    def _checkin(self, engine: Stockfish):
+        if self._closed:
+            self._stop(engine)
+        else:
+            self._idle.put((engine, time.monotonic()))
+
+    @contextmanager
+    def engine(self, timeout: Optional[float] = None):
+        """
+        Emprunte un moteur pour la durée du bloc `with`.
+
+        Si le bloc lève une exception, l'état du moteur est inconnu : il est
+        remplacé par un nouveau processus au lieu d'être rendu au pool.
+
+        Raises:
+            TimeoutError: si aucun moteur ne se libère dans le délai imparti
+        """
+        if self._closed:
+            raise RuntimeError("Le pool Stockfish est fermé")
+        timeout = self.checkout_timeout if timeout is None else timeout
+
+        start = time.perf_counter()
+        with self._lock:
+            self._stats["waiting"] += 1
+        try:
+            engine, idle_since = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"Aucun moteur Stockfish disponible après {timeout}s")
+        finally:
+            waited_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._stats["waiting"] -= 1
+                self._stats["wait_time_total_ms"] += waited_ms
+                self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited_ms)
+            record_stage("engine_wait", waited_ms / 1000)
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+
+        try:
+            if engine is None or not self._is_healthy(engine, idle_since):
+                if engine is not None:
+                    with self._lock:
+                        self._stats["failed_health_checks"] += 1
+                engine = self._respawn(engine)
+        except Exception:
+            # Impossible de relancer un moteur : l'emplacement reste vide
+            # et un nouveau processus sera tenté au prochain checkout
+            self._idle.put((None, 0.0))
+            raise
+
+        try:
+            yield engine
+        except BaseException:
+            self._replace(engine)
+            raise
+        else:
+            self._checkin(engine)
+
+    def _replace(self, engine: Stockfish):
+        """Remplace un moteur dans un état inconnu par un nouveau processus."""
+        if self._closed:
+            self._stop(engine)
+            return
+        try:
+            engine = self._respawn(engine)
+        except Exception:
+            engine = None
+        self._idle.put((engine, time.monotonic()))
+
+    def stats(self) -> dict:
+        """Métriques du pool (attente, relances, moteurs libres)."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = self.size - stats["idle"]
+        checkouts = stats["checkouts"] or 1
+        stats["wait_time_avg_ms"] = stats["wait_time_total_ms"] / checkouts
+        return stats
+
+    def close(self):
+        """Arrête tous les moteurs libres ; ceux en cours d'utilisation seront arrêtés à leur retour."""
+        self._closed = True
+        while True:
+            try:
+                engine, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if engine is not None:
+                self._stop(engine)
+
@@ -1,16 +1,33 @@
 import cv2
-import os
-import numpy as np
+
+from ChessBotApi.utils.preprocessing import (
+    preprocess_gray,
+    preprocess_edges,
+)
+from ChessBotApi.utils.template_bank import TemplateBank, get_template_bank
+from ChessBotApi.utils.board_locator import locate_board, crop_geometry
+from ChessBotApi.utils.board_classifier import (
+    GRAY_WEIGHT,
+    EDGE_WEIGHT,
+    EMPTY_PENALTY,
+    square_statistics,
+    candidate_templates,
+    empty_template,
+)
+
+# Côté de l'échiquier rogné : 8 cases de 102 pixels, la taille des templates
+BOARD_SIZE = 816
 
 FILES = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5, 'g': 6, 'h': 7}
 
-def split_board(image):
+def crop_board(image):
     """
-    Découpe l'image en 64 cases d'échecs.
-    L'image est rognée à 816x816 pixels en commençant à 46 pixels du bord gauche.
+    Rogne l'image sur l'échiquier.
+    L'image est rognée à 816x816 pixels en commençant à 44 pixels du bord gauche.
+    Utilisé quand la détection automatique (locate_board) ne trouve pas de grille.
     """
     # Dimensions cibles
-    target_size = 816
+    target_size = BOARD_SIZE
     left_offset = 44  # Décalage à partir du bord gauche
     
     # Obtenir les dimensions actuelles
@@ -37,8 +54,29 @@ def split_board(image):
     if cropped_image.shape[0] != target_size or cropped_image.shape[1] != target_size:
         cropped_image = cv2.resize(cropped_image, (target_size, target_size))
     
-    # Diviser en cases de 102x102 pixels (816/8 = 102)
-    square_size = target_size // 8
+    return cropped_image
+
+def extract_board(image, geometry=None, board_size: int = BOARD_SIZE):
+    """
+    Rogne l'échiquier détecté par locate_board et le met à la taille `board_size`
+    (8 fois un niveau de la pyramide de templates, voir TemplateBank.nearest_size).
+
+    Seule la zone de l'échiquier est redimensionnée, jamais l'image entière.
+    Sans géométrie, on se rabat sur le rognage fixe de crop_board.
+    """
+    if geometry is None:
+        return crop_board(image)
+    board = crop_geometry(image, geometry)
+    if board.shape[0] != board_size or board.shape[1] != board_size:
+        interpolation = cv2.INTER_AREA if board.shape[0] > board_size else cv2.INTER_LINEAR
+        board = cv2.resize(board, (board_size, board_size), interpolation=interpolation)
+    return board
+
+def split_cropped_board(cropped_image):
+    """
+    Découpe un échiquier déjà rogné (carré) en 64 cases.
+    """
+    square_size = cropped_image.shape[0] // 8
     board_grid = []
     
     for row in range(8):
@@ -52,6 +90,14 @@ def split_board(image):
     
     return board_grid
 
+def split_board(image):
+    """
+    Découpe l'image en 64 cases d'échecs.
+    L'échiquier est localisé automatiquement, rogné et ramené à 816x816 pixels,
+    puis divisé en cases de 102x102 pixels (816/8 = 102).
+    """
+    return split_cropped_board(extract_board(image, locate_board(image)))
+
 def analyze_square(board_grid, square_name):
     if len(square_name) != 2:
         raise ValueError("Nom de case invalide (ex: 'e4')")
@@ -65,68 +111,58 @@ def analyze_square(board_grid, square_name):
 
     return board_grid[row][col]
 
-def preprocess_gray(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    return cv2.equalizeHist(gray)
-
-def preprocess_binary(img):
-    gray = preprocess_gray(img)
-    blur = cv2.GaussianBlur(gray, (3, 3), 0)
-    return cv2.adaptiveThreshold(
-        blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
-        cv2.THRESH_BINARY_INV, 11, 2
-    )
-
-def preprocess_edges(img):
-    gray = preprocess_gray(img)
-    return cv2.Canny(gray, 50, 150)
-
 def compare_templates(source, template, method=cv2.TM_CCOEFF_NORMED):
-    resized = cv2.resize(source, template.shape[::-1])
-    result = cv2.matchTemplate(resized, template, method)
+    if source.shape != template.shape:
+        source = cv2.resize(source, template.shape[::-1])
+    result = cv2.matchTemplate(source, template, method)
     _, val, _, _ = cv2.minMaxLoc(result)
     return val
 
-def classify_square(square_img, templates_dir, threshold=0):
+def classify_square(square_img, templates, threshold=0):
+    """
+    Classe une case en la comparant aux templates plausibles : une case
+    vide évidente est reconnue sans comparaison, et seuls les templates
+    de la couleur de la pièce sont comparés quand elle est nette.
+
+    `templates` peut être une TemplateBank déjà chargée (cas normal de l'API)
+    ou un chemin de dossier, auquel cas la banque partagée de ce dossier est utilisée.
+    """
+    bank = templates if isinstance(templates, TemplateBank) else get_template_bank(templates)
+
+    # Case vide évidente : aucune comparaison
+    std, level, empty, dark = square_statistics(cv2.cvtColor(square_img, cv2.COLOR_BGR2GRAY))
+    if empty:
+        score = (GRAY_WEIGHT + EDGE_WEIGHT) / EMPTY_PENALTY
+        return [(empty_template(bank.names, bank.brightness, level), score)] if score >= threshold else []
+
     # Prétraitement de la case
     square_gray = preprocess_gray(square_img)
-    square_binary = preprocess_binary(square_img)
     square_edges = preprocess_edges(square_img)
 
     results = []
 
-    for root, _, files in os.walk(templates_dir):
-        for file in files:
-            if not file.lower().endswith('.png'):
-                continue
-
-            path = os.path.join(root, file)
-            template_img = cv2.imread(path, cv2.IMREAD_COLOR)
-            if template_img is None:
-                continue
-
-            try:
-                template_gray = preprocess_gray(template_img)
-                template_binary = preprocess_binary(template_img)
-                template_edges = preprocess_edges(template_img)
-
-                # Comparaisons multiples
-                val_gray = compare_templates(square_gray, template_gray)
-                val_bin = compare_templates(square_binary, template_binary)
-                val_edge = compare_templates(square_edges, template_edges)
-
-                # Moyenne pondérée (tu peux ajuster les poids)
-                total_score = (val_gray * 0.8) + (val_edge * 0.4)
-
-                # Réduire le score des cases vides
-                piece_name = file.replace('.png', '')
-                if piece_name in ['blackcase', 'whitecase']:
-                    total_score = total_score / 1.23
-
-                if total_score >= threshold:
-                    results.append((piece_name, total_score))
-            except Exception:
-                continue
+    features = bank.features(square_gray.shape)
+    # Couleur évidente : seuls les templates de ce camp sont comparés
+    allowed = candidate_templates([feature[0] for feature in features], std, dark)
+    for (piece_name, template_gray, template_edges), keep in zip(features, allowed):
+        if not keep:
+            continue
+        try:
+            # Comparaisons multiples
+            val_gray = compare_templates(square_gray, template_gray)
+            val_edge = compare_templates(square_edges, template_edges)
+
+            # Moyenne pondérée (tu peux ajuster les poids)
+            total_score = (val_gray * 0.8) + (val_edge * 0.4)
+
+            # Réduire le score des cases vides
+            if piece_name in ['blackcase', 'whitecase']:
+                total_score = total_score / 1.23
+
+            if total_score >= threshold:
+                results.append((piece_name, total_score))
+        except Exception:
+            continue
 
     results.sort(key=lambda x: x[1], reverse=True)
     return results
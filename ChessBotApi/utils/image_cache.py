@@ -0,0 +1,70 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+
+# Taille de la miniature utilisée pour l'empreinte : 8x8 pixels par case
+FINGERPRINT_SIZE = 64
+# Nombre de bits gardés par pixel (absorbe le bruit de compression)
+FINGERPRINT_BITS = 4
+
+
+def board_fingerprint(cropped_board) -> str:
+    """
+    Empreinte perceptuelle d'un échiquier rogné.
+
+    L'échiquier est réduit en une miniature en niveaux de gris de 8x8 pixels
+    par case puis quantifié : deux captures identiques (ou ne différant que par
+    du bruit d'encodage) donnent la même empreinte, alors qu'une pièce déplacée
+    modifie la miniature de deux cases.
+    """
+    gray = cv2.cvtColor(cropped_board, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (FINGERPRINT_SIZE, FINGERPRINT_SIZE), interpolation=cv2.INTER_AREA)
+    quantized = thumb >> (8 - FINGERPRINT_BITS)
+    return hashlib.blake2b(quantized.tobytes(), digest_size=16).hexdigest()
+
+
+class ImageCache:
+    def __init__(self, max_size: int = 1000):
+        """
+        Cache LRU empreinte d'image -> FEN, pour sauter la reconnaissance
+        des captures déjà analysées.
+
+        Args:
+            max_size: Nombre maximal d'empreintes gardées
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, fingerprint: str) -> Optional[str]:
+        with self._lock:
+            fen = self._entries.get(fingerprint)
+            if fen is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self._stats["hits"] += 1
+            return fen
+
+    def put(self, fingerprint: str, fen: str):
+        with self._lock:
+            self._entries[fingerprint] = fen
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        return stats
@@ -0,0 +1,177 @@
+"""
+Journalisation non bloquante de l'API.
+
+Les threads des requêtes ne font que déposer les enregistrements dans une
+file bornée (QueueHandler) ; un thread QueueListener les formate et les écrit
+sur la console et dans un fichier tournant. Si la file est pleine, les
+enregistrements sont abandonnés plutôt que de ralentir la requête.
+
+Les processus fils (fork des workers de reconnaissance) n'écrivent jamais
+eux-mêmes : leurs enregistrements remontent au processus principal par une
+file multiprocessing, seul à écrire (et à faire tourner) le fichier.
+"""
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+# Attente maximale (s) des derniers enregistrements des processus fils à l'arrêt
+CHILD_LISTENER_STOP_TIMEOUT = 2.0
+# Attributs standard d'un LogRecord (les autres viennent de `extra=` et sont exportés en JSON)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        """Une ligne JSON par enregistrement (champs passés via `extra=` inclus)."""
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float):
+        """
+        Ne garde qu'une fraction des messages DEBUG (détail par requête) ;
+        les niveaux INFO et supérieurs passent toujours.
+
+        Args:
+            rate: Fraction des messages DEBUG conservés (0 à 1)
+        """
+        super().__init__()
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        """QueueHandler qui abandonne les enregistrements quand la file est pleine."""
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def forward_to(self, log_queue):
+        """Processus fils (fork) : pas de thread d'écriture, les enregistrements vont à `log_queue`."""
+        self.queue = log_queue
+
+
+class LoggingPipeline:
+    def __init__(self, handler: DroppingQueueHandler, listener: QueueListener,
+                 child_listener: QueueListener, sampler: Optional[SamplingFilter]):
+        self.handler = handler
+        self.listener = listener
+        # Enregistrements des processus fils, écrits par le processus principal
+        self.child_listener = child_listener
+        self.sampler = sampler
+
+    def stop(self):
+        """Vide les files et arrête les threads d'écriture."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        child = self.child_listener
+        if child._thread is not None:
+            # Un processus fils tué en pleine écriture garde le verrou de la file
+            # multiprocessing : l'arrêt ne doit pas bloquer la sortie du serveur
+            child.queue.cancel_join_thread()
+            child.enqueue_sentinel()
+            child._thread.join(CHILD_LISTENER_STOP_TIMEOUT)
+            child._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out if self.sampler else 0,
+        }
+
+
+_pipeline: Optional[LoggingPipeline] = None
+
+
+def setup_logging(level: str = "INFO", log_file: Optional[str] = "chessbot_api.log",
+                  json_format: bool = False, max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, queue_size: int = 10000,
+                  debug_sample_rate: float = 1.0) -> LoggingPipeline:
+    """
+    Configure le logger racine : file bornée vers la console et un fichier tournant.
+
+    Appelée une seule fois par processus (les appels suivants renvoient le
+    pipeline existant).
+
+    Args:
+        level: Niveau minimal ("DEBUG" pour le détail de chaque requête)
+        log_file: Fichier de log (None : console seulement)
+        json_format: Une ligne JSON par message au lieu du format texte
+        max_bytes: Taille d'un fichier avant rotation
+        backup_count: Nombre d'anciens fichiers conservés
+        queue_size: Messages en attente d'écriture au-delà desquels on abandonne
+        debug_sample_rate: Fraction des messages DEBUG conservés
+
+    Returns:
+        LoggingPipeline: file, thread d'écriture et compteurs (stats())
+    """
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                            backupCount=backup_count, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    sampler = SamplingFilter(debug_sample_rate) if debug_sample_rate < 1.0 else None
+    if sampler is not None:
+        queue_handler.addFilter(sampler)
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    child_queue = multiprocessing.Queue(queue_size)
+    child_listener = QueueListener(child_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    listener.start()
+    child_listener.start()
+
+    _pipeline = LoggingPipeline(queue_handler, listener, child_listener, sampler)
+    atexit.register(_pipeline.stop)
+    # Les processus de reconnaissance (fork) n'héritent pas des threads d'écriture :
+    # plusieurs processus faisant tourner le même fichier perdraient des lignes
+    os.register_at_fork(after_in_child=lambda: queue_handler.forward_to(child_queue))
+    return _pipeline
@@ -0,0 +1,234 @@
+"""
+Mesure des étapes d'une requête et métriques au format Prometheus.
+
+Chaque requête reçoit un RequestTimer (variable de contexte, propagée aux
+threads lancés avec contextvars.copy_context) ; les étapes (auth, decode,
+locate, split, classify, fen, engine_wait, search...) y ajoutent leur durée
+avec `stage(nom)`. À la fin de la requête, les durées alimentent les
+histogrammes exposés par /metrics et l'en-tête X-Debug-Timing.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Bornes (secondes) des histogrammes de latence
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestTimer:
+    def __init__(self):
+        """Durées cumulées des étapes d'une requête (secondes)."""
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.spans)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def header(self) -> str:
+        """Valeur de X-Debug-Timing : étapes et total en millisecondes."""
+        parts = [f"{name}={seconds * 1000:.2f}" for name, seconds in self.snapshot().items()]
+        parts.append(f"total={self.elapsed() * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar("chessbot_request_timer", default=None)
+
+
+def start_request() -> RequestTimer:
+    timer = RequestTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+def record_stage(name: str, seconds: float):
+    """Ajoute une durée à la requête en cours (sans effet hors requête)."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def merge_stages(spans: Optional[Dict[str, float]]):
+    """Ajoute à la requête en cours les durées mesurées dans un autre processus."""
+    for name, seconds in (spans or {}).items():
+        record_stage(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            snapshot = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+# Clés des dictionnaires stats() qui ne font qu'augmenter (exportées comme compteurs)
+STATS_COUNTERS = {
+    "hits", "misses", "disk_hits", "evictions", "invalidations", "checkouts", "timeouts",
+    "created", "recycled", "ping_failures", "respawns", "failed_health_checks", "full",
+    "incremental", "squares_reclassified", "tasks", "images", "errors", "wait_time_total_ms",
+    "dropped", "sampled_out", "leaders", "coalesced", "admitted", "shed", "shed_queue_full", "shed_timeout",
+}
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "chessbot"):
+        """
+        Métriques de l'API. Les compteurs et histogrammes sont mis à jour par
+        les requêtes ; les sources de stats() (pools, caches) sont lues au
+        moment de la collecte.
+        """
+        self.prefix = prefix
+        self._metrics = []
+        self._sources = {}
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Counter:
+        metric = Counter(f"{self.prefix}_{name}", help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(f"{self.prefix}_{name}", help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, name: str, source):
+        """Exporte les valeurs numériques de source.stats() (None : ignorée)."""
+        if source is not None:
+            self._sources[name] = source
+
+    def _render_sources(self):
+        lines = []
+        for source_name, source in self._sources.items():
+            try:
+                stats = source.stats()
+            except Exception:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                counter = key in STATS_COUNTERS
+                name = f"{self.prefix}_{source_name}_{key}" + ("_total" if counter else "")
+                lines.append(f"# TYPE {name} {'counter' if counter else 'gauge'}")
+                lines.append(f"{name} {_format_value(value)}")
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.extend(self._render_sources())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+REQUESTS = registry.counter("requests_total", "Requêtes traitées par route et code HTTP", ("route", "status"))
+REQUEST_DURATION = registry.histogram("request_duration_seconds", "Durée des requêtes par route", ("route",))
+STAGE_DURATION = registry.histogram("stage_duration_seconds", "Durée des étapes de traitement", ("stage",))
+SEARCHES_CANCELLED = registry.counter(
+    "searches_cancelled_total", "Recherches interrompues ou évitées (client parti, échéance dépassée)", ("reason",))
+SEARCHES_RESOLVED_EARLY = registry.counter(
+    "searches_resolved_early_total", "Analyses terminées sans recherche complète (partie finie, coup forcé, mat)",
+    ("reason",))
+
+
+def finish_request(timer: RequestTimer, route: str, status: int):
+    """Enregistre la durée totale et celle de chaque étape d'une requête."""
+    REQUESTS.inc(route=route, status=status)
+    REQUEST_DURATION.observe(timer.elapsed(), route=route)
+    for name, seconds in timer.snapshot().items():
+        STAGE_DURATION.observe(seconds, stage=name)
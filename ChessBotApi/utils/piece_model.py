@@ -0,0 +1,150 @@
+import cv2
+import numpy as np
+
+# Taille à laquelle chaque case est ramenée avant l'extraction des caractéristiques
+FEATURE_SIZE = 32
+# Miniature en niveaux de gris (couleur de la pièce par rapport au fond)
+THUMB_SIZE = 8
+# Étiquette des cases vides (traitée comme vide par generate_fen_from_matrix)
+EMPTY_LABEL = "empty"
+
+# Histogrammes d'orientations (HOG) : cellules de 8 px, 9 orientations, blocs 2x2
+HOG_CELL = 8
+HOG_BINS = 9
+
+
+def _hog(batch) -> np.ndarray:
+    """
+    Descripteurs HOG d'un lot d'images (n, FEATURE_SIZE, FEATURE_SIZE),
+    calculés en une seule passe NumPy pour tout le lot.
+    """
+    n = len(batch)
+    gx = np.zeros_like(batch)
+    gy = np.zeros_like(batch)
+    gx[:, :, 1:-1] = batch[:, :, 2:] - batch[:, :, :-2]
+    gy[:, 1:-1, :] = batch[:, 2:, :] - batch[:, :-2, :]
+    magnitude = np.hypot(gx, gy)
+    # Orientations non signées (0-180°)
+    angle = np.rad2deg(np.arctan2(gy, gx)) % 180
+    bins = np.minimum((angle / (180 / HOG_BINS)).astype(np.int64), HOG_BINS - 1)
+
+    cells = FEATURE_SIZE // HOG_CELL
+    histograms = np.zeros((n, FEATURE_SIZE, FEATURE_SIZE, HOG_BINS), dtype=np.float32)
+    np.put_along_axis(histograms, bins[..., None], magnitude[..., None], axis=3)
+    histograms = histograms.reshape(n, cells, HOG_CELL, cells, HOG_CELL, HOG_BINS).sum(axis=(2, 4))
+
+    # Normalisation L2 par bloc de 2x2 cellules (pas d'une cellule)
+    blocks = np.concatenate([
+        histograms[:, dy:cells - 1 + dy, dx:cells - 1 + dx]
+        for dy in (0, 1) for dx in (0, 1)
+    ], axis=3).reshape(n, (cells - 1) ** 2, 4 * HOG_BINS)
+    blocks /= np.sqrt((blocks ** 2).sum(axis=2, keepdims=True) + 1e-6)
+    return blocks.reshape(n, -1)
+
+
+def square_features(squares) -> np.ndarray:
+    """
+    Caractéristiques d'un lot de cases : HOG (forme de la pièce) et miniature
+    en niveaux de gris centrée sur la couleur du fond (couleur de la pièce).
+
+    Returns:
+        Matrice float32 (n, n_caractéristiques)
+    """
+    small = np.empty((len(squares), FEATURE_SIZE, FEATURE_SIZE), dtype=np.float32)
+    for i, square in enumerate(squares):
+        gray = square if square.ndim == 2 else cv2.cvtColor(square, cv2.COLOR_BGR2GRAY)
+        interpolation = cv2.INTER_AREA if gray.shape[0] > FEATURE_SIZE else cv2.INTER_LINEAR
+        small[i] = cv2.resize(gray, (FEATURE_SIZE, FEATURE_SIZE), interpolation=interpolation)
+
+    # Le fond est estimé sur le pourtour de chaque case
+    border = np.concatenate((small[:, 0], small[:, -1], small[:, :, 0], small[:, :, -1]), axis=1)
+    background = np.median(border, axis=1)[:, None]
+    step = FEATURE_SIZE // THUMB_SIZE
+    thumbs = small.reshape(len(small), THUMB_SIZE, step, THUMB_SIZE, step).mean(axis=(2, 4))
+    thumbs = thumbs.reshape(len(small), -1)
+    return np.concatenate((_hog(small), (thumbs - background) / 255.0, thumbs / 255.0), axis=1)
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class PieceClassifier:
+    def __init__(self, classes, weights, bias, mean, std):
+        """
+        Classifieur linéaire (régression logistique multinomiale) des cases,
+        entraîné par train_classifier.py. Les 64 cases d'un échiquier sont
+        classées en une seule multiplication matricielle.
+
+        Args:
+            classes: Noms des classes (noms de templates sans numéro, ou EMPTY_LABEL)
+            weights: Matrice (n_caractéristiques, n_classes)
+            bias: Vecteur (n_classes,)
+            mean, std: Standardisation des caractéristiques
+        """
+        self.classes = list(classes)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+
+    @classmethod
+    def load(cls, path: str) -> "PieceClassifier":
+        data = np.load(path, allow_pickle=False)
+        return cls([str(c) for c in data["classes"]], data["weights"], data["bias"], data["mean"], data["std"])
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            classes=np.array(self.classes),
+            weights=self.weights,
+            bias=self.bias,
+            mean=self.mean,
+            std=self.std,
+        )
+
+    def predict_features(self, features) -> np.ndarray:
+        """Probabilités (n, n_classes) pour des caractéristiques déjà extraites."""
+        return _softmax(((features - self.mean) / self.std) @ self.weights + self.bias)
+
+    def predict(self, squares):
+        """
+        Returns:
+            Tuple (liste des classes prédites, probabilités de ces classes)
+        """
+        if not len(squares):
+            return [], np.zeros(0, dtype=np.float32)
+        probabilities = self.predict_features(square_features(squares))
+        best = probabilities.argmax(axis=1)
+        return [self.classes[i] for i in best], probabilities[np.arange(len(best)), best]
+
+    def label_squares(self, squares):
+        """Même interface que board_classifier.label_squares."""
+        return self.predict(squares)[0]
+
+
+def train_softmax(features, labels, n_classes: int, epochs: int = 300,
+                  learning_rate: float = 0.5, l2: float = 1e-3, seed: int = 0):
+    """
+    Entraîne une régression logistique multinomiale par descente de gradient
+    (lot complet, NumPy uniquement).
+
+    Returns:
+        Tuple (weights, bias, mean, std)
+    """
+    mean = features.mean(axis=0)
+    std = features.std(axis=0) + 1e-6
+    x = (features - mean) / std
+    rng = np.random.default_rng(seed)
+    weights = rng.normal(0, 0.01, (x.shape[1], n_classes)).astype(np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    targets = np.eye(n_classes, dtype=np.float32)[labels]
+
+    for _ in range(epochs):
+        probabilities = _softmax(x @ weights + bias)
+        error = (probabilities - targets) / len(x)
+        weights -= learning_rate * (x.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+    return weights, bias, mean, std
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+# Écart-type (niveaux de gris, avant égalisation) sous lequel une image est considérée unie
+FLAT_STD = 4.0
+# Bordure ignorée (fraction du côté) pour décider si une case est unie
+FLAT_MARGIN = 0.2
+
+
+def preprocess_gray(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.equalizeHist(gray)
+
+def preprocess_binary(img):
+    gray = preprocess_gray(img)
+    blur = cv2.GaussianBlur(gray, (3, 3), 0)
+    return cv2.adaptiveThreshold(
+        blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY_INV, 11, 2
+    )
+
+def preprocess_edges(img):
+    gray = preprocess_gray(img)
+    return cv2.Canny(gray, 50, 150)
+
+def is_flat(img) -> bool:
+    """
+    Indique si le centre d'une image est uni (case vide).
+
+    preprocess_gray égalise l'histogramme : sur une image presque unie, il
+    étire le bruit (ou le liseré de la case voisine après une réduction)
+    sur toute la plage de gris et la corrélation n'a plus de sens.
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    # Seul le centre compte : les coordonnées (a-h, 1-8) sont dans les coins
+    h, w = gray.shape
+    dy, dx = int(h * FLAT_MARGIN), int(w * FLAT_MARGIN)
+    return float(gray[dy:h - dy, dx:w - dx].std()) < FLAT_STD
+
+def normalize_rows(stack):
+    """
+    Centre et normalise chaque ligne d'une pile d'images aplaties.
+
+    Le produit scalaire de deux lignes normalisées est exactement le score
+    TM_CCOEFF_NORMED de cv2.matchTemplate pour deux images de même taille.
+
+    Returns:
+        Tuple (matrice float32 (n, h*w) normalisée, masque des lignes constantes)
+    """
+    flat = np.array(stack, dtype=np.float32).reshape(len(stack), -1)
+    flat -= flat.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum('ij,ij->i', flat, flat))
+    constant = norms < 1e-6
+    norms[constant] = 1.0
+    flat /= norms[:, None]
+    return flat, constant
@@ -0,0 +1,209 @@
+import logging
+import traceback
+
+import cv2
+import numpy as np
+
+from ChessBotApi.config import ALLOWED_EXTENSIONS
+from ChessBotApi.utils.fen_builder import (
+    extract_board,
+    split_cropped_board,
+    generate_fen_from_matrix,
+)
+from ChessBotApi.utils.board_classifier import label_squares
+from ChessBotApi.utils.image_cache import board_fingerprint
+from ChessBotApi.utils.board_locator import locate_board
+from ChessBotApi.utils.piece_model import FEATURE_SIZE, PieceClassifier
+from ChessBotApi.utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDecodeError(ValueError):
+    """Les données reçues ne sont pas une image lisible."""
+
+
+def allowed_file(name):
+    return "." in name and name.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def decode_image(data: bytes):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def load_classifier(backend: str, model_path: str):
+    """
+    Classifieur de cases correspondant au moteur configuré.
+
+    Returns:
+        PieceClassifier pour "model", None pour "templates" (corrélation)
+
+    Raises:
+        ValueError: si le moteur est inconnu
+    """
+    if backend == "templates":
+        return None
+    if backend == "model":
+        return PieceClassifier.load(model_path)
+    raise ValueError(f"Moteur de reconnaissance inconnu: {backend}")
+
+
+class BoardRecognizer:
+    def __init__(self, template_bank, image_cache=None, board_sessions=None, classify_chunk: int = 16,
+                 geometry_cache=None, classifier=None):
+        """
+        Chaîne complète image -> FEN : rognage, cache d'empreintes,
+        reconnaissance incrémentale par session et classification vectorisée.
+
+        Args:
+            template_bank: TemplateBank chargée
+            image_cache: ImageCache optionnel (empreinte -> FEN)
+            board_sessions: BoardSessionStore optionnel (reconnaissance incrémentale)
+            classify_chunk: Nombre d'échiquiers classés ensemble dans process_images
+            geometry_cache: BoardGeometryCache optionnel (position de l'échiquier par session)
+            classifier: PieceClassifier optionnel, utilisé à la place des templates
+        """
+        self.template_bank = template_bank
+        self.image_cache = image_cache
+        self.board_sessions = board_sessions
+        self.classify_chunk = classify_chunk
+        self.geometry_cache = geometry_cache
+        self.classifier = classifier
+
+    def crop(self, img, session_id=None):
+        """
+        Localise et rogne l'échiquier. Pour une session, la position détectée
+        est réutilisée tant que la taille des captures ne change pas.
+        """
+        geometry = None
+        use_cache = session_id and self.geometry_cache is not None
+        if use_cache:
+            geometry = self.geometry_cache.get(session_id, img.shape)
+        if geometry is None:
+            geometry = locate_board(img)
+            if geometry is None:
+                logger.warning("Échiquier non détecté, rognage par défaut")
+            elif use_cache:
+                self.geometry_cache.put(session_id, img.shape, geometry)
+        if geometry is None:
+            return extract_board(img, None)
+        if self.classifier is not None:
+            # Le classifieur travaille sur des cases de FEATURE_SIZE pixels
+            return extract_board(img, geometry, board_size=8 * FEATURE_SIZE)
+        # Travail à la résolution native : l'échiquier est ramené au niveau de
+        # pyramide le plus proche au lieu d'être toujours agrandi à 816 px
+        level = self.template_bank.nearest_size(geometry.square_size)
+        return extract_board(img, geometry, board_size=8 * level)
+
+    def _label(self, squares):
+        if self.classifier is not None:
+            return self.classifier.label_squares(squares)
+        return label_squares(squares, self.template_bank)
+
+    def refresh_templates(self):
+        """Recharge les templates s'ils ont changé et invalide ce qui en dépend."""
+        if self.template_bank.reload_if_changed():
+            logger.info("Templates rechargés depuis le disque")
+            if self.image_cache is not None:
+                self.image_cache.clear()
+            if self.board_sessions is not None:
+                self.board_sessions.reset()
+
+    def process_image(self, img, session_id=None):
+        """
+        Reconnaît un échiquier.
+
+        Returns:
+            FEN de la position
+        """
+        self.refresh_templates()
+        with stage("locate"):
+            board = self.crop(img, session_id)
+        fingerprint = board_fingerprint(board)
+        if self.image_cache is not None:
+            fen = self.image_cache.get(fingerprint)
+            if fen is not None:
+                logger.debug("Image déjà analysée, FEN en cache: %s", fen)
+                return fen
+
+        with stage("split"):
+            grid = split_cropped_board(board)
+            squares = [square for line in grid for square in line]
+
+        with stage("classify"):
+            if session_id and self.board_sessions is not None:
+                # Seules les cases modifiées depuis l'image précédente sont reclassées
+                labels = self.board_sessions.recognize(session_id, board, squares, self._label)
+            else:
+                # Classification vectorisée des 64 cases en une seule passe
+                labels = self._label(squares)
+        matrix = [labels[row * 8:(row + 1) * 8] for row in range(8)]
+
+        with stage("fen"):
+            fen = generate_fen_from_matrix(matrix)
+        if self.image_cache is not None:
+            self.image_cache.put(fingerprint, fen)
+        return fen
+
+    def process_images(self, imgs):
+        """
+        Reconnaît plusieurs échiquiers : les cases de tous les échiquiers non
+        présents dans le cache d'images sont classées ensemble par lots.
+
+        Returns:
+            Liste des FEN (None pour une image illisible), dans l'ordre des images
+        """
+        self.refresh_templates()
+
+        fens = [None] * len(imgs)
+        pending = []
+        # Images identiques dans le même lot : une seule reconnaissance
+        duplicates = {}
+        for index, img in enumerate(imgs):
+            if img is None:
+                continue
+            try:
+                with stage("locate"):
+                    board = self.crop(img)
+                fingerprint = board_fingerprint(board)
+                if fingerprint in duplicates:
+                    duplicates[fingerprint].append(index)
+                    continue
+                fen = self.image_cache.get(fingerprint) if self.image_cache is not None else None
+                if fen is not None:
+                    fens[index] = fen
+                    continue
+                duplicates[fingerprint] = [index]
+                with stage("split"):
+                    grid = split_cropped_board(board)
+                pending.append((fingerprint, [square for line in grid for square in line]))
+            except Exception as e:
+                logger.error(f"Image processing error (image {index}): {str(e)}")
+
+        # Les échiquiers sont classés par lots de même taille de case
+        by_size = {}
+        for fingerprint, squares in pending:
+            by_size.setdefault(squares[0].shape[:2], []).append((fingerprint, squares))
+        chunks = [
+            group[start:start + self.classify_chunk]
+            for group in by_size.values()
+            for start in range(0, len(group), self.classify_chunk)
+        ]
+
+        for chunk in chunks:
+            try:
+                with stage("classify"):
+                    labels = self._label([square for _, squares in chunk for square in squares])
+            except Exception as e:
+                logger.error(f"Image processing error: {str(e)}\n{traceback.format_exc()}")
+                continue
+            for position, (fingerprint, _) in enumerate(chunk):
+                board_labels = labels[position * 64:(position + 1) * 64]
+                with stage("fen"):
+                    fen = generate_fen_from_matrix([board_labels[row * 8:(row + 1) * 8] for row in range(8)])
+                if self.image_cache is not None:
+                    self.image_cache.put(fingerprint, fen)
+                for index in duplicates[fingerprint]:
+                    fens[index] = fen
+
+        return fens
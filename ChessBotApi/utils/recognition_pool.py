@@ -0,0 +1,234 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from ChessBotApi.utils.image_cache import ImageCache
+from ChessBotApi.utils.metrics import merge_stages, stage, start_request
+from ChessBotApi.utils.recognition import BoardRecognizer, ImageDecodeError, decode_image, load_classifier
+from ChessBotApi.utils.template_bank import TemplateBank
+
+# Reconnaissance propre à chaque processus de travail (chargée par _init_worker)
+_worker_recognizer = None
+
+
+def _init_worker(templates_dir: str, image_cache_size: int, classify_chunk: int,
+                 backend: str, model_path: Optional[str]):
+    """Charge et prétraite les templates (et le classifieur) une seule fois par processus."""
+    global _worker_recognizer
+    _worker_recognizer = BoardRecognizer(
+        TemplateBank(templates_dir),
+        ImageCache(max_size=image_cache_size),
+        classify_chunk=classify_chunk,
+        classifier=load_classifier(backend, model_path),
+    )
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _recognize_shared(shm_name: str, spans):
+    """
+    Décode et reconnaît les images d'un bloc de mémoire partagée.
+
+    Args:
+        shm_name: Nom du bloc SharedMemory écrit par le processus principal
+        spans: Liste (offset, longueur) des images encodées dans le bloc
+
+    Returns:
+        (liste de FEN, None pour une image illisible ; liste des images décodées (bool) ; timings ; pid)
+    """
+    start = time.perf_counter()
+    # Durées des étapes mesurées dans ce processus, renvoyées au serveur
+    timer = start_request()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # Décodage directement depuis le bloc partagé, sans copie intermédiaire
+        buffer = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+        with stage("decode"):
+            imgs = [decode_image(buffer[offset:offset + length]) if length else None for offset, length in spans]
+        del buffer
+    finally:
+        shm.close()
+    decoded = time.perf_counter()
+
+    if len(imgs) == 1:
+        fens = [_worker_recognizer.process_image(imgs[0]) if imgs[0] is not None else None]
+    else:
+        fens = _worker_recognizer.process_images(imgs)
+    done = time.perf_counter()
+
+    timings = {
+        "decode_ms": (decoded - start) * 1000,
+        "recognition_ms": (done - decoded) * 1000,
+        "total_ms": (done - start) * 1000,
+        "stages": timer.snapshot(),
+    }
+    return fens, [img is not None for img in imgs], timings, os.getpid()
+
+
+class RecognitionPool:
+    def __init__(self, templates_dir: str, workers: Optional[int] = None,
+                 image_cache_size: int = 1000, classify_chunk: int = 16,
+                 backend: str = "templates", model_path: Optional[str] = None):
+        """
+        Pool de processus pour le décodage et la reconnaissance des échiquiers.
+
+        Chaque processus charge la banque de templates une fois au démarrage.
+        Les images encodées lui sont transmises par mémoire partagée
+        (multiprocessing.shared_memory) plutôt que sérialisées avec pickle.
+
+        Args:
+            templates_dir: Dossier des templates
+            workers: Nombre de processus (défaut : nombre de cœurs CPU)
+            image_cache_size: Taille du cache d'empreintes de chaque processus
+            classify_chunk: Nombre d'échiquiers classés ensemble dans un lot
+            backend: Moteur de classification des cases ("templates" ou "model")
+            model_path: Fichier du classifieur pour le moteur "model"
+        """
+        self.workers = workers or os.cpu_count() or 1
+        # fork : les processus ne réimportent pas le module principal (api.py),
+        # qui démarrerait sinon ses propres moteurs Stockfish
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        # Le suivi des blocs partagés doit être commun au serveur et aux processus,
+        # sinon chaque processus croit avoir des blocs « perdus » à nettoyer
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(method),
+            initializer=_init_worker,
+            initargs=(templates_dir, image_cache_size, classify_chunk, backend, model_path),
+        )
+        # Démarre tous les processus tout de suite, avant que le serveur ne lance ses threads
+        for future in [self._executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        self._lock = threading.Lock()
+        self._stats = {"tasks": 0, "images": 0, "errors": 0}
+        self._per_worker = {}
+
+    def _record(self, images: int, timings: dict, pid: int):
+        with self._lock:
+            self._stats["tasks"] += 1
+            self._stats["images"] += images
+            worker = self._per_worker.setdefault(pid, {
+                "tasks": 0,
+                "images": 0,
+                "decode_ms": 0.0,
+                "recognition_ms": 0.0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            })
+            worker["tasks"] += 1
+            worker["images"] += images
+            worker["decode_ms"] += timings["decode_ms"]
+            worker["recognition_ms"] += timings["recognition_ms"]
+            worker["total_ms"] += timings["total_ms"]
+            worker["max_ms"] = max(worker["max_ms"], timings["total_ms"])
+
+    def _submit(self, blobs: List[Optional[bytes]]) -> Future:
+        """Copie les images dans un bloc partagé et envoie la tâche à un processus."""
+        total = sum(len(blob) for blob in blobs if blob)
+        shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        spans = []
+        offset = 0
+        for blob in blobs:
+            length = len(blob) if blob else 0
+            if length:
+                shm.buf[offset:offset + length] = blob
+            spans.append((offset, length))
+            offset += length
+
+        def release(future):
+            shm.close()
+            shm.unlink()
+            if future.cancelled() or future.exception() is not None:
+                with self._lock:
+                    self._stats["errors"] += 1
+                return
+            fens, _, timings, pid = future.result()
+            self._record(len(fens), timings, pid)
+
+        try:
+            future = self._executor.submit(_recognize_shared, shm.name, spans)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        future.add_done_callback(release)
+        return future
+
+    def submit(self, data: bytes) -> Future:
+        """
+        Reconnaissance asynchrone d'une image encodée (PNG/JPEG).
+
+        Le résultat du Future est le tuple brut du processus : utiliser `result_fen`.
+        """
+        return self._submit([data])
+
+    @staticmethod
+    def result_fens(result) -> List[Optional[str]]:
+        """FEN d'un résultat brut ; les durées des étapes sont ajoutées à la requête en cours."""
+        fens, _, timings, _ = result
+        merge_stages(timings.get("stages"))
+        return fens
+
+    @classmethod
+    def result_fen(cls, result) -> Optional[str]:
+        """
+        Raises:
+            ImageDecodeError: si l'image n'a pas pu être décodée
+        """
+        fens = cls.result_fens(result)
+        if not result[1][0]:
+            raise ImageDecodeError("Image illisible")
+        return fens[0]
+
+    def recognize(self, data: bytes) -> Optional[str]:
+        """
+        Reconnaît une image encodée dans un processus du pool.
+
+        Returns:
+            FEN de la position
+
+        Raises:
+            ImageDecodeError: si l'image n'a pas pu être décodée
+        """
+        return self.result_fen(self.submit(data).result())
+
+    def submit_many(self, blobs: List[Optional[bytes]]) -> List[Future]:
+        """Répartit un lot d'images encodées en un bloc par processus."""
+        chunk = max(1, math.ceil(len(blobs) / self.workers))
+        return [self._submit(blobs[start:start + chunk]) for start in range(0, len(blobs), chunk)]
+
+    def recognize_many(self, blobs: List[Optional[bytes]]) -> List[Optional[str]]:
+        """
+        Reconnaît un lot d'images encodées, réparti sur tous les processus.
+
+        Returns:
+            Liste des FEN (None pour une image illisible), dans l'ordre des images
+        """
+        fens = []
+        for future in self.submit_many(blobs):
+            fens.extend(self.result_fens(future.result()))
+        return fens
+
+    def stats(self) -> dict:
+        """Compteurs globaux et temps cumulés par processus (clé : pid)."""
+        with self._lock:
+            stats = dict(self._stats)
+            per_worker = {pid: dict(values) for pid, values in self._per_worker.items()}
+        for values in per_worker.values():
+            values["avg_ms"] = values["total_ms"] / (values["tasks"] or 1)
+        stats["workers"] = self.workers
+        stats["per_worker"] = per_worker
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,369 @@
+"""
+Traitement des requêtes commun au serveur Flask (api.py) et au serveur ASGI (asgi.py).
+
+Rien ici ne dépend du framework : les fonctions reçoivent les données déjà
+lues de la requête (paramètres, fichiers, JSON) et renvoient un tuple
+(corps JSON, code HTTP[, en-têtes]) que Flask et Quart acceptent tels quels.
+Chaque serveur ne garde que la lecture de la requête et les entrées/sorties
+(base de données, moteurs, reconnaissance).
+"""
+import base64
+import hmac
+import io
+import json
+import logging
+import traceback
+import zipfile
+from datetime import datetime
+from typing import Optional
+
+from ChessBotApi.utils.admission import AdmissionRejected
+from ChessBotApi.utils.api_key_cache import ApiKeyCache
+from ChessBotApi.utils.cancellation import SearchCancelled
+from ChessBotApi.utils.db_pool import DBPoolExhausted
+from ChessBotApi.utils.recognition import allowed_file
+from ChessBotApi.utils.uci_search import analysis_response
+
+logger = logging.getLogger(__name__)
+
+API_KEY_QUERY = "SELECT isActive FROM ApiKey WHERE keyValue = %s"
+USER_ID_QUERY = "SELECT userId FROM ApiKey WHERE keyValue = %s AND isActive = 1"
+USER_SETTINGS_QUERY = "SELECT * FROM UserSettings WHERE userId = %s"
+UPDATE_SETTINGS_QUERY = "UPDATE UserSettings SET skillLevel = %s, searchDepth = %s, updatedAt = NOW() WHERE userId = %s"
+
+# Secret partagé des routes d'administration (voir ADMIN_TOKEN)
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def db_busy_response():
+    # Pool saturé : le client peut réessayer rapidement au lieu d'obtenir une erreur 500
+    return {
+        "error": "db_busy",
+        "status": "error",
+        "details": "Database connection pool exhausted, retry later"
+    }, 503, {"Retry-After": "1"}
+
+
+def admission_rejected_response(error: AdmissionRejected):
+    # Serveur saturé : rejet immédiat plutôt qu'une attente qui ferait expirer le client
+    return {
+        "error": "server_busy",
+        "status": "error",
+        "details": error.reason
+    }, 503, {"Retry-After": str(error.retry_after)}
+
+
+def search_cancelled_response(error: SearchCancelled):
+    # Client parti (499, code d'usage des proxys) ou échéance X-Deadline-Ms dépassée (504)
+    return {
+        "error": "search_cancelled",
+        "status": "error",
+        "details": error.reason
+    }, 499 if error.reason == "disconnect" else 504
+
+
+def no_image_response():
+    return {
+        "error": "no image",
+        "status": "error",
+        "details": "No valid image was provided in the request"
+    }, 400
+
+
+def invalid_key_response():
+    return {
+        "error": "invalid_api_key",
+        "status": "error",
+        "details": "Invalid or missing API key"
+    }, 401
+
+
+def split_error_response():
+    return {
+        "error": "split error",
+        "status": "error",
+        "details": "Failed to process the chessboard image"
+    }, 400
+
+
+class BatchTooLarge(Exception):
+    """Archive d'un lot refusée avant décompression (trop d'images ou trop volumineuse)."""
+
+    def __init__(self, error: str, details: str):
+        super().__init__(details)
+        self.error = error
+        self.details = details
+
+
+def batch_too_large_response(e: BatchTooLarge):
+    return {
+        "error": e.error,
+        "status": "error",
+        "details": e.details
+    }, 413
+
+
+def too_many_images_response(max_images: int):
+    return {
+        "error": "too many images",
+        "status": "error",
+        "details": f"A batch may contain at most {max_images} images"
+    }, 413
+
+
+def analysis_failed_response(e: Exception):
+    error_msg = f"Analysis failed: {str(e)}"
+    logger.error(error_msg)
+    return {
+        "error": str(e),
+        "status": "error",
+        "details": error_msg,
+        "timestamp": datetime.now().isoformat()
+    }, 500
+
+
+def error_response(e: Exception):
+    error_msg = f"Unexpected error: {str(e)}\n{traceback.format_exc()}"
+    logger.error(error_msg)
+    return {
+        "error": str(e),
+        "status": "error",
+        "details": error_msg,
+        "timestamp": datetime.now().isoformat()
+    }, 500
+
+
+def forbidden_response():
+    return {"error": "forbidden"}, 403
+
+
+def is_admin_request(remote_addr: Optional[str], token: Optional[str], allowed_ips, admin_token: str) -> bool:
+    """
+    Accès aux routes d'administration : adresse dans `allowed_ips` et, si un
+    secret est configuré, en-tête X-Admin-Token identique.
+
+    Args:
+        remote_addr: Adresse du client
+        token: Valeur de l'en-tête X-Admin-Token (None si absent)
+        allowed_ips: Adresses autorisées (ADMIN_ALLOWED_IPS)
+        admin_token: Secret partagé (ADMIN_TOKEN), chaîne vide si aucun
+    """
+    if remote_addr not in allowed_ips:
+        return False
+    if not admin_token:
+        return True
+    return token is not None and hmac.compare_digest(token.encode(), admin_token.encode())
+
+
+def analysis_params(args, max_multipv: int):
+    """
+    Paramètres ?skill_level=, ?depth= et ?multipv= des routes d'analyse.
+
+    Returns:
+        (skill_level, depth, multipv), multipv borné à [1, max_multipv]
+    """
+    skill_level = int(args.get('skill_level', 20))
+    depth = int(args.get('depth', 15))
+    multipv = min(max(int(args.get('multipv', 1)), 1), max_multipv)
+    return skill_level, depth, multipv
+
+
+def search_limits(args):
+    """Limites facultatives ?nodes= et ?movetime= de /analyze (None si absentes)."""
+    nodes = int(args.get('nodes', 0)) or None
+    movetime = int(args.get('movetime', 0)) or None
+    return nodes, movetime
+
+
+def stream_params(args, max_movetime: int):
+    """
+    Returns:
+        (movetime, use_sse) pour /analyze/stream ; jamais de recherche sans limite de temps
+    """
+    movetime = int(args.get('movetime', 1000))
+    movetime = min(movetime, max_movetime) if movetime > 0 else max_movetime
+    use_sse = args.get('format', 'sse') != 'ndjson'
+    return movetime, use_sse
+
+
+def request_session_id(headers, args) -> Optional[str]:
+    return headers.get('X-Session-Id') or args.get('session_id')
+
+
+def request_image(files, json_data: Optional[dict]) -> Optional[bytes]:
+    """
+    Image encodée d'une requête : fichier multipart "image" ou JSON {"image": base64}.
+
+    Args:
+        files: Fichiers multipart de la requête
+        json_data: Corps JSON (None si la requête n'est pas en JSON)
+    """
+    if "image" in files:
+        f = files["image"]
+        if f.filename and allowed_file(f.filename):
+            logger.debug("Processing uploaded file: %s", f.filename)
+            return f.read()
+    elif json_data is not None:
+        if "image" in json_data:
+            return base64.b64decode(json_data["image"])
+    return None
+
+
+def batch_images(files, zip_body: Optional[bytes], json_data: Optional[dict], max_images: int,
+                 max_image_size: int, max_total_size: int) -> list:
+    """
+    Images d'une requête de lot, dans l'ordre fourni : fichiers multipart
+    "images", archive zip (fichier "archive" ou corps application/zip) ou
+    JSON {"images": [base64, ...]}.
+
+    Une archive est contrôlée avant toute décompression, sur les tailles
+    annoncées par son répertoire central (zipfile ne décompresse pas au-delà).
+
+    Args:
+        files: Fichiers multipart de la requête
+        zip_body: Corps de la requête si son type est application/zip, sinon None
+        json_data: Corps JSON (None si la requête n'est pas en JSON)
+        max_images: Nombre maximal d'entrées d'une archive
+        max_image_size: Taille maximale d'une image décompressée (octets)
+        max_total_size: Taille maximale de l'archive décompressée (octets)
+
+    Returns:
+        Liste d'images encodées (None pour une entrée illisible)
+
+    Raises:
+        zipfile.BadZipFile: si l'archive est invalide
+        BatchTooLarge: si l'archive dépasse l'une des limites
+    """
+    blobs = []
+    if "archive" in files or zip_body is not None:
+        raw = files["archive"].read() if "archive" in files else zip_body
+        with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+            entries = [info for info in archive.infolist() if not info.is_dir()]
+            if len(entries) > max_images:
+                raise BatchTooLarge("too many images", f"A batch may contain at most {max_images} images")
+            entries = [info for info in entries if allowed_file(info.filename)]
+            if any(info.file_size > max_image_size for info in entries):
+                raise BatchTooLarge("image too large",
+                                    f"Each image may be at most {max_image_size} bytes once decompressed")
+            if sum(info.file_size for info in entries) > max_total_size:
+                raise BatchTooLarge("batch too large",
+                                    f"A batch may be at most {max_total_size} bytes once decompressed")
+            for info in entries:
+                blobs.append(archive.read(info))
+    elif "images" in files:
+        for f in files.getlist("images"):
+            blobs.append(f.read() if f.filename and allowed_file(f.filename) else None)
+    elif json_data is not None:
+        for encoded in json_data.get("images", []):
+            try:
+                blobs.append(base64.b64decode(encoded))
+            except Exception:
+                blobs.append(None)
+    return blobs
+
+
+def analysis_body(fen: str, analysis: dict, multipv: int) -> dict:
+    return {
+        "fen": fen,
+        **analysis_response(analysis, multipv),
+        "status": "success",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def batch_body(fens: list, analyses: dict, multipv: int) -> dict:
+    """
+    Args:
+        fens: FEN de chaque image (None si non reconnue), dans l'ordre de la requête
+        analyses: {fen: (analyse, erreur)} pour chaque position distincte
+    """
+    results = []
+    for index, fen in enumerate(fens):
+        if fen is None:
+            results.append({"index": index, **split_error_response()[0]})
+            continue
+        result, error = analyses[fen]
+        if error is not None:
+            results.append({"index": index, "fen": fen, "error": error, "status": "error"})
+        else:
+            results.append({
+                "index": index,
+                "fen": fen,
+                **analysis_response(result, multipv),
+                "status": "success"
+            })
+    return {
+        "results": results,
+        "unique_positions": len(analyses),
+        "status": "success",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def stream_event(kind: str, payload: dict, use_sse: bool) -> str:
+    """Un événement de /analyze/stream (Server-Sent Events ou ligne JSON)."""
+    if use_sse:
+        return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps(dict(payload, event=kind)) + "\n"
+
+
+def stream_mimetype(use_sse: bool) -> str:
+    return "text/event-stream" if use_sse else "application/x-ndjson"
+
+
+# En-têtes des réponses en streaming (pas de mise en tampon par un proxy)
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def stream_bestmove(payload: dict, last: Optional[dict]) -> dict:
+    """Complète l'événement "bestmove" avec le score (valeur et type) et la profondeur de la dernière ligne principale."""
+    if last is not None:
+        payload["score"] = last["score"]["value"]
+        payload["score_type"] = last["score"]["type"]
+        payload["depth"] = last.get("depth")
+    return payload
+
+
+def api_key_result(cache: ApiKeyCache, api_key: str, row) -> bool:
+    """Mémorise le résultat de API_KEY_QUERY pour une clé."""
+    is_active = bool(row and row[0])
+    cache.put(api_key, is_active)
+    return is_active
+
+
+def api_key_fallback(cache: ApiKeyCache, api_key: str, error: Exception) -> bool:
+    """
+    Base indisponible : on se rabat sur la dernière réponse connue pour cette clé.
+
+    Raises:
+        DBPoolExhausted: si la base est saturée et que la clé n'a jamais été vue
+    """
+    stale = cache.get(api_key, allow_expired=True)
+    if stale is not None:
+        logger.warning(f"Base indisponible, clé API vérifiée depuis le cache expiré: {error}")
+        return stale
+    logger.error(f"Erreur de connexion à la base de données: {error}")
+    if isinstance(error, DBPoolExhausted):
+        raise error
+    return False
+
+
+def settings_update(data: Optional[dict]):
+    """(skillLevel, searchDepth) du corps JSON de POST /user_settings."""
+    data = data or {}
+    return data.get("skillLevel"), data.get("searchDepth")
+
+
+def invalidate_api_key_cache(cache: ApiKeyCache, data: Optional[dict]):
+    """Vide le cache des clés API : toutes, ou seulement celles de {"keys": [...]}."""
+    keys = (data or {}).get("keys")
+    if keys is None:
+        cache.invalidate()
+    else:
+        for key in keys:
+            cache.invalidate(key)
+    return {"status": "success"}
+
+
+def stats_body(sources: dict) -> dict:
+    return {name: source.stats() if source is not None else None for name, source in sources.items()}
@@ -0,0 +1,114 @@
+"""
+Budget de recherche d'une requête.
+
+Le client peut fixer une profondeur, un nombre de nœuds, un temps de
+recherche et une échéance (X-Deadline-Ms) ; toutes les limites sont passées
+à "go" et le moteur s'arrête à la première atteinte, la moins coûteuse.
+Les positions sans vraie décision à prendre (partie terminée, mat en un)
+sont résolues sans moteur ; un coup forcé ne demande qu'une recherche
+minimale, pour l'évaluation.
+"""
+from typing import Optional
+
+import chess
+
+# Marge (ms) gardée avant l'échéance du client : envoi de "stop", lecture de "bestmove", réponse HTTP
+DEADLINE_MARGIN_MS = 50
+# Temps de recherche minimal (ms) quand l'échéance est presque atteinte
+MIN_MOVETIME_MS = 10
+# Niveau de jeu à partir duquel un mat en un est joué sans consulter le moteur
+# (aux niveaux réduits, Stockfish choisit volontairement des coups plus faibles)
+FULL_STRENGTH_SKILL = 20
+# Profondeur de recherche d'un coup forcé : le coup est connu, seule l'évaluation est demandée au moteur
+FORCED_MOVE_DEPTH = 1
+
+
+def plan_search(depth: Optional[int] = None, nodes: Optional[int] = None, movetime: Optional[int] = None,
+                remaining_ms: Optional[float] = None, max_movetime: int = 1000, forced: bool = False) -> dict:
+    """
+    Limites de la commande "go" pour une requête.
+
+    Args:
+        depth: Profondeur demandée
+        nodes: Nombre de nœuds demandé
+        movetime: Temps de recherche demandé (ms)
+        remaining_ms: Temps restant avant l'échéance du client (ms), None si aucune
+        max_movetime: Temps de recherche maximal du serveur (ms)
+        forced: Position à un seul coup légal (profondeur limitée à FORCED_MOVE_DEPTH)
+
+    Returns:
+        Dictionnaire depth, nodes, movetime pour run_search
+    """
+    budgets = [max_movetime]
+    if movetime and movetime > 0:
+        budgets.append(movetime)
+    if remaining_ms is not None:
+        budgets.append(max(MIN_MOVETIME_MS, remaining_ms - DEADLINE_MARGIN_MS))
+    if forced:
+        depth = FORCED_MOVE_DEPTH
+    return {
+        "depth": depth if depth and depth > 0 else None,
+        "nodes": nodes if nodes and nodes > 0 else None,
+        "movetime": int(min(budgets)),
+    }
+
+
+def _analysis(best_move: Optional[str], score: Optional[int], score_type: Optional[str], resolved: str) -> dict:
+    """Résultat au même format que uci_search.run_search, sans recherche."""
+    pv = [best_move] if best_move else []
+    line = {"multipv": 1, "score": score, "score_type": score_type, "pv": pv, "depth": 0}
+    return {
+        "best_move": best_move,
+        "ponder": None,
+        "score": score,
+        "score_type": score_type,
+        "pv": pv,
+        "depth": 0,
+        "seldepth": 0,
+        "nodes": 0,
+        "nps": 0,
+        "time_ms": 0,
+        "lines": [line],
+        "resolved": resolved,
+    }
+
+
+def resolve_without_search(fen: str, skill_level: int = FULL_STRENGTH_SKILL, multipv: int = 1) -> Optional[dict]:
+    """
+    Analyse immédiate d'une position qui ne demande pas de recherche.
+
+    Le mat en un n'est pas résolu ainsi si le client demande plusieurs lignes
+    (multipv > 1) ou un niveau de jeu réduit.
+
+    Returns:
+        Analyse (champ `resolved` : game_over ou mate_in_one),
+        ou None s'il faut interroger le moteur
+    """
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        return None
+
+    moves = list(board.legal_moves)
+    if not moves:
+        # Comme Stockfish : "mate 0" pour le camp maté, 0 pour un pat
+        if board.is_checkmate():
+            return _analysis(None, 0, "mate", "game_over")
+        return _analysis(None, 0, "cp", "game_over")
+
+    if skill_level >= FULL_STRENGTH_SKILL and multipv == 1:
+        for move in moves:
+            board.push(move)
+            mate = board.is_checkmate()
+            board.pop()
+            if mate:
+                return _analysis(move.uci(), 1, "mate", "mate_in_one")
+    return None
+
+
+def is_forced_move(fen: str) -> bool:
+    """Position à un seul coup légal (voir plan_search, paramètre `forced`)."""
+    try:
+        return chess.Board(fen).legal_moves.count() == 1
+    except ValueError:
+        return False
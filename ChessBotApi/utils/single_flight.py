@@ -0,0 +1,180 @@
+"""
+Regroupement des calculs identiques en cours (single-flight).
+
+Quand plusieurs requêtes demandent en même temps la même analyse, une seule
+recherche est lancée ; les autres attendent son résultat au lieu d'occuper
+chacune un moteur. Complète le cache d'analyses, qui ne sert qu'une fois le
+premier résultat connu.
+"""
+import asyncio
+import contextlib
+import threading
+from typing import Callable, Hashable, Optional
+
+from ChessBotApi.utils.cancellation import CancelToken
+from ChessBotApi.utils.metrics import stage
+
+# Période (s) à laquelle un demandeur en attente vérifie son propre jeton d'annulation
+WAIT_POLL_INTERVAL = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Jeton passé au calcul, annulé quand tous les demandeurs sont partis
+        self.cancel = None
+        self.participants = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable, *args, cancel: Optional[CancelToken] = None, **kwargs):
+        """
+        Exécute fn(*args, **kwargs), sauf si un appel de même clé est déjà en
+        cours : on attend alors son résultat (ou son exception).
+
+        Avec `cancel`, fn reçoit un argument `cancel` : un jeton partagé,
+        annulé seulement quand tous les demandeurs l'ont été, dont l'échéance
+        est la plus tardive de celles des demandeurs. Un demandeur annulé
+        cesse d'attendre le résultat ; un appel abandonné par tous n'est
+        plus rejoint, la requête suivante en relance un.
+
+        Raises:
+            SearchCancelled: si `cancel` est annulé pendant l'attente
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.cancel is not None and call.cancel.cancelled:
+                call = None
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                if cancel is not None:
+                    call.cancel = CancelToken(cancel.deadline)
+                self._stats["leaders"] += 1
+            else:
+                if call.cancel is not None:
+                    call.cancel.extend_deadline(cancel.deadline if cancel is not None else None)
+                self._stats["coalesced"] += 1
+            call.participants += 1
+
+        handle = None
+        if cancel is not None and call.cancel is not None:
+            handle = cancel.add_callback(lambda reason: self._leave(key, call, reason))
+        try:
+            if not leader:
+                return self._wait(call, cancel)
+            try:
+                if call.cancel is not None:
+                    kwargs["cancel"] = call.cancel
+                call.result = fn(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    # Un appel abandonné a pu être remplacé par un nouveau pour la même clé
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                call.done.set()
+            # Le résultat a servi aux autres demandeurs, mais celui-ci est parti entre-temps
+            if cancel is not None:
+                cancel.check()
+            return call.result
+        finally:
+            if handle is not None:
+                cancel.remove_callback(handle)
+
+    @staticmethod
+    def _wait(call: _Call, cancel: Optional[CancelToken]):
+        with stage("coalesced_wait"):
+            while not call.done.wait(WAIT_POLL_INTERVAL if cancel is not None else None):
+                cancel.check()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _leave(self, key: Hashable, call: _Call, reason: str):
+        """Un demandeur a été annulé ; le calcul l'est aussi s'il était le dernier."""
+        with self._lock:
+            call.participants -= 1
+            abandoned = call.participants == 0
+            if abandoned and self._calls.get(key) is call:
+                # Les requêtes suivantes lancent un nouveau calcul au lieu de rejoindre celui-ci
+                del self._calls[key]
+        if abandoned and call.cancel is not None:
+            call.cancel.cancel(reason)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+class _AsyncCall:
+    def __init__(self, task: asyncio.Future, cancel: Optional[CancelToken]):
+        self.task = task
+        # Jeton passé au calcul : porte l'échéance commune (l'annulation passe par la tâche)
+        self.cancel = cancel
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        """
+        Équivalent de SingleFlight pour les coroutines (une boucle d'événements).
+
+        Le calcul tourne dans sa propre tâche : l'annulation d'un demandeur
+        (client déconnecté) ne l'interrompt que si plus personne ne l'attend.
+        """
+        self._calls = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable, *args, cancel: Optional[CancelToken] = None, **kwargs):
+        """
+        Attend la coroutine fn(*args, **kwargs) déjà lancée pour cette clé, ou la lance.
+
+        Avec `cancel`, fn reçoit comme SingleFlight.do un jeton partagé dont
+        l'échéance est la plus tardive de celles des demandeurs.
+        """
+        call = self._calls.get(key)
+        if call is not None and call.cancel is not None and call.cancel.cancelled:
+            call = None
+        leader = call is None
+        if leader:
+            shared = CancelToken(cancel.deadline) if cancel is not None else None
+            if shared is not None:
+                kwargs["cancel"] = shared
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(fn(*args, **kwargs)), shared)
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._stats["leaders"] += 1
+        else:
+            if call.cancel is not None:
+                call.cancel.extend_deadline(cancel.deadline if cancel is not None else None)
+            self._stats["coalesced"] += 1
+
+        task = call.task
+        call.waiters += 1
+        try:
+            with contextlib.nullcontext() if leader else stage("coalesced_wait"):
+                return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not task.done():
+                # Retiré tout de suite : une requête arrivée avant la fin de la tâche n'hérite pas de l'annulation
+                self._forget(key, call)
+                task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _AsyncCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._calls)}
@@ -0,0 +1,170 @@
+"""
+Base SQLite locale à la place de MySQL (tests de charge, développement).
+
+Les connexions imitent la partie de mysql.connector utilisée par l'API
+(curseurs `dictionary=True`, paramètres `%s`, `NOW()`, ping, commit,
+rollback), en version synchrone pour DBPool et asynchrone pour AsyncDBPool.
+"""
+import asyncio
+import sqlite3
+import time
+
+from ChessBotApi.utils.db_pool import DBConnectionError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ApiKey (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    keyValue TEXT UNIQUE NOT NULL,
+    isActive INTEGER NOT NULL DEFAULT 1,
+    userId INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS UserSettings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    userId INTEGER UNIQUE NOT NULL,
+    skillLevel INTEGER NOT NULL DEFAULT 20,
+    searchDepth INTEGER NOT NULL DEFAULT 15,
+    updatedAt TEXT
+);
+"""
+
+
+def _translate(query: str) -> str:
+    """Syntaxe MySQL utilisée par l'API -> SQLite."""
+    return query.replace("%s", "?").replace("NOW()", "CURRENT_TIMESTAMP")
+
+
+def init_database(path: str, api_keys, inactive_keys=()):
+    """
+    Crée les tables et une clé API (avec ses réglages) par utilisateur de test.
+
+    Args:
+        api_keys: Clés actives à créer
+        inactive_keys: Clés désactivées à créer
+    """
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        for user_id, (key, active) in enumerate(
+                [(key, 1) for key in api_keys] + [(key, 0) for key in inactive_keys], start=1):
+            connection.execute(
+                "INSERT OR REPLACE INTO ApiKey (keyValue, isActive, userId) VALUES (?, ?, ?)",
+                (key, active, user_id),
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO UserSettings (userId, skillLevel, searchDepth, updatedAt) "
+                "VALUES (?, 20, 15, CURRENT_TIMESTAMP)",
+                (user_id,),
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary: bool, latency: float):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+        self._latency = latency
+
+    def execute(self, query: str, params=()):
+        if self._latency:
+            # Aller-retour réseau simulé d'un serveur MySQL distant
+            time.sleep(self._latency)
+        self._cursor.execute(_translate(query), params)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path: str, latency: float = 0.0):
+        # Une connexion n'est utilisée que par un thread à la fois (prêtée par DBPool)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._latency = latency
+
+    def cursor(self, dictionary: bool = False):
+        return SQLiteCursor(self._connection, dictionary, self._latency)
+
+    def ping(self, reconnect: bool = False):
+        self._connection.execute("SELECT 1")
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+
+class AsyncSQLiteCursor:
+    def __init__(self, cursor: SQLiteCursor):
+        self._cursor = cursor
+
+    async def execute(self, query: str, params=()):
+        await asyncio.to_thread(self._cursor.execute, query, params)
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def close(self):
+        self._cursor.close()
+
+
+class AsyncSQLiteConnection:
+    def __init__(self, connection: SQLiteConnection):
+        self._connection = connection
+
+    async def cursor(self, dictionary: bool = False):
+        return AsyncSQLiteCursor(self._connection.cursor(dictionary))
+
+    async def ping(self, reconnect: bool = False):
+        self._connection.ping()
+
+    async def commit(self):
+        await asyncio.to_thread(self._connection.commit)
+
+    async def rollback(self):
+        self._connection.rollback()
+
+    async def close(self):
+        self._connection.close()
+
+
+def sqlite_connector(path: str, latency_ms: float = 0.0):
+    """
+    Fonction de connexion pour DBPool(connect=...) ; DB_CONFIG est ignoré.
+
+    Raises:
+        DBConnectionError: si la base ne peut pas être ouverte
+    """
+    def connect(**_):
+        try:
+            return SQLiteConnection(path, latency_ms / 1000)
+        except sqlite3.Error as e:
+            raise DBConnectionError(f"Erreur de connexion à la base SQLite: {e}") from e
+    return connect
+
+
+def async_sqlite_connector(path: str, latency_ms: float = 0.0):
+    """Équivalent de sqlite_connector pour AsyncDBPool(connect=...)."""
+    connect = sqlite_connector(path, latency_ms)
+
+    async def connect_async(**config):
+        return AsyncSQLiteConnection(connect(**config))
+    return connect_async
@@ -0,0 +1,206 @@
+import math
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+from ChessBotApi.utils.preprocessing import (
+    preprocess_gray,
+    preprocess_edges,
+    normalize_rows,
+    is_flat,
+)
+
+DEFAULT_SQUARE_SIZE = 102  # 816 / 8
+# Tailles de case pour lesquelles les templates sont précalculés au chargement
+PYRAMID_SIZES = (40, 60, 80, 102, 128)
+# Intervalle minimal (s) entre deux vérifications du dossier de templates par reload_if_changed
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+class TemplateBank:
+    def __init__(self, templates_dir: str, square_size: int = DEFAULT_SQUARE_SIZE,
+                 pyramid_sizes=PYRAMID_SIZES, reload_interval: float = RELOAD_CHECK_INTERVAL):
+        """
+        Charge une seule fois tous les templates de pièces et les garde prétraités.
+
+        Chaque template est décodé, redimensionné à la taille d'une case puis
+        passé par preprocess_gray et preprocess_edges (les deux entrées du score), ce qui
+        évite de relire et retraiter les 26 PNG pour chacune des 64 cases.
+
+        Args:
+            templates_dir: Dossier contenant les templates (sous-dossiers Black/White/Empty)
+            square_size: Taille (en pixels) des cases par défaut (rognage fixe)
+            pyramid_sizes: Tailles de case précalculées ; l'échiquier détecté est
+                ramené à la plus proche (voir nearest_size)
+            reload_interval: Intervalle minimal (s) entre deux parcours du dossier
+                par reload_if_changed (appelée à chaque requête)
+        """
+        self.templates_dir = templates_dir
+        self.square_size = square_size
+        self.pyramid_sizes = tuple(sorted(set(pyramid_sizes) | {square_size}))
+        self._lock = threading.Lock()
+        self._signature = None
+        self.reload_interval = reload_interval
+        self._next_check = 0.0
+        self.names = []
+        self.images = []
+        self.flat = []
+        self.brightness = []
+        self._features = {}
+        self._stacks = {}
+        self.load()
+
+    def _scan(self):
+        """Liste les fichiers PNG du dossier de templates avec leur date de modification."""
+        entries = []
+        for root, _, files in os.walk(self.templates_dir):
+            for file in files:
+                if not file.lower().endswith('.png'):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                entries.append((path, mtime))
+        entries.sort()
+        return entries
+
+    def load(self):
+        """(Re)charge tous les templates depuis le disque."""
+        entries = self._scan()
+        names, images = [], []
+        for path, _ in entries:
+            template_img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if template_img is None:
+                continue
+            names.append(os.path.basename(path)[:-len('.png')])
+            images.append(template_img)
+
+        features = {}
+        for level in self.pyramid_sizes:
+            size = (level, level)
+            features[size] = self._preprocess_all(images, size)
+
+        # Remplacement atomique : les lecteurs voient soit l'ancien soit le nouvel état
+        with self._lock:
+            self.names = names
+            self.images = images
+            self.flat = [is_flat(img) for img in images]
+            self.brightness = [float(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY).mean()) for img in images]
+            self._features = features
+            self._stacks = {}
+            self._signature = tuple(entries)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recharge la banque si le contenu du dossier de templates a changé.
+
+        Le dossier n'est parcouru qu'une fois par `reload_interval` secondes :
+        les autres appels ne touchent pas au disque.
+
+        Returns:
+            True si les templates ont été rechargés
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.reload_interval
+        if tuple(self._scan()) == self._signature:
+            return False
+        self.load()
+        return True
+
+    @staticmethod
+    def _preprocess_all(images, size):
+        result = []
+        for img in images:
+            # INTER_AREA pour réduire (pas de repliement), linéaire pour agrandir
+            interpolation = cv2.INTER_AREA if img.shape[0] > size[0] else cv2.INTER_LINEAR
+            resized = cv2.resize(img, (size[1], size[0]), interpolation=interpolation)
+            result.append((
+                preprocess_gray(resized),
+                preprocess_edges(resized),
+            ))
+        return result
+
+    def nearest_size(self, square_size: float) -> int:
+        """
+        Niveau de la pyramide le plus proche (en rapport d'échelle) d'une taille de case détectée.
+        """
+        if square_size <= 0:
+            return self.square_size
+        return min(self.pyramid_sizes, key=lambda level: abs(math.log(level / square_size)))
+
+    def features(self, size):
+        """
+        Retourne les templates prétraités pour une taille de case donnée.
+
+        Args:
+            size: Tuple (hauteur, largeur) de la case
+
+        Returns:
+            Liste de tuples (nom, gray, edges)
+        """
+        size = tuple(size)
+        with self._lock:
+            names = self.names
+            cached = self._features.get(size)
+            images = self.images
+        if cached is None:
+            # Taille inhabituelle : on précalcule une fois puis on garde en cache
+            cached = self._preprocess_all(images, size)
+            with self._lock:
+                if self.images is images:
+                    self._features[size] = cached
+        return [(name,) + feats for name, feats in zip(names, cached)]
+
+    def stacks(self, size):
+        """
+        Retourne les templates d'une taille donnée empilés pour le calcul matriciel.
+
+        Args:
+            size: Tuple (hauteur, largeur) de la case
+
+        Returns:
+            Tuple (noms, gray (T, h*w), gray constants, edges (T, h*w), edges constants,
+            templates unis) où les matrices sont centrées/normalisées par normalize_rows
+        """
+        size = tuple(size)
+        with self._lock:
+            cached = self._stacks.get(size)
+            images = self.images
+            flat = np.array(self.flat, dtype=bool)
+        if cached is not None:
+            return cached
+
+        features = self.features(size)
+        names = [name for name, _, _ in features]
+        gray, gray_constant = normalize_rows([f[1] for f in features])
+        edges, edges_constant = normalize_rows([f[2] for f in features])
+        cached = (names, gray, gray_constant, edges, edges_constant, flat)
+        with self._lock:
+            if self.images is images:
+                self._stacks[size] = cached
+        return cached
+
+    def __len__(self):
+        return len(self.names)
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_template_bank(templates_dir: str) -> TemplateBank:
+    """Retourne la banque partagée associée à un dossier de templates (créée au premier appel)."""
+    key = os.path.abspath(templates_dir)
+    with _banks_lock:
+        bank = _banks.get(key)
+        if bank is None:
+            bank = TemplateBank(templates_dir)
+            _banks[key] = bank
+    return bank
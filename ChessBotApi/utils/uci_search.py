@@ -0,0 +1,196 @@
+from typing import Callable, Optional
+
+# Champs numériques d'une ligne "info" UCI
+_INT_FIELDS = ("depth", "seldepth", "multipv", "nodes", "nps", "time", "hashfull", "tbhits")
+# Score (cp) à partir duquel Stockfish signale un gain ou une perte de table de finales
+TB_WIN_SCORE = 19000
+
+
+def parse_info_line(line: str) -> Optional[dict]:
+    """
+    Analyse une ligne "info ... score ... pv ..." de Stockfish.
+
+    Returns:
+        Dictionnaire (depth, seldepth, multipv, score, nodes, nps, time, pv...)
+        ou None pour les lignes sans score (currmove, string...)
+    """
+    tokens = line.split()
+    if not tokens or tokens[0] != "info" or "score" not in tokens:
+        return None
+
+    info = {}
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token in _INT_FIELDS and i + 1 < len(tokens):
+            info[token] = int(tokens[i + 1])
+            i += 2
+        elif token == "score" and i + 2 < len(tokens):
+            info["score"] = {"type": tokens[i + 1], "value": int(tokens[i + 2])}
+            i += 3
+            if i < len(tokens) and tokens[i] in ("lowerbound", "upperbound"):
+                info["score"]["bound"] = tokens[i]
+                i += 1
+        elif token == "wdl" and i + 3 < len(tokens):
+            info["wdl"] = [int(x) for x in tokens[i + 1:i + 4]]
+            i += 4
+        elif token == "pv":
+            info["pv"] = tokens[i + 1:]
+            break
+        else:
+            i += 1
+    info.setdefault("multipv", 1)
+    info.setdefault("pv", [])
+    return info
+
+
+def send_command(stockfish, command: str):
+    """
+    Écrit une commande brute sur l'entrée du moteur.
+
+    Contrairement à Stockfish._put, n'envoie pas "isready" avant : indispensable
+    pour "stop" pendant une recherche, dont la sortie ne doit pas être consommée.
+    """
+    stockfish._stockfish.stdin.write(f"{command}\n")
+    stockfish._stockfish.stdin.flush()
+
+
+def go_command(depth: Optional[int] = None, movetime: Optional[int] = None,
+               nodes: Optional[int] = None) -> str:
+    """Construit la commande "go" : le moteur s'arrête à la première limite atteinte."""
+    command = "go"
+    if depth:
+        command += f" depth {depth}"
+    if movetime:
+        command += f" movetime {movetime}"
+    if nodes:
+        command += f" nodes {nodes}"
+    if command == "go":
+        command += " infinite"
+    return command
+
+
+def stream_search(stockfish, depth: Optional[int] = None, movetime: Optional[int] = None,
+                  nodes: Optional[int] = None, on_go: Optional[Callable[[], None]] = None):
+    """
+    Lance une recherche et produit les résultats au fil de l'eau.
+
+    La position et les options doivent déjà être envoyées au moteur.
+    Produit des tuples ("info", dict) pour chaque ligne avec un score,
+    puis un tuple final ("bestmove", {"best_move", "ponder"}).
+
+    Si le générateur est fermé avant la fin (client parti), "stop" est envoyé
+    et la sortie du moteur est vidée jusqu'à "bestmove" : le moteur est alors
+    de nouveau disponible.
+
+    Args:
+        on_go: Appelée juste après l'envoi de "go" (un "stop" antérieur serait ignoré par le moteur)
+    """
+    stockfish._put(go_command(depth, movetime, nodes))
+    if on_go is not None:
+        on_go()
+    finished = False
+    try:
+        while True:
+            line = stockfish._read_line()
+            if line.startswith("bestmove"):
+                finished = True
+                tokens = line.split()
+                best_move = tokens[1] if len(tokens) > 1 and tokens[1] != "(none)" else None
+                ponder = tokens[3] if len(tokens) > 3 and tokens[2] == "ponder" else None
+                yield "bestmove", {"best_move": best_move, "ponder": ponder}
+                return
+            info = parse_info_line(line)
+            if info is not None:
+                yield "info", info
+    finally:
+        if not finished:
+            send_command(stockfish, "stop")
+            stockfish._discard_remaining_stdout_lines("bestmove")
+
+
+def is_decisive(info: dict) -> bool:
+    """
+    Vrai si la ligne "info" tranche la position : un mat exact trouvé à une
+    profondeur suffisante, ou un résultat lu dans les tables de finales.
+    Poursuivre la recherche ne changerait pas le coup joué.
+    """
+    score = info.get("score") or {}
+    if not score or score.get("bound"):
+        return False
+    if score["type"] == "mate":
+        return info.get("depth", 0) >= 2 * abs(score["value"]) - 1
+    return info.get("tbhits", 0) > 0 and abs(score["value"]) >= TB_WIN_SCORE
+
+
+def _summarize_line(info: dict) -> dict:
+    score = info.get("score") or {}
+    return {
+        "multipv": info.get("multipv", 1),
+        "score": score.get("value"),
+        "score_type": score.get("type"),
+        "pv": info.get("pv", []),
+        "depth": info.get("depth"),
+    }
+
+
+def run_search(stockfish, depth: Optional[int] = None, movetime: Optional[int] = None,
+               nodes: Optional[int] = None, stop_when_decisive: bool = False,
+               on_go: Optional[Callable[[], None]] = None) -> dict:
+    """
+    Lance une seule recherche et en extrait tout ce dont l'API a besoin :
+    meilleur coup, score (cp ou mate), variante principale, profondeur atteinte,
+    nœuds, nps et, si l'option MultiPV > 1, les N meilleures lignes.
+
+    Args:
+        stop_when_decisive: Arrête la recherche dès que la ligne principale
+            est décisive (voir is_decisive), sans attendre les autres limites
+        on_go: Voir stream_search
+
+    Returns:
+        Dictionnaire best_move, ponder, score, score_type, pv, depth, seldepth,
+        nodes, nps, time_ms et lines (une entrée par ligne MultiPV) ;
+        `resolved` vaut "decisive" si la recherche a été arrêtée ainsi
+    """
+    lines = {}
+    best = {"best_move": None, "ponder": None}
+    stopped = False
+    for kind, payload in stream_search(stockfish, depth=depth, movetime=movetime, nodes=nodes, on_go=on_go):
+        if kind == "info":
+            lines[payload["multipv"]] = payload
+            if stop_when_decisive and not stopped and payload["multipv"] == 1 and is_decisive(payload):
+                # La sortie continue jusqu'à "bestmove", lu normalement par stream_search
+                send_command(stockfish, "stop")
+                stopped = True
+        else:
+            best = payload
+
+    analysis = build_analysis(lines, best)
+    if stopped:
+        analysis["resolved"] = "decisive"
+    return analysis
+
+
+def build_analysis(lines: dict, best: dict) -> dict:
+    """
+    Assemble le résultat d'une recherche à partir des dernières lignes "info"
+    (indexées par numéro MultiPV) et de la ligne "bestmove".
+    """
+    principal = lines.get(1, {})
+    analysis = dict(best)
+    analysis.update(_summarize_line(principal))
+    del analysis["multipv"]
+    analysis["seldepth"] = principal.get("seldepth")
+    analysis["nodes"] = principal.get("nodes")
+    analysis["nps"] = principal.get("nps")
+    analysis["time_ms"] = principal.get("time")
+    analysis["lines"] = [_summarize_line(lines[k]) for k in sorted(lines)]
+    return analysis
+
+
+def analysis_response(analysis: dict, multipv: int) -> dict:
+    """Champs d'une analyse renvoyés au client (les lignes MultiPV seulement si demandées)."""
+    response = {key: value for key, value in analysis.items() if key != "lines"}
+    if multipv > 1:
+        response["lines"] = analysis.get("lines", [])
+    return response
@@ -1,5 +1,6 @@
 import { Router } from 'express';
 import { PrismaClient } from '@prisma/client';
+import { invalidateApiKeys } from './pythonApi.js';
 
 const router = Router();
 const prisma = new PrismaClient();
@@ -177,12 +178,18 @@ router.delete('/apikeys/:id', requireAdmin, async (req, res) => {
             return res.status(400).json({ error: 'ID de clé invalide' });
         }
 
+        const apiKey = await prisma.apiKey.findUnique({ where: { id: keyId } });
+
         await prisma.$executeRaw`
             UPDATE ApiKey 
             SET isActive = 0 
             WHERE id = ${keyId}
         `;
 
+        if (apiKey) {
+            await invalidateApiKeys([apiKey.keyValue]);
+        }
+
         res.json({ success: true, message: 'Clé API supprimée avec succès' });
     } catch (error) {
         console.error('Erreur suppression clé API:', error);
@@ -1,6 +1,7 @@
 import { Router } from 'express';
 import { PrismaClient } from '@prisma/client';
 import crypto from 'crypto';
+import { invalidateApiKeys } from './pythonApi.js';
 
 const router = Router();
 const prisma = new PrismaClient();
@@ -57,6 +58,11 @@ router.post('/:userId', async (req, res) => {
         const newKeyValue = generateApiKey();
         const keyName = 'Default API Key';
 
+        // Clés actives qui vont être désactivées
+        const oldKeys = await prisma.$queryRaw<{ keyValue: string }[]>`
+            SELECT keyValue FROM ApiKey WHERE userId = ${userId} AND isActive = 1
+        `;
+
         // Utiliser du SQL brut dans une transaction
         const result = await prisma.$transaction(async (tx) => {
             // Désactiver toutes les anciennes clés
@@ -82,6 +88,8 @@ router.post('/:userId', async (req, res) => {
             return Array.isArray(newKey) ? newKey[0] : newKey;
         });
 
+        await invalidateApiKeys(oldKeys.map((key) => key.keyValue));
+
         res.json({
             success: true,
             apiKey: result,
@@ -104,7 +112,7 @@ router.delete('/:keyId', async (req, res) => {
 
         // Récupérer le nom de la clé avant de la supprimer
         const apiKey = await prisma.$queryRaw`
-            SELECT name FROM ApiKey WHERE id = ${keyId}
+            SELECT name, keyValue FROM ApiKey WHERE id = ${keyId}
         `;
 
         if (!apiKey || (Array.isArray(apiKey) && apiKey.length === 0)) {
@@ -119,6 +127,8 @@ router.delete('/:keyId', async (req, res) => {
         `;
 
         const keyName = Array.isArray(apiKey) ? (apiKey[0] as any).name : (apiKey as any).name;
+        const keyValue = Array.isArray(apiKey) ? (apiKey[0] as any).keyValue : (apiKey as any).keyValue;
+        await invalidateApiKeys([keyValue]);
 
         res.json({
             success: true,
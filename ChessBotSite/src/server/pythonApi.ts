@@ -0,0 +1,23 @@
+// URL de l'API Python (analyse d'échiquier)
+const PYTHON_API_URL = process.env.PYTHON_API_URL || 'http://127.0.0.1:5001';
+// Secret partagé avec l'API Python pour ses routes d'administration (ADMIN_TOKEN côté Python)
+const PYTHON_API_ADMIN_TOKEN = process.env.PYTHON_API_ADMIN_TOKEN || '';
+
+// Prévenir l'API Python qu'une ou plusieurs clés ont été désactivées,
+// pour qu'elle les retire de son cache de vérification.
+// Sans liste de clés, tout le cache est vidé.
+export const invalidateApiKeys = async (keys?: string[]): Promise<void> => {
+    try {
+        await fetch(`${PYTHON_API_URL}/api_keys/invalidate`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...(PYTHON_API_ADMIN_TOKEN ? { 'X-Admin-Token': PYTHON_API_ADMIN_TOKEN } : {})
+            },
+            body: JSON.stringify(keys ? { keys } : {})
+        });
+    } catch (error) {
+        // L'API Python peut être arrêtée : le TTL du cache prendra le relais
+        console.error('Impossible d\'invalider les clés API côté Python:', error);
+    }
+};